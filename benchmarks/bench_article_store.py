@@ -0,0 +1,109 @@
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.article_store import ArticleStore, news_document
+
+TICKERS = ["AAPL", "MSFT", "NVDA", "TSLA", "AMZN", "META", "GOOGL", "JPM", "XOM", "UNH"] + [f"T{i:03d}" for i in range(490)]
+KEYWORDS = ("guidance revenue earnings beat miss outlook upgrade downgrade margin buyback dividend lawsuit "
+            "merger acquisition layoffs chip cloud demand supply inflation rates fed shares stock rally "
+            "selloff forecast quarter analyst target price growth decline record").split()
+# Long-tail filler vocabulary so term frequencies look like real prose, not 30 words in every doc
+FILLER = [f"w{i}" for i in range(20000)]
+FILLER_CUM_WEIGHTS = list(itertools.accumulate(1 / r for r in range(1, len(FILLER) + 1)))
+WEEK = 7 * 24 * 3600
+REFETCH_SHARE = 0.05
+
+
+def words(rng, k):
+    picked = rng.choices(FILLER, cum_weights=FILLER_CUM_WEIGHTS, k=k)
+    for i in range(max(1, k // 20)):
+        picked[rng.randrange(k)] = rng.choice(KEYWORDS)
+    return " ".join(picked)
+
+
+def synthetic_articles(n, seed=7):
+    rng = random.Random(seed)
+    now = int(time.time())
+    weights = list(itertools.accumulate(1 / r for r in range(1, len(TICKERS) + 1)))
+    for i in range(n):
+        primary = rng.choices(TICKERS, cum_weights=weights)[0]
+        mentioned = {primary, *rng.choices(TICKERS, cum_weights=weights, k=rng.randint(0, 2))}
+        yield news_document({
+            "primary_ticker": primary,
+            "mentioned_tickers": sorted(mentioned),
+            "title": f"{primary} " + words(rng, 8),
+            "description": words(rng, 25),
+            "content": words(rng, 120),
+            # Some articles come back from a later fetch under another ticker (same URL)
+            "url": f"https://example.com/{rng.randrange(i) if i and rng.random() < REFETCH_SHARE else i}",
+            "source": "bench",
+            "published_at": now - rng.randint(0, 8 * WEEK),
+        })
+
+
+def time_queries(store, queries, repeat):
+    latencies = []
+    for _ in range(repeat):
+        for kwargs in queries:
+            start = time.perf_counter()
+            store.search(**kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def ticker_rows(store):
+    return store.conn.execute(
+        "SELECT t.ticker, d.ext_id, t.mentions, t.published_ts FROM ticker_docs t "
+        "JOIN documents d ON d.doc_id = t.doc_id ORDER BY 1, 2").fetchall()
+
+
+def main(articles, batch_size):
+    with tempfile.TemporaryDirectory() as tmp:
+        docs = list(synthetic_articles(articles))
+
+        store = ArticleStore(os.path.join(tmp, "incremental.db"))
+        start = time.perf_counter()
+        for i in range(0, len(docs), batch_size):
+            store.write_batch(docs[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+        print(f"incremental: {articles / elapsed:,.0f} docs/s ({batch_size} per transaction)")
+        expected = ticker_rows(store)
+        store.close()
+
+        store = ArticleStore(os.path.join(tmp, "bulk.db"))
+        start = time.perf_counter()
+        store.bulk_load(iter(docs))
+        elapsed = time.perf_counter() - start
+        print(f"bulk load:   {articles / elapsed:,.0f} docs/s")
+        same = ticker_rows(store) == expected
+        print(f"parity:      ticker index {'identical' if same else 'DIFFERS'} ({len(expected):,} rows)")
+
+        week_ago = int(time.time()) - WEEK
+        queries = [
+            {"text": "guidance", "tickers": ["MSFT"], "since": week_ago},
+            {"text": "earnings AND beat", "tickers": ["AAPL"], "since": week_ago},
+            {"tickers": ["NVDA", "TSLA"], "since": week_ago},
+            {"text": "buyback", "since": week_ago, "limit": 20},
+            {"tickers": ["T250"]},
+        ]
+        p50, p99 = time_queries(store, queries, repeat=20)
+        print(f"queries:     p50 {p50:.2f} ms, p99 {p99:.2f} ms over {len(queries) * 20} searches")
+        print(f"sample: {store.search('guidance', tickers=['MSFT'], since=week_ago, limit=3)}")
+        store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Insert and query throughput of the SQLite FTS5 article store")
+    parser.add_argument("--articles", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    main(args.articles, args.batch_size)
@@ -0,0 +1,92 @@
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from quixstreams import Application
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.retry import FailureRouter, PermanentError, ensure_failure_topics
+from common.topics import ensure_topic
+
+# Needs a local broker (localhost:9092). The handler fakes a Supabase write with
+# a sleep; a share of messages fail transiently (after a timeout) or permanently.
+# Shows main-lane throughput as the fault rate grows: failures cost one produce
+# to a retry/DLQ topic, not a stalled partition.
+TOPIC = "bench-dlq"
+
+
+def fill(broker_address, topic, count):
+    app = Application(broker_address=broker_address, loglevel="WARNING")
+    with app.get_producer() as producer:
+        for i in range(count):
+            producer.produce(topic=topic, key=str(i), value=json.dumps({"id": f"p{i}"}).encode("utf-8"))
+        producer.flush()
+
+
+def run(broker_address, count, write_seconds, timeout_seconds, transient, permanent):
+    topic = f"{TOPIC}-{int(time.time() * 1000)}"
+    ensure_topic(broker_address, topic, 1)
+    ensure_failure_topics(broker_address, topic)
+    fill(broker_address, topic, count)
+
+    def handler(value):
+        roll = random.random()
+        if roll < transient:
+            time.sleep(timeout_seconds)
+            raise ConnectionError("simulated timeout")
+        if roll < transient + permanent:
+            raise PermanentError("simulated bad payload")
+        time.sleep(write_seconds)
+
+    app = Application(
+        broker_address=broker_address,
+        loglevel="WARNING",
+        consumer_group=f"{topic}-group",
+        auto_offset_reset="earliest",
+    )
+    done = parked = 0
+    with app.get_consumer() as consumer, app.get_producer() as producer:
+        consumer.subscribe(topics=[topic])
+        router = FailureRouter(producer, topic)
+        start = None
+        while done < count:
+            msg = consumer.poll(1)
+            if msg is None or msg.error():
+                continue
+            start = start or time.monotonic()
+            try:
+                handler(json.loads(msg.value()))
+            except Exception as e:
+                router.handle_failure(msg, e)
+                parked += 1
+            consumer.store_offsets(msg)
+            done += 1
+    return done / (time.monotonic() - start), parked
+
+
+def main(broker_address, count, write_seconds, timeout_seconds, fault_rates, permanent_share):
+    print(f"{count} messages, {write_seconds * 1000:.0f}ms per write, transient failures after {timeout_seconds * 1000:.0f}ms")
+    baseline = None
+    for rate in fault_rates:
+        permanent = rate * permanent_share
+        throughput, parked = run(broker_address, count, write_seconds, timeout_seconds, rate - permanent, permanent)
+        baseline = baseline or throughput
+        print(f"faults={rate:>4.0%}  {throughput:8.1f} msg/s  parked={parked:<6} vs no faults={throughput / baseline:5.0%}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.ERROR)
+    parser = argparse.ArgumentParser(description="Main-lane throughput under injected write failures")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--write-ms", type=float, default=2.0, help="simulated successful write latency")
+    parser.add_argument("--timeout-ms", type=float, default=20.0, help="latency of a failing (timed out) write")
+    parser.add_argument("--faults", default="0,0.05,0.2,0.5", help="comma-separated failure rates")
+    parser.add_argument("--permanent-share", type=float, default=0.2, help="share of failures that are permanent")
+    parser.add_argument("--broker", default="localhost:9092")
+    args = parser.parse_args()
+
+    main(args.broker, args.messages, args.write_ms / 1000, args.timeout_ms / 1000,
+         [float(f) for f in args.faults.split(",")], args.permanent_share)
@@ -0,0 +1,64 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.mentions import extract_mentions
+from common.tickers import count_tickers, load_sp500
+
+CONSTITUENTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "reddit", "constituents.csv")
+WORDS = ("the stock is going to the moon calls puts earnings beat yolo market today buy sell hold "
+         "bought shares options expiry squeeze short long bagholder tendies loss porn dip rip").split()
+
+
+def synthetic_posts(n, terms, seed=3):
+    """WSB-like posts: mostly filler, a few tickers (some lowercase), 10-120 words each"""
+    rng = random.Random(seed)
+    tickers = sorted(t for t in terms if 3 <= len(t) <= 5 and t.isalpha())
+    texts = []
+    for _ in range(n):
+        words = rng.choices(WORDS, k=rng.randint(10, 120))
+        for _ in range(rng.randint(0, 4)):
+            ticker = rng.choice(tickers)
+            words[rng.randrange(len(words))] = ticker.lower() if rng.random() < 0.2 else f"${ticker}"
+        texts.append(" ".join(words))
+    return texts
+
+
+def main(posts, workers, verify):
+    terms = load_sp500(CONSTITUENTS)
+    texts = synthetic_posts(posts, terms)
+    print(f"{posts:,} posts, {len(terms)} search terms, {workers or os.cpu_count()} workers")
+
+    start = time.perf_counter()
+    looped = [count_tickers(text, terms) for text in texts]
+    loop_elapsed = time.perf_counter() - start
+    print(f"count_tickers loop: {loop_elapsed:7.2f}s  {posts / loop_elapsed:>12,.0f} posts/s")
+
+    start = time.perf_counter()
+    matrix = extract_mentions(texts, terms, workers=workers)
+    batch_elapsed = time.perf_counter() - start
+    print(f"extract_mentions:   {batch_elapsed:7.2f}s  {posts / batch_elapsed:>12,.0f} posts/s  "
+          f"({loop_elapsed / batch_elapsed:.1f}x, {matrix.nnz:,} non-zeros)")
+
+    step = max(1, posts // verify) if verify else 1
+    mismatches = [i for i in range(0, posts, step) if matrix.row(i) != looped[i]]
+    checked = len(range(0, posts, step))
+    print(f"parity: {checked - len(mismatches):,}/{checked:,} sampled posts identical to count_tickers")
+    if mismatches:
+        i = mismatches[0]
+        sys.exit(f"post {i}: batch={matrix.row(i)} loop={looped[i]}")
+
+    print(f"top tickers: {matrix.totals().head(5).to_dict()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch mention extraction vs the per-post count_tickers loop")
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--verify", type=int, default=100_000, help="posts to compare against the loop (0 = all)")
+    args = parser.parse_args()
+
+    main(args.posts, args.workers, args.verify)
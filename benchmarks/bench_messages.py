@@ -0,0 +1,154 @@
+import argparse
+import csv
+import gc
+import json
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.messages import RawNewsMessage, RedditPost, batch_timestamp
+from common.tickers import count_tickers
+
+CONSTITUENTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "reddit", "constituents.csv")
+WORDS = "the stock is going to the moon calls puts earnings beat yolo market today buy sell hold".split()
+
+
+def synthetic_articles(n, seed=1):
+    rng = random.Random(seed)
+    for i in range(n):
+        yield {
+            "source": {"id": None, "name": rng.choice(["Reuters", "Forbes", "The Motley Fool"])},
+            "author": "Jane Doe",
+            "title": " ".join(rng.choices(WORDS, k=12)),
+            "description": " ".join(rng.choices(WORDS, k=40)),
+            "content": " ".join(rng.choices(WORDS, k=60)) + " [+1234 chars]",
+            "url": f"https://example.com/news/{i}",
+            "publishedAt": "2025-10-01T12:00:00Z",
+        }
+
+
+def old_news_path(articles, ticker):
+    """The pre-model path: dict with .get(), unused full_text, strftime per message, dumps then encode"""
+    for article in articles:
+        full_text = f"{article.get('title', '')} {article.get('description', '')} {article.get('content', '')}"
+        msg = {
+            "primary_ticker": ticker,
+            "mentioned_tickers": [ticker],
+            "title": article.get('title', ''),
+            "description": article.get('description', ''),
+            "content": article.get('content', ''),
+            "url": article.get('url', ''),
+            "source": article.get('source', {}).get('name', ''),
+            "published_at": article.get('publishedAt', ''),
+            "fetched_at": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+        yield json.dumps(msg).encode("utf-8")
+
+
+def new_news_path(articles, ticker):
+    fetched_at = batch_timestamp()
+    for article in articles:
+        yield RawNewsMessage.from_article(article, ticker, [ticker], fetched_at).encode()
+
+
+def search_terms():
+    with open(CONSTITUENTS, encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    return {r["Symbol"].upper() for r in rows} | {r["Security"].split()[0].upper() for r in rows}
+
+
+def synthetic_posts(n, terms, seed=2):
+    rng = random.Random(seed)
+    pool = WORDS + [t.lower() if rng.random() < 0.3 else t for t in sorted(terms)[:200]]
+    for _ in range(n):
+        yield " ".join(rng.choices(pool, k=12)), " ".join(rng.choices(pool, k=rng.randint(20, 200)))
+
+
+def old_count_tickers(content, terms):
+    if not content:
+        return {}
+    words = re.findall(r'\b[A-Z]{3,5}\b', content.upper())
+    counts = {term: words.count(term) for term in terms if term in words}
+    return {k: v for k, v in counts.items() if v > 0}
+
+
+def old_post_path(posts, terms):
+    for i, (title, selftext) in enumerate(posts):
+        content = title + " " + selftext
+        mentions = old_count_tickers(content, terms)
+        if mentions:
+            yield json.dumps({
+                "id": f"p{i}", "type": "post", "ticker": list(mentions.keys())[0], "content": content,
+                "author": "someone", "score": 10, "num_comments": 3, "url": f"https://redd.it/p{i}",
+                "created_utc": 1759300000, "created": datetime.fromtimestamp(1759300000).isoformat(),
+                "ticker_mentions": mentions,
+            }).encode("utf-8")
+
+
+def new_post_path(posts, terms):
+    for i, (title, selftext) in enumerate(posts):
+        content = title + " " + selftext
+        mentions = count_tickers(content, terms)
+        if mentions:
+            yield RedditPost(f"p{i}", next(iter(mentions)), content, "someone", 10, 3,
+                             f"https://redd.it/p{i}", 1759300000, mentions).encode()
+
+
+def measure(name, make, n):
+    """
+    Throughput, plus bytes allocated per message while streaming: outputs are
+    dropped as they are produced (as the producer does), so the traced peak is
+    the transient garbage of one message, not the retained batch
+    """
+    gc.collect()
+    start = time.perf_counter()
+    for _ in make():
+        pass
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    allocated = 0
+    for _ in make():
+        current, peak = tracemalloc.get_traced_memory()
+        allocated += peak
+        tracemalloc.reset_peak()
+    tracemalloc.stop()
+    print(f"{name:<12} {n / elapsed:>12,.0f} msg/s   {allocated / n / 1024:8.1f} KiB peak transient per message")
+
+
+def main(messages, old_posts):
+    articles = list(synthetic_articles(messages))
+    old, new = list(old_news_path(articles[:100], "AAPL")), list(new_news_path(articles[:100], "AAPL"))
+    assert [{**json.loads(o), "fetched_at": ""} for o in old] == [{**json.loads(n), "fetched_at": ""} for n in new]
+
+    print(f"raw-news, {messages} messages")
+    measure("dict+dumps", lambda: old_news_path(articles, "AAPL"), messages)
+    measure("model", lambda: new_news_path(articles, "AAPL"), messages)
+
+    terms = search_terms()
+    posts = list(synthetic_posts(messages, terms))
+    old, new = list(old_post_path(posts[:500], terms)), list(new_post_path(posts[:500], terms))
+    assert [json.loads(o)["ticker_mentions"] for o in old] == [json.loads(n)["ticker_mentions"] for n in new]
+
+    # The old matcher is O(terms x words); time it on a slice so the run stays short
+    sample = posts[:old_posts]
+    print(f"reddit posts, {messages} posts ({len(sample)} for the old path), {len(terms)} search terms")
+    measure("dict+dumps", lambda: old_post_path(sample, terms), len(sample))
+    measure("model", lambda: new_post_path(posts, terms), messages)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Allocation and throughput of the message model vs dict + json.dumps")
+    parser.add_argument("--messages", type=int, default=50_000)
+    parser.add_argument("--old-posts", type=int, default=5_000)
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore", DeprecationWarning)  # the replicated utcnow() call
+    main(args.messages, args.old_posts)
@@ -0,0 +1,69 @@
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.partitioning import DEFAULT_HEAVY_KEYS, SkewAwarePartitioner, merge_salted_counts, partition_for
+
+CONSTITUENTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "news_fetch_api", "constituents.csv")
+
+
+def zipf_tickers(n, s, seed=42):
+    """
+    Draw n tickers with Zipf(s) popularity
+    Mega-caps get the top ranks, the rest of the index follows in CSV order
+    """
+    with open(CONSTITUENTS, encoding="utf-8") as f:
+        symbols = [row["Symbol"] for row in csv.DictReader(f)]
+    mega = [t for t in DEFAULT_HEAVY_KEYS.split(",") if t in symbols]
+    ranked = mega + [t for t in symbols if t not in mega]
+    weights = [1 / (rank ** s) for rank in range(1, len(ranked) + 1)]
+    return random.Random(seed).choices(ranked, weights=weights, k=n)
+
+
+def loads(keys, partitions):
+    counts = Counter(partition_for(k, partitions) for k in keys)
+    return [counts.get(p, 0) for p in range(partitions)]
+
+
+def describe(name, per_partition):
+    mean = sum(per_partition) / len(per_partition)
+    print(f"{name:<10} max/mean={max(per_partition) / mean:5.2f}  min/mean={min(per_partition) / mean:5.2f}  "
+          f"hottest={max(per_partition)}  coldest={min(per_partition)}")
+
+
+def main(messages, partitions, s, salt_buckets):
+    tickers = zipf_tickers(messages, s)
+    top = Counter(tickers).most_common(5)
+    print(f"{messages} messages, {partitions} partitions, Zipf s={s}; top tickers: {top}")
+
+    describe("plain", loads(tickers, partitions))
+
+    partitioner = SkewAwarePartitioner(salt_buckets=salt_buckets)
+    start = time.perf_counter()
+    salted = [partitioner.key_for(t) for t in tickers]
+    elapsed = time.perf_counter() - start
+    describe("salted", loads(salted, partitions))
+
+    start = time.perf_counter()
+    merged = merge_salted_counts(Counter(salted))
+    merge_elapsed = time.perf_counter() - start
+    assert merged == dict(Counter(tickers)), "consumer-side merge lost counts"
+
+    print(f"key_for: {messages / elapsed:,.0f} msg/s, merge: {len(salted) / merge_elapsed:,.0f} msg/s")
+    print(f"detected heavy keys: {partitioner.detected_heavy_keys()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Partition skew on a Zipf-distributed ticker workload")
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--partitions", type=int, default=12)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--salt-buckets", type=int, default=8)
+    args = parser.parse_args()
+
+    main(args.messages, args.partitions, args.zipf, args.salt_buckets)
@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.aggregates import RETENTION_SECONDS, HotAggregates
+from common.article_store import ArticleStore, news_document
+from common.query_service import QueryService, serve
+
+# No broker or Supabase needed: the service runs in its own process over
+# synthetic hot aggregates, with a real SQLite article store behind the cache
+# for news queries that memory can't answer. The load generator keeps
+# --connections keep-alive connections busy (closed loop) and reports latency.
+TICKERS = [f"T{i:03d}" for i in range(500)]
+
+
+def synthetic_state(posts, articles, db_path, seed=11):
+    rng = random.Random(seed)
+    weights = [1 / (i + 1) for i in range(len(TICKERS))]  # a few tickers dominate, like WSB
+    now = int(time.time())
+    aggregates = HotAggregates()
+    for i in range(posts):
+        mentioned = set(rng.choices(TICKERS, weights, k=rng.randint(1, 3)))
+        aggregates.add_post({
+            "id": f"p{i}",
+            "created_utc": now - rng.randint(0, RETENTION_SECONDS - 120),
+            "ticker_mentions": {t: rng.randint(1, 4) for t in mentioned},
+        }, now=now)
+
+    news = []
+    for i in range(articles):
+        ticker = rng.choices(TICKERS, weights)[0]
+        published = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now - rng.randint(0, 30 * 86400)))
+        news.append({"primary_ticker": ticker, "mentioned_tickers": [ticker], "title": f"{ticker} news {i}",
+                     "description": "", "content": "", "url": f"https://example.com/{i}",
+                     "source": "bench", "published_at": published})
+    store = ArticleStore(db_path)
+    store.bulk_load(news_document(a) for a in news)
+    for article in news[-articles // 4:]:  # the feed has only seen the most recent share
+        aggregates.add_news(article)
+    aggregates.covered_since = now - RETENTION_SECONDS
+    return aggregates, store
+
+
+def run_server(port, posts, articles, db_path, ready):
+    async def main():
+        aggregates, store = synthetic_state(posts, articles, db_path)
+        server = await serve(QueryService(aggregates, article_store=store), "127.0.0.1", port)
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
+
+
+def request_mix(rng):
+    """Dashboard-like: mostly top-K and hot tickers, a tail of cold tickers and deep news"""
+    roll = rng.random()
+    ticker = rng.choice(TICKERS[:20]) if rng.random() < 0.8 else rng.choice(TICKERS)
+    if roll < 0.4:
+        return "top", f"/top?window={rng.choice(('1h', '24h', '7d'))}&k={rng.choice((10, 20, 50))}"
+    if roll < 0.7:
+        return "timeline", f"/timeline/{ticker}?days={rng.choice((1, 3, 7))}&resolution={rng.choice(('1h', '1d'))}"
+    return "news", f"/news/{ticker}?n={rng.choice((5, 10, 25, 50))}"
+
+
+async def client(port, deadline, latencies, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    while time.perf_counter() < deadline:
+        route, path = request_mix(rng)
+        start = time.perf_counter()
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("ascii"))
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = next(int(line.split(b":")[1]) for line in head.split(b"\r\n") if line.lower().startswith(b"content-length"))
+        await reader.readexactly(length)
+        latencies[route].append(time.perf_counter() - start)
+        if not head.startswith(b"HTTP/1.1 200"):
+            latencies["errors"].append(0)
+    writer.close()
+
+
+async def load(port, connections, seconds):
+    latencies = defaultdict(list)
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(client(port, deadline, latencies, seed) for seed in range(connections)))
+    return latencies
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def main(connections, seconds, posts, articles, port):
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench-query-"), "articles.db")
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=run_server, args=(port, posts, articles, db_path, ready), daemon=True)
+    server.start()
+    ready.wait(300)
+    print(f"{posts:,} posts / {articles:,} articles loaded, {connections} connections for {seconds}s")
+
+    latencies = asyncio.run(load(port, connections, seconds))
+    server.terminate()
+    server.join()
+
+    errors = len(latencies.pop("errors", []))
+    every = [v for values in latencies.values() for v in values]
+    print(f"{len(every) / seconds:,.0f} req/s, {errors} errors")
+    print(f"{'route':<10} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for route, values in sorted(latencies.items()) + [("all", every)]:
+        print(f"{route:<10} {len(values):>9,} {percentile(values, 0.5) * 1000:>8.2f} "
+              f"{percentile(values, 0.99) * 1000:>8.2f} {max(values) * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query service latency under local load")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--posts", type=int, default=200_000, help="synthetic posts in the 7-day window")
+    parser.add_argument("--articles", type=int, default=20_000)
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+
+    main(args.connections, args.seconds, args.posts, args.articles, args.port)
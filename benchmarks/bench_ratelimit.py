@@ -0,0 +1,75 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.ratelimit import Limit, RateLimiter
+
+# Many processes x threads share one quota through Redis. Reports the admitted
+# rate against the configured one and the busiest window of `period` seconds,
+# which must never exceed rate + burst.
+
+
+def hammer(redis_url, limit_spec, threads, seconds, credential, out):
+    limiter = RateLimiter(redis_url, limits={"bench": Limit.parse(limit_spec)})
+    admitted = []
+    deadline = time.time() + seconds
+
+    def worker():
+        while time.time() < deadline:
+            if limiter.acquire("bench", credential, timeout=deadline - time.time()) is not None:
+                admitted.append(time.time())
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    out.put(admitted)
+
+
+def busiest_window(timestamps, period):
+    window, busiest = deque(), 0
+    for ts in sorted(timestamps):
+        window.append(ts)
+        while window[0] <= ts - period:
+            window.popleft()
+        busiest = max(busiest, len(window))
+    return busiest
+
+
+def main(processes, threads, seconds, limit_spec, redis_url):
+    limit = Limit.parse(limit_spec)
+    credential = f"bench-{time.time_ns()}"  # fresh bucket per run
+    out = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=hammer, args=(redis_url, limit_spec, threads, seconds, credential, out))
+        for _ in range(processes)
+    ]
+    for p in workers:
+        p.start()
+    admitted = [ts for _ in workers for ts in out.get()]
+    for p in workers:
+        p.join()
+
+    allowed = limit.rate + limit.burst
+    busiest = busiest_window(admitted, limit.period)
+    print(f"{processes} processes x {threads} threads for {seconds}s against {limit}")
+    print(f"admitted {len(admitted)} ({len(admitted) / seconds:.2f}/s, quota {limit.rate / limit.period:.2f}/s)")
+    print(f"busiest {limit.period:g}s window: {busiest} (max allowed {allowed:g}) -> {'OK' if busiest <= allowed else 'OVER QUOTA'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared rate limiter accuracy across processes")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--limit", default="50/1/5", help="requests/period_seconds/burst")
+    parser.add_argument("--redis", default="redis://localhost:6379/0")
+    args = parser.parse_args()
+
+    main(args.processes, args.threads, args.seconds, args.limit, args.redis)
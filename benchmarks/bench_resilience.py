@@ -0,0 +1,91 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from common.resilience import MAX_CONCURRENCY, CircuitOpenError, ProviderGuard, classify_exception, classify_status
+from fake_provider import FaultConfig, start_fake_provider
+
+# Closed-loop load against the fake provider with a brownout in the middle.
+# Guarded: AIMD finds the server's capacity, the breaker stops the hammering
+# during the brownout and half-open probes bring traffic back afterwards.
+# --fixed N runs the same load at a constant N in-flight for comparison.
+
+
+def run(seconds, threads, url, guard):
+    counts = Counter()
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def call():
+        if guard is None:
+            try:
+                return classify_status(requests.get(url, params={"q": "AAPL"}, timeout=10).status_code)
+            except requests.RequestException as e:
+                return classify_exception(e)
+        try:
+            response = guard.run(requests.get, url, params={"q": "AAPL"}, timeout=10)
+            return classify_status(response.status_code)
+        except CircuitOpenError:
+            return "refused"
+        except requests.RequestException as e:
+            return classify_exception(e)
+
+    def worker():
+        while time.monotonic() < deadline:
+            outcome = call()
+            with lock:
+                counts[outcome] += 1
+
+    pool = [threading.Thread(target=worker, daemon=True) for _ in range(threads)]
+    for t in pool:
+        t.start()
+
+    print(f"{'t':>4} {'ok':>5} {'429/503':>8} {'5xx':>5} {'limit':>6}  circuit")
+    previous = Counter()
+    for second in range(1, int(seconds) + 1):
+        time.sleep(1)
+        with lock:
+            delta, previous = counts - previous, counts.copy()
+        limit = f"{guard.concurrency.limit:6.1f}" if guard else f"{threads:6d}"
+        state = guard.breaker.state if guard else "-"
+        print(f"{second:>4} {delta['ok']:>5} {delta['overload']:>8} {delta['error']:>5} {limit}  {state}")
+
+    for t in pool:
+        t.join()
+    return counts
+
+
+def main(seconds, brownout, capacity, latency, fixed, port):
+    config = FaultConfig(latency=latency, capacity=capacity, brownout=brownout)
+    server = start_fake_provider(config, port)
+    url = f"http://127.0.0.1:{port}/v2/everything"
+
+    guard = None if fixed else ProviderGuard("fake.everything")
+    threads = fixed or MAX_CONCURRENCY
+    counts = run(seconds, threads, url, guard)
+    server.shutdown()
+
+    sent = counts["ok"] + counts["overload"] + counts["error"]
+    print(f"{'fixed ' + str(fixed) if fixed else 'guarded'}: {sent} requests sent, {counts['ok']} ok "
+          f"({counts['ok'] / seconds:.1f}/s), {counts['overload']} overload, {counts['error']} errors, "
+          f"{counts['refused']} refused by the breaker")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Adaptive concurrency + circuit breaker vs a faulty provider")
+    parser.add_argument("--seconds", type=float, default=40)
+    parser.add_argument("--brownout", default="15:25", help="START:END seconds of 503s")
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--fixed", type=int, help="fixed in-flight requests, no guard")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    main(args.seconds, tuple(float(x) for x in args.brownout.split(":")), args.capacity, args.latency,
+         args.fixed, args.port)
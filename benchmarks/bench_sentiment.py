@@ -0,0 +1,81 @@
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.sentiment import LEXICON, ScoreCache, SentimentScorer, score_batch
+
+# No broker needed: synthetic WSB-like posts go straight through SentimentScorer
+# in micro-batches, as tools/kafka-sentiment-enricher.py feeds it.
+TICKERS = ("TSLA", "AAPL", "NVDA", "AMD", "GME", "MSFT", "AMZN", "META", "PLTR", "SPY")
+FILLER = ("the stock is going to today market earnings shares options i think we are "
+          "this company after report call with for and of at on in it").split()
+MODIFIERS = ("not", "very", "really", "slightly", "never", "but")
+
+
+def synthetic_docs(n, duplicate_share, seed=7):
+    """(text, tickers) pairs, 2-8 sentences each; duplicate_share of them repeat an earlier one"""
+    rng = random.Random(seed)
+    sentiment_words = sorted(LEXICON)
+    docs = []
+    for _ in range(n):
+        if docs and rng.random() < duplicate_share:
+            docs.append(rng.choice(docs))
+            continue
+        tickers = rng.sample(TICKERS, rng.randint(1, 3))
+        sentences = []
+        for _ in range(rng.randint(2, 8)):
+            words = rng.choices(FILLER, k=rng.randint(6, 20))
+            for _ in range(rng.randint(0, 3)):
+                words[rng.randrange(len(words))] = rng.choice(sentiment_words)
+            if rng.random() < 0.3:
+                words.insert(rng.randrange(len(words)), rng.choice(MODIFIERS))
+            if rng.random() < 0.5:
+                words.insert(0, f"${rng.choice(tickers)}")
+            sentences.append(" ".join(words) + rng.choice((".", "!", "!!!", "?")))
+        docs.append((" ".join(sentences), tickers))
+    return docs
+
+
+def run(docs, workers, batch_size):
+    scorer = SentimentScorer(workers=workers, cache=ScoreCache())
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        scorer.pool = pool
+        pool.map(score_batch, [[("warm up", [])]] * workers)
+        start = time.perf_counter()
+        for i in range(0, len(docs), batch_size):
+            scorer.score(docs[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+    return elapsed, scorer.cache
+
+
+def main(messages, worker_counts, batch_size, duplicate_share):
+    docs = synthetic_docs(messages, duplicate_share)
+    avg_chars = sum(len(text) for text, _ in docs) / len(docs)
+    print(f"{messages:,} messages (~{avg_chars:.0f} chars), {duplicate_share:.0%} duplicates, "
+          f"batches of {batch_size}, {os.cpu_count()} cores")
+
+    start = time.perf_counter()
+    score_batch(docs)
+    inline = time.perf_counter() - start
+    print(f"uncached, inline:  {messages / inline:>9,.0f} msg/s")
+
+    for workers in worker_counts:
+        elapsed, cache = run(docs, workers, batch_size)
+        rate = messages / elapsed
+        print(f"workers={workers:<3} {rate:>9,.0f} msg/s  {rate / workers:>9,.0f} msg/s/core  "
+              f"cache hits {cache.hits / max(cache.hits + cache.misses, 1):.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sentiment enrichment throughput per core")
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--duplicates", type=float, default=0.2, help="share of re-fetched/duplicate documents")
+    args = parser.parse_args()
+
+    main(args.messages, [int(w) for w in args.workers.split(",")], args.batch_size, args.duplicates)
@@ -0,0 +1,72 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.sweep import publish_sweep, run_worker, wait_for_sweep
+
+# Needs a local broker (localhost:9092). Workers fake the provider call with a
+# sleep per term, so the numbers show coordination overhead and scaling only.
+PROVIDER = "bench"
+OUTPUT_TOPIC = "ticker-sweep-bench-output"
+
+
+def fake_worker(broker_address, fetch_seconds):
+    logging.basicConfig(level=logging.WARNING)
+
+    def process_unit(unit, producer):
+        for term in unit["terms"]:
+            time.sleep(fetch_seconds)
+            producer.produce(topic=OUTPUT_TOPIC, key=term, value=f'{{"term":"{term}"}}'.encode("utf-8"))
+        return len(unit["terms"])
+
+    run_worker(PROVIDER, process_unit, broker_address)
+
+
+def run(workers, terms, unit_size, fetch_seconds, broker_address, warmup):
+    processes = [
+        multiprocessing.Process(target=fake_worker, args=(broker_address, fetch_seconds), daemon=True)
+        for _ in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    time.sleep(warmup)  # let the group settle so the first rebalance isn't timed
+
+    start = time.monotonic()
+    publish_sweep(broker_address, PROVIDER, [f"T{i:04d}" for i in range(terms)], unit_size)
+    wait_for_sweep(broker_address, PROVIDER, poll_seconds=0.25)
+    elapsed = time.monotonic() - start
+
+    for p in processes:
+        p.terminate()
+        p.join()
+    return elapsed
+
+
+def main(worker_counts, terms, unit_size, fetch_seconds, broker_address, warmup):
+    serial = terms * fetch_seconds
+    print(f"{terms} terms, {unit_size} per unit, {fetch_seconds}s per term (one process: ~{serial:.0f}s)")
+    baseline = None
+    for workers in worker_counts:
+        elapsed = run(workers, terms, unit_size, fetch_seconds, broker_address, warmup)
+        baseline = baseline or elapsed * workers
+        print(f"workers={workers:<3} {elapsed:7.1f}s  {terms / elapsed:7.1f} terms/s  "
+              f"speedup={baseline / elapsed:5.2f}  efficiency={baseline / elapsed / workers:5.0%}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="Sweep throughput vs number of worker processes")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--terms", type=int, default=500)
+    parser.add_argument("--unit-size", type=int, default=10)
+    parser.add_argument("--fetch-seconds", type=float, default=0.05, help="simulated provider latency per term")
+    parser.add_argument("--broker", default="localhost:9092")
+    parser.add_argument("--warmup", type=float, default=8.0, help="seconds for the group to rebalance")
+    args = parser.parse_args()
+
+    main([int(w) for w in args.workers.split(",")], args.terms, args.unit_size, args.fetch_seconds,
+         args.broker, args.warmup)
@@ -0,0 +1,111 @@
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# ===============================
+# FAKE PROVIDER
+# ===============================
+# NewsAPI-shaped local server with injectable faults:
+#   latency grows with concurrent requests beyond `capacity`, requests beyond
+#   3x capacity get 429, `error_rate` returns random 500s, and during a brownout
+#   window most requests fail with 503 after a long delay.
+# Point fetch_tickers.py at it with NEWS_API_URL=http://127.0.0.1:8765/v2/everything
+
+
+class FaultConfig:
+    def __init__(self, latency=0.05, capacity=8, error_rate=0.0, brownout=None, brownout_error_rate=0.9):
+        self.latency = latency
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.brownout = brownout  # (start_s, end_s) after server start
+        self.brownout_error_rate = brownout_error_rate
+        self.started = time.monotonic()
+        self.inflight = 0
+        self.lock = threading.Lock()
+
+    def in_brownout(self):
+        if not self.brownout:
+            return False
+        elapsed = time.monotonic() - self.started
+        return self.brownout[0] <= elapsed < self.brownout[1]
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with config.lock:
+                config.inflight += 1
+                inflight = config.inflight
+            try:
+                status, body = self._respond(inflight)
+            finally:
+                with config.lock:
+                    config.inflight -= 1
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _respond(self, inflight):
+            if inflight > config.capacity * 3:
+                return 429, {"status": "error", "code": "rateLimited"}
+            if config.in_brownout():
+                time.sleep(config.latency * 10)
+                if random.random() < config.brownout_error_rate:
+                    return 503, {"status": "error", "code": "unavailable"}
+            time.sleep(config.latency * max(1.0, inflight / config.capacity))
+            if random.random() < config.error_rate:
+                return 500, {"status": "error", "code": "unexpectedError"}
+
+            query = parse_qs(urlparse(self.path).query).get("q", ["TEST"])[0]
+            articles = [
+                {
+                    "source": {"name": "Fake Wire"},
+                    "title": f"{query} headline {i}",
+                    "description": f"Something happened to {query}",
+                    "content": f"{query} content {i}",
+                    "url": f"https://fake.example/{query}/{i}",
+                    "publishedAt": "2025-01-01T00:00:00Z",
+                }
+                for i in range(3)
+            ]
+            return 200, {"status": "ok", "totalResults": len(articles), "articles": articles}
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_fake_provider(config, port=8765, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-provider", daemon=True).start()
+    logging.info(f"Fake provider at http://{host}:{port}/v2/everything")
+    return server
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Fault-injecting fake NewsAPI server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--capacity", type=int, default=8, help="concurrent requests before latency grows")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--brownout", help="START:END seconds after launch, e.g. 30:60")
+    args = parser.parse_args()
+
+    brownout = tuple(float(x) for x in args.brownout.split(":")) if args.brownout else None
+    start_fake_provider(FaultConfig(args.latency, args.capacity, args.error_rate, brownout), args.port)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
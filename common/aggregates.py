@@ -0,0 +1,239 @@
+import bisect
+import heapq
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from operator import itemgetter
+from confluent_kafka import TopicPartition
+from quixstreams import Application
+
+from common.article_store import to_epoch
+from common.metrics import metrics
+
+# ===============================
+# HOT AGGREGATES
+# ===============================
+# In-memory state for the query service, fed from the topics by feed_from_kafka():
+#   mention counts per ticker in minute buckets, with running totals per window
+#   hourly mention timelines per ticker, RETENTION_SECONDS deep
+#   the latest LATEST_PER_TICKER articles per ticker
+# Writers (the feed thread) and readers (the event loop) share one lock; every
+# read is a dict lookup or a heap over ~500 tickers, so it is held for microseconds.
+WINDOWS = {"1h": 3600, "24h": 86400, "7d": 7 * 86400}
+RETENTION_SECONDS = max(WINDOWS.values())
+LATEST_PER_TICKER = 50
+POSTS_TOPIC = "reddit-wsb-posts-kafka"
+NEWS_TOPIC = "raw-news"
+
+
+class HotAggregates:
+    """Windowed mention totals, hourly timelines and latest news, all per ticker"""
+
+    def __init__(self, windows=WINDOWS, latest_per_ticker=LATEST_PER_TICKER):
+        self.windows = windows
+        self.latest_per_ticker = latest_per_ticker
+        self.lock = threading.Lock()
+        self.minutes = defaultdict(Counter)       # minute -> {ticker: mentions}
+        self.hours = defaultdict(Counter)         # ticker -> {hour: mentions}
+        self.totals = {w: Counter() for w in windows}
+        self.news = defaultdict(list)             # ticker -> [(published_ts, url, article)], oldest first
+        self.news_urls = defaultdict(set)
+        self.seen_posts = set()                   # post ids counted, RETENTION_SECONDS deep
+        self.minute_posts = defaultdict(set)      # minute -> post ids, to prune seen_posts
+        now_minute = int(time.time()) // 60
+        self.expired_upto = {w: now_minute - seconds // 60 for w, seconds in windows.items()}
+        self.covered_since = None                 # replay start, set once the feed has caught up
+        self.version = 0
+        self._top_cache = {}
+        self._pruned_minute = now_minute
+
+    # ---- writes (feed thread) ----
+    def add_post(self, value, now=None):
+        created = value.get("created_utc")
+        mentions = value.get("ticker_mentions") or {}
+        if created is None or not mentions:
+            return
+        minute = int(created) // 60
+        post_id = value.get("id")
+        with self.lock:
+            self._advance(now)
+            if minute <= int(now or time.time()) // 60 - RETENTION_SECONDS // 60:
+                return
+            if post_id is not None:
+                if post_id in self.seen_posts:
+                    return  # resent by a producer retry, the spool or a replay; counted once like the DB
+                self.seen_posts.add(post_id)
+                self.minute_posts[minute].add(post_id)
+            bucket = self.minutes[minute]
+            for ticker, count in mentions.items():
+                bucket[ticker] += count
+                self.hours[ticker][minute // 60] += count
+                for w, totals in self.totals.items():
+                    if minute > self.expired_upto[w]:
+                        totals[ticker] += count
+            self.version += 1
+
+    def add_news(self, value):
+        published = to_epoch(value.get("published_at")) or 0
+        url = value.get("url") or f"{value.get('primary_ticker')}:{value.get('title')}"
+        article = {
+            "title": value.get("title"),
+            "url": value.get("url"),
+            "source": value.get("source"),
+            "published_at": value.get("published_at"),
+            "primary_ticker": value.get("primary_ticker"),
+        }
+        tickers = value.get("mentioned_tickers") or [value.get("primary_ticker")]
+        with self.lock:
+            for ticker in filter(None, tickers):
+                if url in self.news_urls[ticker]:
+                    continue  # the same article re-fetched by a later sweep
+                latest = self.news[ticker]
+                bisect.insort(latest, (published, url, article), key=itemgetter(0, 1))
+                self.news_urls[ticker].add(url)
+                if len(latest) > self.latest_per_ticker:
+                    _, dropped, _ = latest.pop(0)
+                    self.news_urls[ticker].discard(dropped)
+            self.version += 1
+
+    def _advance(self, now=None):
+        """Subtract minute buckets that fell out of each window, drop ones past retention"""
+        now_minute = int(now or time.time()) // 60
+        changed = False
+        for w, seconds in self.windows.items():
+            target = now_minute - seconds // 60
+            totals = self.totals[w]
+            for minute in range(self.expired_upto[w] + 1, target + 1):
+                bucket = self.minutes.get(minute)
+                if bucket:
+                    totals.subtract(bucket)
+                    changed = True
+            if target > self.expired_upto[w]:
+                self.expired_upto[w] = target
+        if changed:
+            for w, totals in self.totals.items():
+                for ticker in [t for t, n in totals.items() if n <= 0]:
+                    del totals[ticker]
+            self.version += 1
+
+        if now_minute == self._pruned_minute:
+            return
+        self._pruned_minute = now_minute
+        horizon = now_minute - RETENTION_SECONDS // 60
+        expired = [m for m in self.minutes if m <= horizon]
+        for minute in expired:
+            del self.minutes[minute]
+            self.seen_posts.difference_update(self.minute_posts.pop(minute, ()))
+        if expired:
+            for hours in self.hours.values():
+                for hour in [h for h in hours if h < horizon // 60]:
+                    del hours[hour]
+
+    # ---- reads (event loop) ----
+    def top(self, window, k):
+        """[(ticker, mentions)] with the most mentions in the window, cached until the next change"""
+        with self.lock:
+            self._advance()
+            key = (window, k)
+            cached = self._top_cache.get(key)
+            if cached is not None and cached[0] == self.version:
+                return cached[1]
+            result = heapq.nlargest(k, self.totals[window].items(), key=itemgetter(1))
+            if len(self._top_cache) > 256:
+                self._top_cache.clear()
+            self._top_cache[key] = (self.version, result)
+            return result
+
+    def caught_up(self):
+        return self.covered_since is not None
+
+    def covers(self, since_ts):
+        """True if the feed has replayed back to since_ts, so memory alone can answer"""
+        return (self.covered_since is not None and since_ts >= self.covered_since
+                and since_ts >= time.time() - RETENTION_SECONDS)
+
+    def covers_window(self, window):
+        """True if top(window) is complete: the replay reached back a whole window"""
+        return self.covered_since is not None and self.covered_since <= time.time() - self.windows[window]
+
+    def timeline(self, ticker, since_ts):
+        """[(hour_ts, mentions)] for one ticker from since_ts on, oldest first"""
+        first_hour = int(since_ts) // 3600
+        with self.lock:
+            hours = self.hours.get(ticker)
+            points = sorted((h, n) for h, n in hours.items() if h >= first_hour) if hours else []
+        return [(h * 3600, n) for h, n in points]
+
+    def latest_news(self, ticker, n):
+        """Up to n newest articles for a ticker seen by the feed, newest first"""
+        with self.lock:
+            latest = self.news.get(ticker, ())
+            return [article for _, _, article in reversed(latest[-n:])]
+
+    def news_count(self, ticker):
+        with self.lock:
+            return len(self.news.get(ticker, ()))
+
+
+# ===============================
+# KAFKA FEED
+# ===============================
+def feed_from_kafka(aggregates, broker_address, since_seconds=RETENTION_SECONDS, stop=None):
+    """
+    Replay both topics from now - since_seconds (offsets_for_times), then follow
+    them; a fresh consumer group each start, nothing committed. covered_since
+    is set once the replay reaches the high watermarks. Blocks: run it in a thread
+    """
+    app = Application(
+        broker_address=broker_address,
+        loglevel="WARNING",
+        consumer_group=f"query-service-{int(time.time())}",
+        auto_offset_reset="latest",
+    )
+    handlers = {POSTS_TOPIC: aggregates.add_post, NEWS_TOPIC: aggregates.add_news}
+    start_ms = int((time.time() - since_seconds) * 1000)
+
+    with app.get_consumer(auto_commit_enable=False) as consumer:
+        metadata = consumer.list_topics(timeout=10)
+        wanted = [
+            TopicPartition(topic, p, start_ms)
+            for topic in handlers if topic in metadata.topics
+            for p in metadata.topics[topic].partitions
+        ]
+        starts = consumer.offsets_for_times(wanted, timeout=10)
+        consumer.assign(starts)
+        # Caught up once every partition reaches its high watermark as of now;
+        # until then the aggregates hold part of the window and claim to cover nothing
+        behind = {}
+        for tp in starts:
+            _, high = consumer.get_watermark_offsets(tp, timeout=10)
+            if tp.offset >= 0 and tp.offset < high:
+                behind[(tp.topic, tp.partition)] = high
+        logging.info(f"Query feed replaying {len(behind)}/{len(wanted)} partitions from the last {since_seconds / 3600:.0f}h")
+
+        while stop is None or not stop.is_set():
+            if behind is not None and not behind:
+                aggregates.covered_since = start_ms / 1000
+                behind = None
+                logging.info("Query feed caught up, serving hot queries from memory")
+            msg = consumer.poll(0.5)
+            if msg is None:
+                if behind:
+                    # Transaction markers and compaction leave gaps no message lands on
+                    for tp in consumer.position([TopicPartition(t, p) for t, p in behind]):
+                        if tp.offset >= behind[(tp.topic, tp.partition)]:
+                            del behind[(tp.topic, tp.partition)]
+                continue
+            if msg.error():
+                continue
+            high = behind.get((msg.topic(), msg.partition())) if behind else None
+            if high is not None and msg.offset() + 1 >= high:
+                del behind[(msg.topic(), msg.partition())]
+            try:
+                handlers[msg.topic()](json.loads(msg.value()))
+            except (ValueError, KeyError, TypeError) as e:
+                logging.error(f"Query feed skipping {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}")
+                continue
+            metrics.inc("pipeline_messages_total", stage="query_feed", topic=msg.topic())
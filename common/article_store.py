@@ -0,0 +1,286 @@
+import logging
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+# ===============================
+# STORE CONFIG
+# ===============================
+ARTICLE_DB = os.getenv("ARTICLE_DB", "data/articles.db")
+FTS_HASH_BYTES = 1024 * 1024  # FTS5's default in-memory term buffer per segment flush
+BULK_FTS_HASH_BYTES = 64 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id INTEGER PRIMARY KEY,
+    ext_id TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    primary_ticker TEXT,
+    title TEXT,
+    description TEXT,
+    content TEXT,
+    url TEXT,
+    source TEXT,
+    published_ts INTEGER
+);
+CREATE INDEX IF NOT EXISTS documents_published ON documents (published_ts);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    title, description, content,
+    content='documents', content_rowid='doc_id',
+    tokenize='porter unicode61'
+);
+
+CREATE TABLE IF NOT EXISTS ticker_docs (
+    ticker TEXT NOT NULL,
+    doc_id INTEGER NOT NULL,
+    mentions INTEGER NOT NULL,
+    published_ts INTEGER,
+    PRIMARY KEY (ticker, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ticker_docs_time ON ticker_docs (ticker, published_ts);
+"""
+
+
+def to_epoch(value):
+    """NewsAPI ISO strings and Reddit created_utc ints -> unix seconds"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp())
+    except ValueError:
+        return None
+
+
+def news_document(msg):
+    """raw-news message -> (document row, {ticker: mentions})"""
+    tickers = msg.get("mentioned_tickers") or [msg.get("primary_ticker")]
+    row = (
+        msg.get("url") or f"{msg.get('primary_ticker')}:{msg.get('title')}",
+        "news",
+        msg.get("primary_ticker"),
+        msg.get("title") or "",
+        msg.get("description") or "",
+        msg.get("content") or "",
+        msg.get("url"),
+        msg.get("source"),
+        to_epoch(msg.get("published_at")),
+    )
+    return row, {t: 1 for t in tickers if t}
+
+
+def post_document(post):
+    """reddit-wsb-posts-kafka message -> (document row, {ticker: mentions})"""
+    content = post.get("content") or ""
+    row = (
+        f"reddit:{post.get('id')}",
+        "post",
+        post.get("ticker"),
+        " ".join(content.split()[:10]),
+        "",
+        content,
+        post.get("url"),
+        "reddit",
+        to_epoch(post.get("created_utc")),
+    )
+    return row, post.get("ticker_mentions") or {}
+
+
+class ArticleStore:
+    """
+    Local SQLite (WAL) store for articles and posts
+    FTS5 over title/description/content plus a ticker -> doc_id index
+    """
+
+    def __init__(self, path=ARTICLE_DB):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _insert(self, documents, index_fts=True):
+        """
+        Insert (row, mentions) pairs inside the caller's transaction
+        Returns the doc_id watermark so FTS rows can be added for new docs only
+        """
+        (watermark,) = self.conn.execute("SELECT COALESCE(MAX(doc_id), 0) FROM documents").fetchone()
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO documents "
+            "(ext_id, kind, primary_ticker, title, description, content, url, source, published_ts) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [row for row, _ in documents],
+        )
+        # No watermark here: an article already stored (same URL, fetched for
+        # another ticker) still gets this batch's ticker rows
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO ticker_docs (ticker, doc_id, mentions, published_ts) "
+            "SELECT ?, doc_id, ?, published_ts FROM documents WHERE ext_id = ?",
+            [(ticker, count, row[0]) for row, mentions in documents for ticker, count in mentions.items()],
+        )
+        if index_fts:
+            self._index_since(watermark)
+        return watermark
+
+    def _index_since(self, watermark):
+        self.conn.execute(
+            "INSERT INTO documents_fts (rowid, title, description, content) "
+            "SELECT doc_id, title, description, content FROM documents WHERE doc_id > ?",
+            (watermark,),
+        )
+
+    def write_batch(self, documents):
+        """One transaction per micro-batch of (row, mentions) pairs"""
+        if not documents:
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._insert(documents)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def add_news(self, messages):
+        self.write_batch([news_document(m) for m in messages])
+
+    def add_posts(self, posts):
+        self.write_batch([post_document(p) for p in posts])
+
+    def bulk_load(self, documents, batch_size=20000):
+        """
+        Backfill path: large transactions with relaxed fsync, doc_ids assigned
+        here so ticker_docs rows need no lookup, and one FTS pass at the end
+        with a hash table big enough to write few segments
+        """
+        self.conn.execute("PRAGMA synchronous=OFF")
+        (watermark,) = self.conn.execute("SELECT COALESCE(MAX(doc_id), 0) FROM documents").fetchone()
+        loaded = 0
+        batch = []
+        try:
+            for document in documents:
+                batch.append(document)
+                if len(batch) >= batch_size:
+                    loaded += self._bulk_batch(batch)
+                    batch = []
+            if batch:
+                loaded += self._bulk_batch(batch)
+
+            self.conn.execute(f"INSERT INTO documents_fts (documents_fts, rank) VALUES ('hashsize', {BULK_FTS_HASH_BYTES})")
+            self.conn.execute("BEGIN")
+            self._index_since(watermark)
+            self.conn.execute("COMMIT")
+            self.conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
+        finally:
+            self.conn.execute(f"INSERT INTO documents_fts (documents_fts, rank) VALUES ('hashsize', {FTS_HASH_BYTES})")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        logging.info(f"Bulk loaded {loaded} new documents into {self.path}")
+        return loaded
+
+    def _bulk_batch(self, batch):
+        """Insert the batch's new documents and their ticker rows; returns how many were new"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Under the write lock, so ids can't collide with a live sink's inserts
+            (next_id,) = self.conn.execute("SELECT COALESCE(MAX(doc_id), 0) + 1 FROM documents").fetchone()
+            stored = self._stored_docs([row[0] for row, _ in batch])  # ext_id -> (doc_id, published_ts)
+            rows, ticker_rows = [], []
+            for row, mentions in batch:
+                if row[0] not in stored:
+                    stored[row[0]] = (next_id, row[8])
+                    rows.append((next_id,) + row)
+                    next_id += 1
+                # A repeat of a stored article still adds the tickers it came in under
+                doc_id, published_ts = stored[row[0]]
+                ticker_rows.extend((ticker, doc_id, count, published_ts) for ticker, count in mentions.items())
+            self.conn.executemany(
+                "INSERT INTO documents "
+                "(doc_id, ext_id, kind, primary_ticker, title, description, content, url, source, published_ts) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO ticker_docs (ticker, doc_id, mentions, published_ts) VALUES (?, ?, ?, ?)",
+                ticker_rows,
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def _stored_docs(self, ext_ids, chunk=500):
+        found = {}
+        for i in range(0, len(ext_ids), chunk):
+            part = ext_ids[i:i + chunk]
+            for ext_id, doc_id, published_ts in self.conn.execute(
+                    f"SELECT ext_id, doc_id, published_ts FROM documents WHERE ext_id IN ({','.join('?' * len(part))})",
+                    part):
+                found[ext_id] = (doc_id, published_ts)
+        return found
+
+    def search(self, text=None, tickers=(), since=None, until=None, limit=50):
+        """
+        Articles matching an FTS5 query and mentioning every ticker in `tickers`
+        e.g. search("guidance", tickers=["MSFT"], since=week_ago)
+        """
+        since_ts, until_ts = to_epoch_arg(since), to_epoch_arg(until)
+        clauses, params = [], []
+
+        for ticker in tickers:
+            sub = "d.doc_id IN (SELECT doc_id FROM ticker_docs WHERE ticker = ?"
+            params.append(ticker.upper())
+            if since_ts is not None:
+                sub += " AND published_ts >= ?"
+                params.append(since_ts)
+            if until_ts is not None:
+                sub += " AND published_ts < ?"
+                params.append(until_ts)
+            clauses.append(sub + ")")
+
+        if since_ts is not None:
+            clauses.append("d.published_ts >= ?")
+            params.append(since_ts)
+        if until_ts is not None:
+            clauses.append("d.published_ts < ?")
+            params.append(until_ts)
+
+        columns_sql = "SELECT d.doc_id, d.kind, d.primary_ticker, d.title, d.url, d.published_ts"
+        if text and not tickers:
+            sql = f"{columns_sql} FROM documents_fts JOIN documents d ON d.doc_id = documents_fts.rowid " \
+                  "WHERE documents_fts MATCH ?"
+            params.insert(0, text)
+            order = "ORDER BY rank"
+        else:
+            # The ticker index is far more selective than a common word, so drive
+            # from it and probe FTS per candidate rowid
+            sql = f"{columns_sql} FROM documents d WHERE 1 = 1"
+            if text:
+                clauses.append("EXISTS (SELECT 1 FROM documents_fts "
+                               "WHERE documents_fts MATCH ? AND documents_fts.rowid = d.doc_id)")
+                params.append(text)
+            order = "ORDER BY d.published_ts DESC"
+
+        for clause in clauses:
+            sql += f" AND {clause}"
+        sql += f" {order} LIMIT ?"
+        params.append(limit)
+
+        columns = ("doc_id", "kind", "primary_ticker", "title", "url", "published_ts")
+        return [dict(zip(columns, row)) for row in self.conn.execute(sql, params)]
+
+
+def to_epoch_arg(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return to_epoch(value)
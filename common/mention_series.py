@@ -0,0 +1,266 @@
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from common.metrics import metrics
+from common.reddit_rows import TICKERS_TABLE
+
+# ===============================
+# SERIES CONFIG
+# ===============================
+# Per-ticker mention time series next to the running total in wallstreetbets_ticker:
+#   wallstreetbets_post_mentions  one row per (post, ticker), the source of truth
+#   wallstreetbets_mentions_1m    minute buckets by post time, written by the consumer
+#   wallstreetbets_mentions_1h/1d rebuilt by the rollup from the hours that changed
+# wsb_add_mentions() inserts post mentions ON CONFLICT DO NOTHING and adds only
+# the newly inserted ones to the minute buckets and to wallstreetbets_ticker's
+# total_mentions, so a redelivered post is a no-op. It also queues the touched
+# (ticker, hour) pairs for wsb_rollup_mentions().
+POST_MENTIONS_TABLE = "wallstreetbets_post_mentions"
+SERIES_TABLES = {
+    "1m": "wallstreetbets_mentions_1m",
+    "1h": "wallstreetbets_mentions_1h",
+    "1d": "wallstreetbets_mentions_1d",
+}
+DIRTY_TABLE = "wallstreetbets_mentions_dirty"
+ADD_MENTIONS_RPC = "wsb_add_mentions"
+ROLLUP_RPC = "wsb_rollup_mentions"
+FLUSH_ROWS = 500
+FLUSH_SECONDS = 2.0
+PAGE_SIZE = 1000
+
+_BUCKET_TABLE = """
+CREATE TABLE IF NOT EXISTS {table} (
+    ticker text NOT NULL,
+    bucket timestamptz NOT NULL,
+    mentions integer NOT NULL,
+    posts integer NOT NULL,
+    updated_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (ticker, bucket)
+);
+CREATE INDEX IF NOT EXISTS {table}_bucket ON {table} (bucket);
+"""
+
+SCHEMA_SQL = f"""
+CREATE TABLE IF NOT EXISTS {POST_MENTIONS_TABLE} (
+    post_id text NOT NULL,
+    ticker text NOT NULL,
+    mentions integer NOT NULL,
+    created_at timestamptz NOT NULL,
+    PRIMARY KEY (post_id, ticker)
+);
+{''.join(_BUCKET_TABLE.format(table=t) for t in SERIES_TABLES.values())}
+CREATE TABLE IF NOT EXISTS {DIRTY_TABLE} (
+    ticker text NOT NULL,
+    hour timestamptz NOT NULL,
+    PRIMARY KEY (ticker, hour)
+);
+
+CREATE OR REPLACE FUNCTION {ADD_MENTIONS_RPC}(batch jsonb) RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    added integer;
+BEGIN
+    WITH fresh AS (
+        INSERT INTO {POST_MENTIONS_TABLE} (post_id, ticker, mentions, created_at)
+        SELECT r.post_id, r.ticker, r.mentions, to_timestamp(r.created_utc)
+        FROM jsonb_to_recordset(batch) AS r(post_id text, ticker text, mentions integer, created_utc bigint)
+        ON CONFLICT (post_id, ticker) DO NOTHING
+        RETURNING ticker, mentions, created_at
+    ), minutes AS (
+        INSERT INTO {SERIES_TABLES['1m']} AS m (ticker, bucket, mentions, posts)
+        SELECT ticker, date_trunc('minute', created_at), sum(mentions), count(*)
+        FROM fresh GROUP BY 1, 2
+        ON CONFLICT (ticker, bucket) DO UPDATE
+            SET mentions = m.mentions + excluded.mentions,
+                posts = m.posts + excluded.posts,
+                updated_at = now()
+        RETURNING ticker, bucket
+    ), queued AS (
+        -- DO UPDATE, not DO NOTHING: it locks an already queued pair until this
+        -- transaction commits, so a concurrent rollup's DELETE waits for it and
+        -- then recomputes the hour with these minutes included
+        INSERT INTO {DIRTY_TABLE} (ticker, hour)
+        SELECT DISTINCT ticker, date_trunc('hour', bucket) FROM minutes
+        ORDER BY 1, 2
+        ON CONFLICT (ticker, hour) DO UPDATE SET hour = excluded.hour
+    ), totals AS (
+        UPDATE {TICKERS_TABLE} t
+        SET total_mentions = t.total_mentions + f.mentions, last_update = now()
+        FROM (SELECT ticker, sum(mentions) AS mentions FROM fresh GROUP BY ticker) f
+        WHERE t.ticker = f.ticker
+    )
+    SELECT count(*) INTO added FROM fresh;
+    RETURN added;
+END $$;
+
+-- Hours are recomputed from their minutes and days from their hours (absolute
+-- values, so a rollup can be rerun). The DELETE waits for writers holding a
+-- queued pair, and each later statement takes a fresh snapshot, so it sees their
+-- minutes; pairs first queued by a transaction that commits after the DELETE
+-- stay queued for the next run.
+CREATE OR REPLACE FUNCTION {ROLLUP_RPC}() RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    hours integer;
+BEGIN
+    CREATE TEMP TABLE changed ON COMMIT DROP AS
+        WITH taken AS (DELETE FROM {DIRTY_TABLE} RETURNING ticker, hour)
+        SELECT DISTINCT ticker, hour FROM taken;
+
+    INSERT INTO {SERIES_TABLES['1h']} AS h (ticker, bucket, mentions, posts)
+    SELECT c.ticker, c.hour, sum(m.mentions), sum(m.posts)
+    FROM changed c
+    JOIN {SERIES_TABLES['1m']} m
+      ON m.ticker = c.ticker AND m.bucket >= c.hour AND m.bucket < c.hour + interval '1 hour'
+    GROUP BY 1, 2
+    ON CONFLICT (ticker, bucket) DO UPDATE
+        SET mentions = excluded.mentions, posts = excluded.posts, updated_at = now();
+    GET DIAGNOSTICS hours = ROW_COUNT;
+
+    INSERT INTO {SERIES_TABLES['1d']} AS d (ticker, bucket, mentions, posts)
+    SELECT c.ticker, c.day, sum(h.mentions), sum(h.posts)
+    FROM (SELECT DISTINCT ticker, date_trunc('day', hour) AS day FROM changed) c
+    JOIN {SERIES_TABLES['1h']} h
+      ON h.ticker = c.ticker AND h.bucket >= c.day AND h.bucket < c.day + interval '1 day'
+    GROUP BY 1, 2
+    ON CONFLICT (ticker, bucket) DO UPDATE
+        SET mentions = excluded.mentions, posts = excluded.posts, updated_at = now();
+
+    RETURN hours;
+END $$;
+"""
+
+
+def mention_rows(value):
+    """wsb_add_mentions() rows for one post message: one per mentioned ticker"""
+    post_id = value.get("id")
+    created_utc = value.get("created_utc")
+    if not post_id or created_utc is None:
+        return []
+    mentions = value.get("ticker_mentions") or {}
+    return [
+        {"post_id": post_id, "ticker": ticker, "mentions": int(count), "created_utc": int(created_utc)}
+        for ticker, count in mentions.items() if count
+    ]
+
+
+def add_mentions(client, rows):
+    """
+    One batched, idempotent write of post mention rows into the minute buckets
+    and the running totals; returns how many rows were new (the rest were
+    already applied)
+    """
+    if not rows:
+        return 0
+    with metrics.timer("supabase_write", table=SERIES_TABLES["1m"]):
+        added = client.rpc(ADD_MENTIONS_RPC, {"batch": rows}).execute().data or 0
+    metrics.inc("pipeline_mention_rows_total", value=added, status="added")
+    metrics.inc("pipeline_mention_rows_total", value=len(rows) - added, status="duplicate")
+    return added
+
+
+class MentionBuffer:
+    """
+    Collects mention rows across messages for one add_mentions() call
+    The caller stores offsets only after flush(), so rows are never lost
+    """
+
+    def __init__(self, client, max_rows=FLUSH_ROWS, max_seconds=FLUSH_SECONDS):
+        self.client = client
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.rows = []
+        self.sources = []  # (source, rows) per add() with rows, in buffer order
+        self._started = None
+
+    def add(self, value, source=None):
+        rows = mention_rows(value)
+        if rows and not self.rows:
+            self._started = time.monotonic()
+        if rows:
+            self.sources.append((source, rows))
+        self.rows.extend(rows)
+
+    def due(self):
+        return bool(self.rows) and (
+            len(self.rows) >= self.max_rows or time.monotonic() - self._started >= self.max_seconds
+        )
+
+    def flush(self):
+        """Write the buffered rows; on failure they stay buffered for the next flush"""
+        written = add_mentions(self.client, self.rows)
+        self.rows = []
+        self.sources = []
+        return written
+
+    def flush_each(self, on_error):
+        """
+        Write the buffered rows source by source; a failed source goes to
+        on_error(source, error) and is dropped unless on_error raises, which
+        leaves it and the sources after it buffered
+        """
+        written = 0
+        while self.sources:
+            source, rows = self.sources[0]
+            try:
+                written += add_mentions(self.client, rows)
+            except Exception as e:
+                on_error(source, e)
+            self.sources.pop(0)
+            del self.rows[:len(rows)]
+        return written
+
+
+# ===============================
+# ROLLUP / READ
+# ===============================
+def rollup(client):
+    """Rebuild the hour and day buckets for every hour touched since the last rollup"""
+    with metrics.timer("mention_rollup"):
+        hours = client.rpc(ROLLUP_RPC, {}).execute().data
+    metrics.inc("pipeline_rollup_buckets_total", value=hours or 0, resolution="1h")
+    return hours or 0
+
+
+def read_series(client, ticker, start, end=None, resolution="1h"):
+    """[(bucket, mentions, posts)] for one ticker over [start, end), oldest first"""
+    def query():
+        q = (client.table(SERIES_TABLES[resolution])
+             .select("bucket,mentions,posts")
+             .eq("ticker", ticker)
+             .gte("bucket", _iso(start)))
+        return (q.lt("bucket", _iso(end)) if end is not None else q).order("bucket")
+
+    return [(row["bucket"], row["mentions"], row["posts"]) for row in _paged(query)]
+
+
+def read_totals(client, start, resolution="1d"):
+    """Counter of mentions per ticker since start, summed from one series table"""
+    def query():
+        return (client.table(SERIES_TABLES[resolution])
+                .select("ticker,mentions")
+                .gte("bucket", _iso(start))
+                .order("bucket").order("ticker"))
+
+    totals = Counter()
+    for row in _paged(query):
+        totals[row["ticker"]] += row["mentions"]
+    return totals
+
+
+def _paged(make_query, page_size=PAGE_SIZE):
+    """All rows of a query, PostgREST caps each response at its max-rows (1000)"""
+    rows, start = [], 0
+    while True:
+        page = make_query().range(start, start + page_size - 1).execute().data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+
+def _iso(moment):
+    if isinstance(moment, datetime):
+        return (moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)).isoformat()
+    return moment
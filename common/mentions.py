@@ -0,0 +1,186 @@
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# ===============================
+# BATCH MENTION EXTRACTION
+# ===============================
+# Same semantics as count_tickers(): a match is a whole word (a maximal run of
+# \w characters, as \b sees it) of 3-5 letters whose uppercase is a search term.
+# Texts are tokenized as one code point array per chunk; each candidate word is
+# packed into an int (5 bits per letter) and looked up in a sorted hash vocabulary.
+CHUNK_SIZE = 20_000
+SEPARATOR = "\x00"  # non-word, so it never joins two texts into one word
+_MATCHABLE = re.compile(r'[A-Z]{3,5}')
+# Non-ASCII code points that re.IGNORECASE lets [A-Z] match, with their .upper() letter;
+# DOTTED_I uppercases to itself, so it counts as a letter but can never be a ticker
+DOTTED_I = 27
+_SPECIAL_LETTERS = {0x0131: ord("I") - 64, 0x017F: ord("S") - 64, 0x212A: ord("K") - 64, 0x0130: DOTTED_I}
+
+_vocab_hashes = None
+_vocab_cols = None
+
+
+class MentionMatrix:
+    """
+    Sparse post x ticker count matrix in COO form, rows sorted
+    rows[i], cols[i] -> counts[i]; tickers[col] is the column label
+    """
+
+    def __init__(self, rows, cols, counts, tickers, n_posts):
+        self.rows = rows
+        self.cols = cols
+        self.counts = counts
+        self.tickers = tickers
+        self.shape = (n_posts, len(tickers))
+
+    @property
+    def nnz(self):
+        return len(self.counts)
+
+    def to_scipy(self):
+        """CSR matrix; scipy is only needed if you ask for it"""
+        from scipy.sparse import csr_matrix
+        return csr_matrix((self.counts, (self.rows, self.cols)), shape=self.shape)
+
+    def to_frame(self):
+        """Long format: one row per (post, ticker) with a non-zero count"""
+        return pd.DataFrame({
+            "post": self.rows,
+            "ticker": self.tickers[self.cols],
+            "count": self.counts,
+        })
+
+    def row(self, post):
+        """{ticker: count} for one post, comparable to count_tickers()"""
+        start, end = np.searchsorted(self.rows, [post, post + 1])
+        return {self.tickers[c]: int(n) for c, n in zip(self.cols[start:end], self.counts[start:end])}
+
+    def totals(self):
+        """Total mentions per ticker across all posts"""
+        return pd.Series(
+            np.bincount(self.cols, weights=self.counts, minlength=len(self.tickers)).astype(np.int64),
+            index=self.tickers,
+        ).sort_values(ascending=False)
+
+
+def build_vocabulary(search_terms):
+    """Sorted array of the search terms a 3-5 letter token can actually equal"""
+    return np.array(sorted(t for t in search_terms if _MATCHABLE.fullmatch(t)), dtype=object)
+
+
+def pack_word(word):
+    """A=1..Z=26, 5 bits per letter, first letter lowest; unique for 1-12 letter words"""
+    return sum((ord(c) - 64) << (5 * i) for i, c in enumerate(word))
+
+
+def _init_worker(tickers):
+    global _vocab_hashes, _vocab_cols
+    hashes = np.array([pack_word(t) for t in tickers], dtype=np.int64)
+    order = np.argsort(hashes)
+    _vocab_hashes, _vocab_cols = hashes[order], order
+
+
+# ASCII lookup tables: letter code (A/a=1 .. Z/z=26, 0 = not a letter) and \w membership
+_ASCII_CODE = np.zeros(128, dtype=np.uint8)
+_ASCII_WORD = np.zeros(128, dtype=bool)
+for _c in range(128):
+    if chr(_c).isalpha():
+        _ASCII_CODE[_c] = ord(chr(_c).upper()) - 64
+    _ASCII_WORD[_c] = chr(_c).isalnum() or chr(_c) == "_"
+
+
+def _classify(joined):
+    """
+    Per code point: letter code (0 = not a letter) and whether it is a \\w character,
+    plus the positions of the separators between texts
+    """
+    if joined.isascii():
+        cp = np.frombuffer(joined.encode("ascii"), dtype=np.uint8)
+        return _ASCII_CODE[cp], _ASCII_WORD[cp], np.flatnonzero(cp == 0)
+
+    cp = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32)
+    non_ascii = cp >= 128
+    ascii_cp = np.where(non_ascii, 0, cp)
+    code, word = _ASCII_CODE[ascii_cp], _ASCII_WORD[ascii_cp]
+
+    unique = np.unique(cp[non_ascii])
+    is_word = np.array([chr(c).isalnum() or c in _SPECIAL_LETTERS for c in unique])
+    letter = np.array([_SPECIAL_LETTERS.get(c, 0) for c in unique], dtype=np.uint8)
+    slot = np.searchsorted(unique, cp[non_ascii])
+    word[non_ascii] = is_word[slot]
+    code[non_ascii] = letter[slot]
+    return code, word, np.flatnonzero(cp == 0)
+
+
+def _extract_chunk(args):
+    texts, offset = args
+    empty = np.empty(0, dtype=np.int64)
+    if not len(_vocab_hashes):
+        return empty, empty, empty
+
+    joined = SEPARATOR.join(t if isinstance(t, str) else "" for t in texts)
+    if joined.count(SEPARATOR) != len(texts) - 1:
+        joined = SEPARATOR.join(t.replace(SEPARATOR, " ") if isinstance(t, str) else "" for t in texts)
+    code, word, separators = _classify(joined)
+
+    # Maximal word runs, as \b delimits them
+    edges = np.flatnonzero(np.diff(word.view(np.int8), prepend=0, append=0))
+    starts, ends = edges[0::2], edges[1::2]
+    lengths = ends - starts
+    keep = (lengths >= 3) & (lengths <= 5)
+    starts, lengths = starts[keep], lengths[keep]
+
+    # Pack each 3-5 character run; runs holding digits, '_' or other letters drop out
+    hashes = np.zeros(len(starts), dtype=np.int64)
+    all_letters = np.ones(len(starts), dtype=bool)
+    for i in range(5):
+        present = np.flatnonzero(lengths > i)
+        letters = code[starts[present] + i].astype(np.int64)
+        all_letters[present] &= letters > 0
+        hashes[present] |= letters << (5 * i)
+    starts, hashes = starts[all_letters], hashes[all_letters]
+
+    slot = np.minimum(np.searchsorted(_vocab_hashes, hashes), len(_vocab_hashes) - 1)
+    hit = _vocab_hashes[slot] == hashes
+    cols = _vocab_cols[slot[hit]]
+    rows = np.searchsorted(separators, starts[hit]) + offset
+
+    # One (row, col) key per mention; unique+counts is the per-post Counter
+    width = len(_vocab_hashes)
+    keys, counts = np.unique(rows * width + cols, return_counts=True)
+    return keys // width, keys % width, counts.astype(np.int64)
+
+
+def extract_mentions(texts, search_terms, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Count ticker mentions for a column of texts (pandas Series, list, or Arrow array)
+    Chunks are tokenized with numpy array ops across a process pool
+    Returns a MentionMatrix with one row per input text
+    """
+    if hasattr(texts, "to_pandas"):  # pyarrow Array / ChunkedArray
+        texts = texts.to_pandas()
+    texts = pd.Series(texts, dtype=object).reset_index(drop=True)
+    tickers = build_vocabulary(search_terms)
+
+    chunks = [(texts.iloc[i:i + chunk_size].to_list(), i) for i in range(0, len(texts), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(chunks) == 1:
+        _init_worker(tickers)
+        results = [_extract_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tickers,)) as pool:
+            results = list(pool.map(_extract_chunk, chunks))
+
+    if results:
+        rows, cols, counts = (np.concatenate(parts) for parts in zip(*results))
+    else:
+        rows = cols = counts = np.empty(0, dtype=np.int64)
+
+    logging.info(f"Extracted {len(counts)} post/ticker pairs from {len(texts)} texts with {workers} workers")
+    return MentionMatrix(rows, cols, counts, tickers, len(texts))
@@ -0,0 +1,110 @@
+import json
+from datetime import datetime, timezone
+from json.encoder import encode_basestring_ascii
+
+# ===============================
+# MESSAGE MODEL
+# ===============================
+# Field order and names are the wire schema of raw-news / reddit-wsb-posts-kafka;
+# consumers keep reading plain dicts via json.loads(msg.value()).
+_dump_list = json.JSONEncoder(separators=(",", ":")).encode
+
+
+def _str(value):
+    """JSON string literal (ASCII-escaped, like json.dumps) for possibly-missing text"""
+    return encode_basestring_ascii(value) if value is not None else "null"
+
+
+def batch_timestamp():
+    """One fetched_at per sweep batch instead of a strftime per message"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class RawNewsMessage:
+    """raw-news record; encode() writes the JSON bytes in a single pass"""
+    __slots__ = ("primary_ticker", "mentioned_tickers", "title", "description", "content",
+                 "url", "source", "published_at", "fetched_at")
+
+    def __init__(self, primary_ticker, mentioned_tickers, title, description, content,
+                 url, source, published_at, fetched_at):
+        self.primary_ticker = primary_ticker
+        self.mentioned_tickers = mentioned_tickers
+        self.title = title
+        self.description = description
+        self.content = content
+        self.url = url
+        self.source = source
+        self.published_at = published_at
+        self.fetched_at = fetched_at
+
+    @classmethod
+    def from_article(cls, article, primary_ticker, mentioned_tickers, fetched_at):
+        get = article.get
+        source = get('source')
+        return cls(
+            primary_ticker,
+            mentioned_tickers,
+            get('title', ''),
+            get('description', ''),
+            get('content', ''),
+            get('url', ''),
+            source.get('name', '') if source else '',
+            get('publishedAt', ''),
+            fetched_at,
+        )
+
+    def encode(self):
+        return (
+            '{"primary_ticker":' + _str(self.primary_ticker)
+            + ',"mentioned_tickers":' + _dump_list(self.mentioned_tickers)
+            + ',"title":' + _str(self.title)
+            + ',"description":' + _str(self.description)
+            + ',"content":' + _str(self.content)
+            + ',"url":' + _str(self.url)
+            + ',"source":' + _str(self.source)
+            + ',"published_at":' + _str(self.published_at)
+            + ',"fetched_at":' + _str(self.fetched_at)
+            + '}'
+        ).encode("ascii")
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class RedditPost:
+    """reddit-wsb-posts-kafka record; encode() writes the JSON bytes in a single pass"""
+    __slots__ = ("id", "type", "ticker", "content", "author", "score", "num_comments",
+                 "url", "created_utc", "created", "ticker_mentions")
+
+    def __init__(self, id, ticker, content, author, score, num_comments, url, created_utc,
+                 ticker_mentions, type="post"):
+        self.id = id
+        self.type = type
+        self.ticker = ticker
+        self.content = content
+        self.author = author
+        self.score = score
+        self.num_comments = num_comments
+        self.url = url
+        self.created_utc = int(created_utc)
+        self.created = datetime.fromtimestamp(created_utc).isoformat()
+        self.ticker_mentions = ticker_mentions
+
+    def encode(self):
+        mentions = ",".join(f"{encode_basestring_ascii(k)}:{int(v)}" for k, v in self.ticker_mentions.items())
+        return (
+            '{"id":' + _str(self.id)
+            + ',"type":' + _str(self.type)
+            + ',"ticker":' + _str(self.ticker)
+            + ',"content":' + _str(self.content)
+            + ',"author":' + _str(self.author)
+            + ',"score":' + str(int(self.score))
+            + ',"num_comments":' + str(int(self.num_comments))
+            + ',"url":' + _str(self.url)
+            + ',"created_utc":' + str(self.created_utc)
+            + ',"created":' + _str(self.created)
+            + ',"ticker_mentions":{' + mentions + '}}'
+        ).encode("ascii")
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
@@ -0,0 +1,235 @@
+import atexit
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ===============================
+# METRICS CONFIG
+# ===============================
+# METRICS_PORT=9108 serves Prometheus text at /metrics (and JSON at /metrics.json)
+# METRICS_DUMP=data/metrics.json writes a JSON snapshot every METRICS_DUMP_INTERVAL seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+TRACE_ID_HEADER = "trace_id"
+TRACE_START_HEADER = "trace_start_ns"
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram; percentiles are interpolated within buckets"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if seen + c >= rank and c:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+
+class Registry:
+    """Thread-safe counters, gauges and histograms keyed by name + labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        """Time a block into pipeline_stage_seconds{stage=...}"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("pipeline_stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            for kind, items in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted({n for n, _ in items}):
+                    lines.append(f"# TYPE {name} {kind}")
+                    for (n, labels), value in sorted(items.items()):
+                        if n == name:
+                            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+            for name in sorted({n for n, _ in self.histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (n, labels), h in sorted(self.histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, c in zip(list(h.buckets) + ["+Inf"], h.counts):
+                        cumulative += c
+                        lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {h.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """JSON-friendly view with p50/p95/p99 per histogram"""
+        def name_with(name, labels):
+            return name + _format_labels(labels)
+
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "counters": {name_with(n, l): v for (n, l), v in sorted(self.counters.items())},
+                "gauges": {name_with(n, l): v for (n, l), v in sorted(self.gauges.items())},
+                "histograms": {
+                    name_with(n, l): {
+                        "count": h.count,
+                        "sum": round(h.sum, 6),
+                        "p50": round(h.percentile(0.50), 6),
+                        "p95": round(h.percentile(0.95), 6),
+                        "p99": round(h.percentile(0.99), 6),
+                    }
+                    for (n, l), h in sorted(self.histograms.items())
+                },
+            }
+
+
+metrics = Registry()
+
+
+# ===============================
+# EXPORT
+# ===============================
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = metrics.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(metrics.snapshot()).encode("utf-8"), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logging.info(f"Metrics served at http://{host}:{port}/metrics")
+    return server
+
+
+def start_json_dump(filename, interval=30.0):
+    def dump_forever():
+        while True:
+            time.sleep(interval)
+            save_snapshot(filename)
+
+    threading.Thread(target=dump_forever, name="metrics-dump", daemon=True).start()
+    logging.info(f"Metrics dumped to {filename} every {interval}s")
+
+
+def save_snapshot(filename):
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    tmp = f"{filename}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(metrics.snapshot(), f, indent=2)
+    os.replace(tmp, filename)
+
+
+def start_from_env(service):
+    """Called by every entry point; starts whichever exporters the env asks for"""
+    metrics.set_gauge("pipeline_start_time_seconds", time.time(), service=service)
+    port = os.getenv("METRICS_PORT")
+    if port:
+        start_http_server(int(port))
+    dump = os.getenv("METRICS_DUMP")
+    if dump:
+        start_json_dump(dump, float(os.getenv("METRICS_DUMP_INTERVAL", "30")))
+        atexit.register(save_snapshot, dump)  # one-shot runs exit before the first interval
+
+
+# ===============================
+# TRACING
+# ===============================
+def trace_headers(trace_id=None, start_ns=None):
+    """Kafka headers carrying a per-message trace id and its start time"""
+    return [
+        (TRACE_ID_HEADER, trace_id or uuid.uuid4().hex),
+        (TRACE_START_HEADER, str(start_ns or time.time_ns())),
+    ]
+
+
+def read_trace(headers):
+    """(trace_id, start_ns) from a consumed message's headers, or (None, None)"""
+    trace_id, start_ns = None, None
+    for k, v in headers or []:
+        if isinstance(v, bytes):
+            v = v.decode("utf-8", "replace")
+        if k == TRACE_ID_HEADER:
+            trace_id = v
+        elif k == TRACE_START_HEADER:
+            start_ns = int(v)
+    return trace_id, start_ns
+
+
+def observe_end_to_end(headers, topic):
+    """Record produce-to-done latency for a traced message; returns the trace id"""
+    trace_id, start_ns = read_trace(headers)
+    if start_ns:
+        latency = (time.time_ns() - start_ns) / 1e9
+        metrics.observe("pipeline_end_to_end_seconds", latency, topic=topic)
+        logging.debug(f"trace {trace_id}: {latency:.3f}s end to end")
+    return trace_id
@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+# ===============================
+# PARTITIONING CONFIG
+# ===============================
+# Mega-caps that dominate raw-news traffic; extend with HEAVY_KEYS=AAPL,TSLA,...
+DEFAULT_HEAVY_KEYS = "AAPL,TSLA,NVDA,MSFT,AMZN,META,GOOGL,GOOG"
+SALT_SEP = "#"
+SALT_BUCKETS = int(os.getenv("SALT_BUCKETS", "8"))
+# A key whose share of recent traffic exceeds this is salted even if not listed
+HEAVY_SHARE = float(os.getenv("HEAVY_SHARE", "0.02"))
+MIN_SAMPLES = 1000
+
+
+def murmur2(data):
+    """Kafka's murmur2 hash, as used by quixstreams' default "murmur2" partitioner"""
+    length = len(data)
+    seed = 0x9747B28C
+    m = 0x5BD1E995
+    r = 24
+    h = (seed ^ length) & 0xFFFFFFFF
+
+    for i in range(0, length - length % 4, 4):
+        k = data[i] | (data[i + 1] << 8) | (data[i + 2] << 16) | (data[i + 3] << 24)
+        k = (k * m) & 0xFFFFFFFF
+        k ^= k >> r
+        k = (k * m) & 0xFFFFFFFF
+        h = (h * m) & 0xFFFFFFFF
+        h ^= k
+
+    extra = length % 4
+    tail = length - extra
+    if extra == 3:
+        h ^= data[tail + 2] << 16
+    if extra >= 2:
+        h ^= data[tail + 1] << 8
+    if extra >= 1:
+        h ^= data[tail]
+        h = (h * m) & 0xFFFFFFFF
+
+    h ^= h >> 13
+    h = (h * m) & 0xFFFFFFFF
+    h ^= h >> 15
+    return h
+
+
+def partition_for(key, num_partitions):
+    """Partition Kafka would pick for a key (murmur2, positive, modulo)"""
+    if isinstance(key, str):
+        key = key.encode("utf-8")
+    return (murmur2(key) & 0x7FFFFFFF) % num_partitions
+
+
+def unsalt_key(key):
+    """AAPL#3 -> AAPL; consumers group on this to merge salted sub-partitions"""
+    if isinstance(key, bytes):
+        key = key.decode("utf-8")
+    return key.split(SALT_SEP, 1)[0] if key else key
+
+
+def merge_salted_counts(counts):
+    """Fold per-salted-key counts back into per-ticker totals"""
+    merged = Counter()
+    for key, count in counts.items():
+        merged[unsalt_key(key)] += count
+    return dict(merged)
+
+
+class SkewAwarePartitioner:
+    """
+    Picks the message key for skewed topics
+    Heavy keys (configured or detected from recent traffic) are salted
+    round-robin across SALT_BUCKETS sub-keys so they land on several partitions
+    """
+
+    def __init__(self, heavy_keys=None, salt_buckets=SALT_BUCKETS, heavy_share=HEAVY_SHARE):
+        if heavy_keys is None:
+            heavy_keys = os.getenv("HEAVY_KEYS", DEFAULT_HEAVY_KEYS).split(",")
+        self.heavy_keys = {k.strip().upper() for k in heavy_keys if k.strip()}
+        self.salt_buckets = salt_buckets
+        self.heavy_share = heavy_share
+        self._seen = Counter()
+        self._total = 0
+        self._next_salt = Counter()
+
+    def is_heavy(self, key):
+        if key in self.heavy_keys:
+            return True
+        return self._total >= MIN_SAMPLES and self._seen[key] > self.heavy_share * self._total
+
+    def key_for(self, key):
+        """Return the (possibly salted) key to produce with"""
+        self._seen[key] += 1
+        self._total += 1
+        if self.salt_buckets <= 1 or not self.is_heavy(key):
+            return key
+        salt = self._next_salt[key] % self.salt_buckets
+        self._next_salt[key] += 1
+        return f"{key}{SALT_SEP}{salt}"
+
+    def detected_heavy_keys(self):
+        if self._total < MIN_SAMPLES:
+            return []
+        return sorted(k for k, c in self._seen.items() if c > self.heavy_share * self._total)
+
+
+class PartitionStats:
+    """
+    Per-partition delivery metrics collected from producer on_delivery callbacks
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.messages = defaultdict(int)
+        self.bytes = defaultdict(int)
+        self.keys = defaultdict(Counter)
+        self.errors = 0
+
+    def on_delivery(self, err, msg):
+        with self._lock:
+            if err is not None:
+                self.errors += 1
+                return
+            tp = (msg.topic(), msg.partition())
+            self.messages[tp] += 1
+            self.bytes[tp] += len(msg.value() or b"")
+            if msg.key():
+                self.keys[tp][unsalt_key(msg.key())] += 1
+
+    def snapshot(self):
+        """Summary per topic: messages, bytes and msg/s per partition plus skew ratio"""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        with self._lock:
+            topics = defaultdict(dict)
+            for (topic, partition), count in sorted(self.messages.items()):
+                topics[topic][partition] = {
+                    "messages": count,
+                    "bytes": self.bytes[(topic, partition)],
+                    "msgs_per_sec": round(count / elapsed, 2),
+                    "top_keys": self.keys[(topic, partition)].most_common(3),
+                }
+            errors = self.errors
+
+        summary = {"elapsed_sec": round(elapsed, 2), "delivery_errors": errors, "topics": {}}
+        for topic, partitions in topics.items():
+            counts = [p["messages"] for p in partitions.values()]
+            summary["topics"][topic] = {
+                "partitions": partitions,
+                "max_over_mean": round(max(counts) / (sum(counts) / len(counts)), 2),
+            }
+        return summary
+
+    def save(self, filename="data/partition_stats.json"):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        logging.info(f"Partition stats saved to {filename}")
+
+
+def chain_on_delivery(*callbacks):
+    """Combine several on_delivery callbacks into one"""
+    def on_delivery(err, msg):
+        for callback in callbacks:
+            callback(err, msg)
+    return on_delivery
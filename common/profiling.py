@@ -0,0 +1,137 @@
+import functools
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from common.metrics import metrics
+
+# ===============================
+# PROFILING CONFIG
+# ===============================
+# PROFILE=1 starts sampling at launch; SIGUSR1 toggles it in a live process,
+# SIGUSR2 writes the current window immediately.
+# Output is folded stacks ("a;b;c 42"), readable by flamegraph.pl and speedscope.
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.01"))
+PROFILE_FLUSH_SECONDS = float(os.getenv("PROFILE_FLUSH_SECONDS", "60"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "data/profile")
+MAX_STACK_DEPTH = 64
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampler over sys._current_frames()
+    Runs in its own daemon thread; the sampled threads pay nothing
+    """
+
+    def __init__(self, service, interval=PROFILE_INTERVAL, flush_seconds=PROFILE_FLUSH_SECONDS, out_dir=PROFILE_DIR):
+        self.service = service
+        self.interval = interval
+        self.flush_seconds = flush_seconds
+        self.out_dir = out_dir
+        self.active = False
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self.active:
+            return
+        self.active = True
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        logging.info(f"Profiler on: sampling every {self.interval * 1000:.0f}ms into {self.out_dir}")
+
+    def stop(self):
+        if not self.active:
+            return
+        self.active = False
+        self._thread.join()
+        self.flush()
+        logging.info("Profiler off")
+
+    def toggle(self):
+        self.stop() if self.active else self.start()
+
+    def _fold(self, frame, thread_name):
+        names = []
+        while frame is not None and len(names) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        names.append(thread_name)
+        return ";".join(reversed(names))
+
+    def _run(self):
+        own = threading.get_ident()
+        last_flush = time.monotonic()
+        while self.active:
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            samples = [
+                self._fold(frame, thread_names.get(ident, str(ident)))
+                for ident, frame in sys._current_frames().items()
+                if ident != own
+            ]
+            with self._lock:
+                self.stacks.update(samples)
+
+            if time.monotonic() - last_flush >= self.flush_seconds:
+                self.flush()
+                last_flush = time.monotonic()
+            time.sleep(self.interval)
+
+    def flush(self):
+        """Write the samples collected since the last flush to a new .folded file"""
+        with self._lock:
+            stacks, self.stacks = self.stacks, Counter()
+        if not stacks:
+            return None
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        filename = os.path.join(self.out_dir, f"{self.service}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.folded")
+        with open(filename, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        logging.info(f"Profile written to {filename} ({sum(stacks.values())} samples)")
+        return filename
+
+
+profiler = None
+
+
+def profiling_active():
+    return profiler is not None and profiler.active
+
+
+def hot_path(name):
+    """Time a function into pipeline_hot_path_seconds{fn=name} while profiling is on"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not profiling_active():
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                metrics.observe("pipeline_hot_path_seconds", time.perf_counter() - start, fn=name)
+        return wrapper
+    return decorator
+
+
+def install_profiler(service):
+    """Called by long-running entry points; wires PROFILE env var and SIGUSR1/SIGUSR2"""
+    global profiler
+    profiler = SamplingProfiler(service)
+
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.toggle())
+        signal.signal(signal.SIGUSR2, lambda signum, frame: profiler.flush())
+
+    if os.getenv("PROFILE", "").lower() in ("1", "true", "yes"):
+        profiler.start()
+    return profiler
@@ -0,0 +1,234 @@
+import asyncio
+import heapq
+import json
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from operator import itemgetter
+from urllib.parse import parse_qs, urlsplit
+
+from common.aggregates import WINDOWS
+from common.mention_series import read_series, read_totals
+from common.metrics import metrics
+from common.read_cache import ReadThroughCache
+
+# ===============================
+# QUERY SERVICE
+# ===============================
+# GET /top?window=24h&k=20          most-mentioned WSB tickers (1h/24h/7d from memory, e.g. 30d from Supabase)
+# GET /timeline/TSLA?days=7&resolution=1h   hourly or daily mentions (memory while the feed covers it)
+# GET /news/TSLA?n=10               latest articles (memory, else the SQLite article store)
+# GET /health
+# Hot queries are answered from HotAggregates without leaving the event loop
+# once its feed has caught up; anything else goes through a ReadThroughCache to
+# the database, or gets a 503 while there is neither.
+MAX_K = 100
+MAX_NEWS = 50
+MAX_DAYS = 365
+MAX_REQUEST_BYTES = 8192
+
+
+class BadRequest(Exception):
+    pass
+
+
+class Unavailable(Exception):
+    """Memory can't answer yet and there is no store to fall back to"""
+
+
+def _int_param(params, name, default, low, high):
+    try:
+        value = int(params.get(name, [default])[0])
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer")
+    if not low <= value <= high:
+        raise BadRequest(f"{name} must be between {low} and {high}")
+    return value
+
+
+def _window_seconds(window):
+    """'24h' / '7d' / '30d' -> seconds"""
+    if window in WINDOWS:
+        return WINDOWS[window]
+    try:
+        amount, unit = int(window[:-1]), window[-1]
+    except ValueError:
+        raise BadRequest(f"bad window {window!r}")
+    if unit not in "hd" or not 0 < amount <= MAX_DAYS * (24 if unit == "h" else 1):
+        raise BadRequest(f"bad window {window!r}")
+    return amount * (3600 if unit == "h" else 86400)
+
+
+def _epoch(bucket):
+    return int(datetime.fromisoformat(bucket).timestamp())
+
+
+def _iso(epoch):
+    """Unix seconds -> the NewsAPI publishedAt format used on raw-news"""
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch)) if epoch is not None else None
+
+
+class QueryService:
+    """Routes requests to the hot aggregates or, through the caches, to the stores"""
+
+    def __init__(self, aggregates, supabase=None, article_store=None, cache_ttl=None):
+        self.aggregates = aggregates
+        self.supabase = supabase
+        self.article_store = article_store
+        ttl = {"ttl": cache_ttl} if cache_ttl is not None else {}
+        self.top_cache = ReadThroughCache("top", **ttl)
+        self.timeline_cache = ReadThroughCache("timeline", **ttl)
+        self.news_cache = ReadThroughCache("news", **ttl)
+
+    async def handle(self, path, params):
+        """(status, payload) for one GET"""
+        parts = [p for p in path.split("/") if p]
+        if parts == ["top"]:
+            return 200, await self.top(params)
+        if len(parts) == 2 and parts[0] == "timeline":
+            return 200, await self.timeline(parts[1].upper(), params)
+        if len(parts) == 2 and parts[0] == "news":
+            return 200, await self.news(parts[1].upper(), params)
+        if parts == ["health"]:
+            covered = self.aggregates.covered_since
+            return 200, {"status": "ok" if covered is not None else "loading",
+                         "covered_since": int(covered) if covered is not None else None}
+        return 404, {"error": f"no route for {path}"}
+
+    async def top(self, params):
+        window = params.get("window", ["24h"])[0]
+        k = _int_param(params, "k", 20, 1, MAX_K)
+        if window in self.aggregates.windows and self.aggregates.covers_window(window):
+            ranked, source = self.aggregates.top(window, k), "memory"
+        else:
+            seconds = _window_seconds(window)
+            if self.supabase is None:
+                if window in self.aggregates.windows:
+                    raise Unavailable(f"window {window} is still loading from the feed")
+                raise BadRequest(f"window {window} needs the database, serving only {sorted(self.aggregates.windows)}")
+            # Hourly buckets up to a day, then daily: a "30d" window starts at midnight 30 days back
+            resolution = "1h" if seconds <= 86400 else "1d"
+            start = datetime.fromtimestamp(time.time() - seconds, timezone.utc)
+            start = start.replace(minute=0, second=0, microsecond=0)
+            if resolution == "1d":
+                start = start.replace(hour=0)
+            totals = await self.top_cache.get(("top", resolution, start), read_totals, self.supabase, start, resolution)
+            ranked, source = heapq.nlargest(k, totals.items(), key=itemgetter(1)), "db"
+        return {"window": window, "source": source,
+                "tickers": [{"ticker": t, "mentions": n} for t, n in ranked]}
+
+    async def timeline(self, ticker, params):
+        days = _int_param(params, "days", 7, 1, MAX_DAYS)
+        resolution = params.get("resolution", ["1h"])[0]
+        if resolution not in ("1h", "1d"):
+            raise BadRequest("resolution must be 1h or 1d")
+        since = time.time() - days * 86400
+
+        if self.aggregates.covers(since) or (self.supabase is None and self.aggregates.caught_up()):
+            hourly = self.aggregates.timeline(ticker, since)
+            if resolution == "1d":
+                daily = Counter()
+                for hour_ts, n in hourly:
+                    daily[hour_ts - hour_ts % 86400] += n
+                hourly = sorted(daily.items())
+            points, source = hourly, "memory"
+        elif self.supabase is None:
+            raise Unavailable("timeline is still loading from the feed")
+        else:
+            start = datetime.fromtimestamp(since, timezone.utc).replace(minute=0, second=0, microsecond=0)
+            rows = await self.timeline_cache.get((ticker, resolution, start), read_series,
+                                                 self.supabase, ticker, start, None, resolution)
+            points, source = [(_epoch(bucket), n) for bucket, n, _ in rows], "db"
+        return {"ticker": ticker, "resolution": resolution, "source": source,
+                "points": [[ts, n] for ts, n in points]}
+
+    async def news(self, ticker, params):
+        n = _int_param(params, "n", 10, 1, MAX_NEWS)
+        if self.aggregates.caught_up() and (self.aggregates.news_count(ticker) >= n or self.article_store is None):
+            return {"ticker": ticker, "source": "memory", "articles": self.aggregates.latest_news(ticker, n)}
+        if self.article_store is None:
+            raise Unavailable("news is still loading from the feed")
+        rows = await self.news_cache.get((ticker, n), self.article_store.search, None, (ticker,), None, None, n)
+        articles = [
+            {
+                "title": row["title"],
+                "url": row["url"],
+                "source": None,  # not kept in the article store index
+                "published_at": _iso(row["published_ts"]),
+                "primary_ticker": row["primary_ticker"],
+            }
+            for row in rows
+        ]
+        return {"ticker": ticker, "source": "db", "articles": articles}
+
+
+# ===============================
+# HTTP
+# ===============================
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+              500: "Internal Server Error", 503: "Service Unavailable"}[status]
+    head = (f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("ascii") + body
+
+
+async def _dispatch(service, method, target):
+    if method != "GET":
+        return 405, {"error": "GET only"}
+    url = urlsplit(target)
+    route = url.path.strip("/").split("/")[0] or "root"
+    start = time.perf_counter()
+    try:
+        status, payload = await service.handle(url.path, parse_qs(url.query))
+    except BadRequest as e:
+        status, payload = 400, {"error": str(e)}
+    except Unavailable as e:
+        status, payload = 503, {"error": str(e)}
+    except Exception as e:
+        logging.exception(f"Query {target} failed")
+        status, payload = 500, {"error": type(e).__name__}
+    metrics.observe("pipeline_query_seconds", time.perf_counter() - start, route=route, status=status)
+    return status, payload
+
+
+async def handle_connection(service, reader, writer):
+    """HTTP/1.1 with keep-alive: GET requests only, bodies ignored"""
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.LimitOverrunError:
+                writer.write(_response(400, {"error": "request head too large"}, False))
+                return
+            lines = head.decode("latin-1").split("\r\n")
+            try:
+                method, target, version = lines[0].split(" ", 2)
+            except ValueError:
+                writer.write(_response(400, {"error": "bad request line"}, False))
+                return
+            headers = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in lines[1:] if l)}
+            if headers.get("content-length", "0") != "0":
+                await reader.readexactly(int(headers["content-length"]))
+            keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+            status, payload = await _dispatch(service, method, target)
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                return
+    except (ConnectionError, asyncio.IncompleteReadError):
+        return
+    finally:
+        writer.close()
+
+
+async def serve(service, host="127.0.0.1", port=8080):
+    server = await asyncio.start_server(
+        lambda r, w: handle_connection(service, r, w), host, port, limit=MAX_REQUEST_BYTES)
+    logging.info(f"Query service listening on http://{host}:{port}")
+    return server
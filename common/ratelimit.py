@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+import redis
+
+from common.metrics import metrics
+
+# ===============================
+# RATE LIMIT CONFIG
+# ===============================
+# GCRA (a token bucket that stores one timestamp per key) shared by every fetch
+# process through Redis, keyed by provider + credential so two fetchers on the
+# same API key split one quota. Limits are "requests/period_seconds/burst" and
+# can be overridden per provider, e.g. RATE_LIMIT_NEWSAPI="100/86400/5".
+# The defaults match the old per-process sleeps (1.5s NewsAPI, 1s Reddit).
+DEFAULT_LIMITS = {
+    "newsapi": "40/60/1",
+    "reddit": "60/60/1",
+    "reddit-oauth": "60/60/1",
+}
+REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+REDIS_RETRY_SECONDS = 30.0
+# Without Redis each process only knows about itself; with N fetchers running,
+# RATE_LIMIT_LOCAL_SHARE=N keeps the fallback under the shared quota
+LOCAL_SHARE = float(os.getenv("RATE_LIMIT_LOCAL_SHARE", "1"))
+
+# KEYS[1] = TAT key; ARGV = emission_ms, tolerance_ms, cost
+# Returns {allowed, wait_ms, remaining}; time comes from the Redis server so
+# clients with skewed clocks still agree
+GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local emission = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then tat = now end
+local new_tat = tat + emission * cost
+local allow_at = new_tat - tolerance
+if allow_at > now then
+    return {0, allow_at - now, math.max(math.floor((tolerance - (tat - now)) / emission), 0)}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now) + 1000)
+return {1, 0, math.floor((tolerance - (new_tat - now)) / emission)}
+"""
+
+# KEYS[1] = TAT key; ARGV = emission_ms, tolerance_ms, penalty_ms
+# Pushes the bucket so nobody is admitted for penalty_ms (e.g. after a 429)
+PENALTY_SCRIPT = """
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local blocked_tat = now + tonumber(ARGV[3]) + tonumber(ARGV[2]) - tonumber(ARGV[1])
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if blocked_tat > tat then
+    redis.call('SET', KEYS[1], blocked_tat, 'PX', math.ceil(blocked_tat - now) + 1000)
+end
+return 1
+"""
+
+
+class Limit:
+    """`rate` requests per `period` seconds, up to `burst` back to back"""
+
+    def __init__(self, rate, period, burst=1):
+        self.rate = rate
+        self.period = period
+        self.burst = max(int(burst), 1)
+        self.emission = period / rate  # seconds per request
+        self.tolerance = self.emission * self.burst
+
+    @classmethod
+    def parse(cls, spec):
+        rate, period, *burst = spec.split("/")
+        return cls(float(rate), float(period), int(burst[0]) if burst else 1)
+
+    def scaled(self, share):
+        return Limit(self.rate / share, self.period, self.burst)
+
+    def __repr__(self):
+        return f"{self.rate:g}/{self.period:g}s burst {self.burst}"
+
+
+def limit_for(provider):
+    env = f"RATE_LIMIT_{provider.upper().replace('-', '_')}"
+    return Limit.parse(os.getenv(env) or DEFAULT_LIMITS.get(provider, "1/1/1"))
+
+
+class LocalLimiter:
+    """Same GCRA in-process; the fallback when Redis is unreachable"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tat = {}
+
+    def try_acquire(self, key, limit, cost=1):
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tat.get(key, now), now)
+            new_tat = tat + limit.emission * cost
+            allow_at = new_tat - limit.tolerance
+            if allow_at > now:
+                return False, allow_at - now, max(int((limit.tolerance - (tat - now)) / limit.emission), 0)
+            self._tat[key] = new_tat
+            return True, 0.0, int((limit.tolerance - (new_tat - now)) / limit.emission)
+
+    def penalize(self, key, limit, seconds):
+        with self._lock:
+            now = time.monotonic()
+            blocked = now + seconds + limit.tolerance - limit.emission
+            self._tat[key] = max(self._tat.get(key, now), blocked)
+
+
+class RateLimiter:
+    """
+    Shared limiter for outbound provider calls
+    acquire() blocks threaded callers, acquire_async() awaits in asyncio code
+    """
+
+    def __init__(self, redis_url=REDIS_URL, limits=None):
+        self.redis_url = redis_url
+        self.limits = limits or {}
+        self.local = LocalLimiter()
+        self._redis = None
+        self._gcra = None
+        self._penalty = None
+        self._retry_at = 0.0
+        self._connect()
+
+    def _connect(self):
+        try:
+            client = redis.Redis.from_url(self.redis_url, socket_connect_timeout=2, socket_timeout=2)
+            client.ping()
+            self._gcra = client.register_script(GCRA_SCRIPT)
+            self._penalty = client.register_script(PENALTY_SCRIPT)
+            self._redis = client
+            logging.info(f"Rate limiter using Redis at {self.redis_url}")
+        except redis.RedisError as e:
+            self._fallback(e)
+
+    def _fallback(self, error):
+        if self._redis is not None or not self._retry_at:
+            logging.warning(f"Rate limiter Redis unavailable ({error}) - local limits at 1/{LOCAL_SHARE:g} of quota")
+        metrics.inc("pipeline_rate_limit_fallback_total")
+        self._redis = None
+        self._retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    def _backend(self):
+        if self._redis is None and time.monotonic() >= self._retry_at:
+            self._connect()
+        return self._redis
+
+    def limit(self, provider):
+        if provider not in self.limits:
+            self.limits[provider] = limit_for(provider)
+        return self.limits[provider]
+
+    @staticmethod
+    def key(provider, credential):
+        # Never put the raw API key into Redis
+        digest = hashlib.sha1((credential or "").encode("utf-8")).hexdigest()[:12]
+        return f"ratelimit:{provider}:{digest}"
+
+    def try_acquire(self, provider, credential="", cost=1):
+        """One non-blocking attempt: (allowed, wait_seconds, remaining)"""
+        limit = self.limit(provider)
+        key = self.key(provider, credential)
+        if self._backend() is not None:
+            try:
+                allowed, wait_ms, remaining = self._gcra(
+                    keys=[key],
+                    args=[limit.emission * 1000, limit.tolerance * 1000, cost],
+                )
+                result = (bool(allowed), wait_ms / 1000, remaining)
+            except redis.RedisError as e:
+                self._fallback(e)
+                result = self.local.try_acquire(key, limit.scaled(LOCAL_SHARE), cost)
+        else:
+            result = self.local.try_acquire(key, limit.scaled(LOCAL_SHARE), cost)
+        metrics.set_gauge("pipeline_rate_limit_remaining", result[2], provider=provider)
+        return result
+
+    def acquire(self, provider, credential="", cost=1, timeout=None):
+        """Block until admitted; returns seconds waited, or None on timeout"""
+        start = time.monotonic()
+        while True:
+            allowed, wait, _ = self.try_acquire(provider, credential, cost)
+            waited = time.monotonic() - start
+            if allowed:
+                metrics.observe("pipeline_rate_limit_wait_seconds", waited, provider=provider)
+                return waited
+            if timeout is not None and waited + wait > timeout:
+                return None
+            time.sleep(wait)
+
+    async def acquire_async(self, provider, credential="", cost=1, timeout=None):
+        """asyncio version of acquire(); the Redis round trip runs in a thread"""
+        start = time.monotonic()
+        while True:
+            allowed, wait, _ = await asyncio.to_thread(self.try_acquire, provider, credential, cost)
+            waited = time.monotonic() - start
+            if allowed:
+                metrics.observe("pipeline_rate_limit_wait_seconds", waited, provider=provider)
+                return waited
+            if timeout is not None and waited + wait > timeout:
+                return None
+            await asyncio.sleep(wait)
+
+    def penalize(self, provider, credential="", seconds=60.0):
+        """Hold every caller sharing this quota back for `seconds`, e.g. after a 429"""
+        limit = self.limit(provider)
+        key = self.key(provider, credential)
+        logging.warning(f"Rate limit: {provider} backing off {seconds:.0f}s for all workers")
+        if self._backend() is not None:
+            try:
+                self._penalty(keys=[key], args=[limit.emission * 1000, limit.tolerance * 1000, seconds * 1000])
+                return
+            except redis.RedisError as e:
+                self._fallback(e)
+        self.local.penalize(key, limit.scaled(LOCAL_SHARE), seconds)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Process-wide limiter, connected on first use"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
@@ -0,0 +1,63 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from common.metrics import metrics
+
+# ===============================
+# READ-THROUGH CACHE
+# ===============================
+# LRU with a per-entry TTL in front of the slow stores (Supabase, the SQLite
+# article store). Loaders are blocking functions run in the default executor;
+# concurrent misses for one key share a single load instead of stampeding the DB.
+CACHE_ENTRIES = 10_000
+CACHE_TTL_SECONDS = 30.0
+
+
+class ReadThroughCache:
+
+    def __init__(self, name, max_entries=CACHE_ENTRIES, ttl=CACHE_TTL_SECONDS):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._loading = {}              # key -> Future of the load in flight
+
+    async def get(self, key, loader, *args):
+        """Cached value for key, or loader(*args) run off the event loop and cached"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                metrics.inc("pipeline_query_cache_total", cache=self.name, result="hit")
+                return entry[1]
+            del self._entries[key]
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            metrics.inc("pipeline_query_cache_total", cache=self.name, result="joined")
+            return await asyncio.shield(pending)
+
+        metrics.inc("pipeline_query_cache_total", cache=self.name, result="miss")
+        loop = asyncio.get_running_loop()
+        pending = loop.run_in_executor(None, loader, *args)
+        self._loading[key] = pending
+        try:
+            with metrics.timer("query_cache_load", cache=self.name):
+                value = await asyncio.shield(pending)
+        finally:
+            del self._loading[key]
+
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key=None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
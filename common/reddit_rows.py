@@ -0,0 +1,42 @@
+from collections import Counter
+
+from common.tickers import count_tickers
+
+# ===============================
+# WSB ROW MAPPING
+# ===============================
+# reddit-wsb-posts-kafka message -> Supabase rows. Shared by the live consumer
+# and tools/kafka-replay.py so a replay writes exactly what the consumer would.
+POSTS_TABLE = "wallstreetbets_data"
+TICKERS_TABLE = "wallstreetbets_ticker"
+
+
+def post_row(value):
+    """wallstreetbets_data row for one post message"""
+    return {
+        "post_id": value.get("id"),
+        "title": " ".join((value.get("content") or "").split()[:10]),
+        "author": value.get("author"),
+        "body": value.get("content"),
+        "url": value.get("url"),
+        "created_utc": value.get("created_utc"),
+        "created": value.get("created"),
+    }
+
+
+def post_mentions(value, search_terms=None):
+    """
+    {ticker: count} for a post: the producer's ticker_mentions, or a fresh
+    count_tickers() over the content when search_terms is given (re-matching)
+    """
+    if search_terms is None:
+        return value.get("ticker_mentions") or {}
+    return count_tickers(value.get("content") or "", search_terms)
+
+
+def mention_totals(mentions):
+    """Sum a list of {ticker: count} dicts"""
+    totals = Counter()
+    for m in mentions:
+        totals.update(m)
+    return totals
@@ -0,0 +1,200 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from confluent_kafka import TopicPartition
+from quixstreams import Application
+
+from common.reddit_rows import post_mentions, post_row
+
+# ===============================
+# DUMP FORMAT
+# ===============================
+# One directory per topic, segment files per partition:
+#   <dir>/<topic>/p<partition>-<first offset>.seg
+# Record layout: crc32 | partition | offset | timestamp_ms | key_len | headers_len | value_len | key | headers | value
+# Same crc-then-lengths framing as the spool, plus the Kafka coordinates so a
+# replay can report and diff by partition/offset.
+CRC = struct.Struct("<I")
+META = struct.Struct("<iqqHII")
+RECORD_HEADER_SIZE = CRC.size + META.size
+SEGMENT_SUFFIX = ".seg"
+DEFAULT_SEGMENT_BYTES = 32 * 1024 * 1024
+MANIFEST = "manifest.json"
+
+
+class SegmentWriter:
+    """Appends dumped records for one partition, rolling files at segment_bytes"""
+
+    def __init__(self, directory, partition, segment_bytes=DEFAULT_SEGMENT_BYTES):
+        self.directory = directory
+        self.partition = partition
+        self.segment_bytes = segment_bytes
+        self._file = None
+        self._size = 0
+
+    def write(self, offset, timestamp, key, headers, value):
+        if self._file is None or self._size >= self.segment_bytes:
+            self.close()
+            path = os.path.join(self.directory, f"p{self.partition:03d}-{offset:012d}{SEGMENT_SUFFIX}")
+            self._file = open(path, "wb")
+            self._size = 0
+
+        key = key or b""
+        headers = json.dumps([[k, v.decode("utf-8", "replace") if isinstance(v, bytes) else v]
+                              for k, v in headers]).encode("utf-8") if headers else b""
+        value = value or b""
+        body = META.pack(self.partition, offset, timestamp, len(key), len(headers), len(value)) + key + headers + value
+        self._file.write(CRC.pack(zlib.crc32(body)) + body)
+        self._size += CRC.size + len(body)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def list_segments(directory):
+    """Segment paths under a topic dump directory, partition then offset order"""
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.endswith(SEGMENT_SUFFIX)
+    )
+
+
+def read_segment(path):
+    """Yield (partition, offset, timestamp, key, headers, value) from a dump segment"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = 0
+        while pos + RECORD_HEADER_SIZE <= size:
+            (crc,) = CRC.unpack_from(mm, pos)
+            partition, offset, timestamp, key_len, headers_len, value_len = META.unpack_from(mm, pos + CRC.size)
+            end = pos + RECORD_HEADER_SIZE + key_len + headers_len + value_len
+            if end > size or zlib.crc32(mm[pos + CRC.size:end]) != crc:
+                logging.error(f"Replay: corrupt or torn record in {path} at byte {pos}, skipping remainder")
+                return
+            start = pos + RECORD_HEADER_SIZE
+            key = mm[start:start + key_len] or None
+            start += key_len
+            headers = [tuple(h) for h in json.loads(mm[start:start + headers_len])] if headers_len else None
+            start += headers_len
+            yield partition, offset, timestamp, key, headers, mm[start:end]
+            pos = end
+
+
+# ===============================
+# DUMP
+# ===============================
+def dump_topic(broker_address, topic, out_dir, segment_bytes=DEFAULT_SEGMENT_BYTES):
+    """
+    Copy every retained message of `topic` into local segment files
+    Stops at the high watermarks seen at start; commits nothing
+    """
+    directory = os.path.join(out_dir, topic)
+    os.makedirs(directory, exist_ok=True)
+    app = Application(
+        broker_address=broker_address,
+        loglevel="WARNING",
+        consumer_group=f"replay-dump-{int(time.time())}",
+        auto_offset_reset="earliest",
+    )
+    start = time.monotonic()
+    written, total_bytes = 0, 0
+
+    with app.get_consumer(auto_commit_enable=False) as consumer:
+        metadata = consumer.list_topics(topic, timeout=10)
+        if topic not in metadata.topics or metadata.topics[topic].error:
+            raise SystemExit(f"Topic {topic} not found")
+
+        ranges = {}
+        for partition in sorted(metadata.topics[topic].partitions):
+            low, high = consumer.get_watermark_offsets(TopicPartition(topic, partition), timeout=10)
+            if high > low:
+                ranges[partition] = (low, high)
+
+        writers = {p: SegmentWriter(directory, p, segment_bytes) for p in ranges}
+        remaining = {p: high for p, (_, high) in ranges.items()}
+        consumer.assign([TopicPartition(topic, p, low) for p, (low, _) in ranges.items()])
+
+        while remaining:
+            msg = consumer.poll(1)
+            if msg is None:
+                # The last offsets can be transaction markers that are never delivered
+                for tp in consumer.position([TopicPartition(topic, p) for p in remaining]):
+                    if tp.offset >= remaining[tp.partition]:
+                        del remaining[tp.partition]
+                continue
+            if msg.error():
+                logging.error(msg.error())
+                continue
+            partition, offset = msg.partition(), msg.offset()
+            if partition not in remaining:
+                continue
+            writers[partition].write(offset, msg.timestamp()[1], msg.key(), msg.headers(), msg.value())
+            written += 1
+            total_bytes += len(msg.value() or b"")
+            if offset >= remaining[partition] - 1:
+                del remaining[partition]
+            if written % 100_000 == 0:
+                logging.info(f"Dumped {written} messages...")
+
+        consumer.unassign()
+        for writer in writers.values():
+            writer.close()
+
+    manifest = {
+        "topic": topic,
+        "dumped_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "messages": written,
+        "partitions": {str(p): {"low": low, "high": high} for p, (low, high) in ranges.items()},
+    }
+    with open(os.path.join(directory, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    elapsed = time.monotonic() - start
+    logging.info(f"Dumped {written} messages ({total_bytes / 1e6:.1f} MB) from {topic} to {directory} "
+                 f"in {elapsed:.1f}s ({written / max(elapsed, 1e-9):.0f} msg/s)")
+    return manifest
+
+
+# ===============================
+# TRANSFORM
+# ===============================
+_search_terms = None
+
+
+def init_transform(search_terms):
+    """Process pool initializer; search_terms=None keeps the producer's ticker_mentions"""
+    global _search_terms
+    _search_terms = search_terms
+
+
+def transform_values(values):
+    """
+    Raw reddit-wsb-posts-kafka values -> list of (row, old_mentions, new_mentions)
+    plus the number of malformed messages; runs in pool workers
+    """
+    results, malformed = [], 0
+    for raw in values:
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            malformed += 1
+            continue
+        if not value.get("id"):
+            malformed += 1
+            continue
+        results.append((post_row(value), value.get("ticker_mentions") or {}, post_mentions(value, _search_terms)))
+    return results, malformed
+
+
+def transform_segment(path):
+    """transform_values over one dump segment"""
+    return transform_values([value for *_, value in read_segment(path)])
@@ -0,0 +1,253 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from common.metrics import metrics
+
+# ===============================
+# RESILIENCE CONFIG
+# ===============================
+# Every outbound provider call goes through a ProviderGuard per endpoint:
+# a circuit breaker (closed -> open on a high failure rate -> half-open probes
+# -> closed) in front of an AIMD concurrency limit that grows by ~1 per round
+# trip while latency stays near its baseline and halves on 429s, 5xx, timeouts
+# or a latency spike. Rate limits (common.ratelimit) still apply on top.
+MAX_CONCURRENCY = int(os.getenv("PROVIDER_MAX_CONCURRENCY", "16"))
+INITIAL_CONCURRENCY = 2
+LATENCY_TOLERANCE = 2.0  # x baseline latency before we call it congestion
+LATENCY_WINDOW = 50
+FAILURE_RATE = 0.5
+FAILURE_WINDOW = 20
+MIN_CALLS = 10
+OPEN_SECONDS = 10.0
+MAX_OPEN_SECONDS = 300.0
+HALF_OPEN_PROBES = 3
+MAX_WAIT_SECONDS = float(os.getenv("PROVIDER_MAX_WAIT_SECONDS", "120"))
+
+OK, OVERLOAD, ERROR = "ok", "overload", "error"
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose breaker stayed open"""
+
+
+def classify_status(status):
+    if status in (429, 503):
+        return OVERLOAD
+    if status >= 500:
+        return ERROR
+    return OK
+
+
+def classify_exception(e):
+    """HTTP errors by status (requests / prawcore carry .response); anything else is an error"""
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    if status is not None:
+        return classify_status(status)
+    return ERROR
+
+
+class CircuitBreaker:
+    """
+    Failure-rate breaker over the last FAILURE_WINDOW calls
+    Open: calls are refused; after open_seconds one probe at a time is let
+    through (half-open), HALF_OPEN_PROBES successes close it, a failure reopens
+    it with a doubled timeout
+    """
+
+    def __init__(self, name, failure_rate=FAILURE_RATE, window=FAILURE_WINDOW, min_calls=MIN_CALLS,
+                 open_seconds=OPEN_SECONDS, probes=HALF_OPEN_PROBES):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.base_open_seconds = open_seconds
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.state = CLOSED
+        self.results = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_successes = 0
+        metrics.set_gauge("pipeline_circuit_state", STATE_VALUES[CLOSED], endpoint=name)
+
+    def _transition(self, state):
+        logging.warning(f"Circuit {self.name}: {self.state} -> {state}")
+        self.state = state
+        metrics.set_gauge("pipeline_circuit_state", STATE_VALUES[state], endpoint=self.name)
+        metrics.inc("pipeline_circuit_transitions_total", endpoint=self.name, state=state)
+
+    def admit(self):
+        """
+        CLOSED if a call may go out now, HALF_OPEN if it goes out as the probe,
+        None if refused; in half-open only one probe is in flight
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN)
+                self._probe_successes = 0
+            if self.state == CLOSED:
+                return CLOSED
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return HALF_OPEN
+            return None
+
+    def retry_in(self):
+        with self._lock:
+            if self.state == OPEN:
+                return max(self.open_seconds - (time.monotonic() - self._opened_at), 0.05)
+            return 0.05
+
+    def wait(self, deadline):
+        """Block until admitted (returns admit()'s answer); CircuitOpenError past the deadline"""
+        while True:
+            admitted = self.admit()
+            if admitted:
+                return admitted
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise CircuitOpenError(f"{self.name} circuit {self.state}, gave up waiting")
+            time.sleep(min(self.retry_in(), remaining, 1.0))
+
+    def record(self, failed, admitted=CLOSED):
+        """Outcome of a call; admitted is what admit() returned for it"""
+        with self._lock:
+            if admitted == HALF_OPEN:
+                self._probing = False
+                if self.state != HALF_OPEN:
+                    return
+                if failed:
+                    self.open_seconds = min(self.open_seconds * 2, MAX_OPEN_SECONDS)
+                    self._open()
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.probes:
+                        self.open_seconds = self.base_open_seconds
+                        self.results.clear()
+                        self._transition(CLOSED)
+                return
+
+            if self.state != CLOSED:
+                return  # started before the breaker tripped; only the probe decides now
+            self.results.append(failed)
+            if (len(self.results) >= self.min_calls
+                    and sum(self.results) / len(self.results) >= self.failure_rate):
+                self._open()
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self._transition(OPEN)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on in-flight calls
+    +1/limit per success near baseline latency (about +1 per round trip),
+    x0.5 on overload, errors or latency above LATENCY_TOLERANCE x baseline,
+    at most once per baseline latency so one burst of failures halves it once
+    """
+
+    def __init__(self, name, initial=INITIAL_CONCURRENCY, min_limit=1, max_limit=MAX_CONCURRENCY,
+                 tolerance=LATENCY_TOLERANCE, backoff=0.5):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.inflight = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._cond = threading.Condition()
+        self._last_decrease = 0.0
+        metrics.set_gauge("pipeline_concurrency_limit", self.limit, endpoint=name)
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            while self.inflight >= int(self.limit):
+                self._cond.wait()
+            self.inflight += 1
+            metrics.set_gauge("pipeline_concurrency_inflight", self.inflight, endpoint=self.name)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.inflight -= 1
+                metrics.set_gauge("pipeline_concurrency_inflight", self.inflight, endpoint=self.name)
+                self._cond.notify_all()
+
+    def baseline(self):
+        return min(self.latencies) if self.latencies else None
+
+    def record(self, outcome, latency):
+        with self._cond:
+            baseline = self.baseline()
+            congested = baseline is not None and latency > baseline * self.tolerance
+            if outcome == OK:
+                self.latencies.append(latency)
+
+            now = time.monotonic()
+            if outcome != OK or congested:
+                if now - self._last_decrease >= (baseline or latency):
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            metrics.set_gauge("pipeline_concurrency_limit", round(self.limit, 2), endpoint=self.name)
+            self._cond.notify_all()
+
+
+class ProviderGuard:
+    """Breaker + adaptive concurrency around one provider endpoint"""
+
+    def __init__(self, endpoint, breaker=None, concurrency=None):
+        self.endpoint = endpoint
+        self.breaker = breaker or CircuitBreaker(endpoint)
+        self.concurrency = concurrency or AdaptiveConcurrency(endpoint)
+
+    def run(self, fn, *args, **kwargs):
+        """
+        Call fn through the guard; a returned response's status_code and any
+        raised exception feed both the breaker and the concurrency limit
+        """
+        deadline = time.monotonic() + MAX_WAIT_SECONDS
+        while True:
+            admitted = self.breaker.wait(deadline)
+            with self.concurrency.slot():
+                # Callers queued for a slot while the breaker tripped go back to waiting
+                if admitted == CLOSED and self.breaker.state != CLOSED:
+                    continue
+                start = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    self._record(classify_exception(e), time.perf_counter() - start, admitted)
+                    raise
+                status = getattr(result, "status_code", None)
+                self._record(classify_status(status) if status is not None else OK, time.perf_counter() - start,
+                             admitted)
+                return result
+
+    def _record(self, outcome, latency, admitted):
+        self.breaker.record(outcome != OK, admitted)
+        self.concurrency.record(outcome, latency)
+        metrics.inc("pipeline_provider_calls_total", endpoint=self.endpoint, outcome=outcome)
+        metrics.observe("pipeline_provider_latency_seconds", latency, endpoint=self.endpoint)
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def guard_for(endpoint):
+    """Process-wide guard per endpoint, e.g. guard_for("newsapi.everything")"""
+    with _guards_lock:
+        if endpoint not in _guards:
+            _guards[endpoint] = ProviderGuard(endpoint)
+        return _guards[endpoint]
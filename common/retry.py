@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+import time
+import traceback
+from confluent_kafka import TopicPartition
+from quixstreams import Application
+
+from common.metrics import metrics, observe_end_to_end
+from common.topics import ensure_topic
+
+# ===============================
+# RETRY / DLQ CONFIG
+# ===============================
+# A message whose handler fails is never retried in place:
+#   retryable errors  -> <topic>-retry-<tier>, replayed by a separate lane once
+#                        its delay has passed, escalating tier by tier
+#   permanent errors  -> <topic>-dlq, with the error and origin in the headers
+#   (and retryable ones that exhausted every tier)
+# The failed record is flushed before the caller stores its offset, so a
+# failure is either handled on the main partition or durably parked elsewhere.
+RETRY_TIERS = (("5s", 5), ("1m", 60), ("10m", 600))
+RETRY_PARTITIONS = int(os.getenv("RETRY_PARTITIONS", "3"))
+# SQLSTATE classes that no retry will fix: data exceptions, integrity
+# violations, syntax/undefined objects
+PERMANENT_SQLSTATE_CLASSES = ("22", "23", "42")
+
+ATTEMPT_HEADER = "retry_attempt"
+NOT_BEFORE_HEADER = "retry_not_before_ms"
+ORIGIN_HEADERS = ("origin_topic", "origin_partition", "origin_offset")
+ERROR_HEADERS = ("error_class", "error_message", "failed_at")
+
+
+class PermanentError(Exception):
+    """A message that can never be processed (bad payload, schema violation)"""
+
+
+def is_retryable(e):
+    """Network, timeout and server-side errors retry; bad data goes to the DLQ"""
+    if isinstance(e, (PermanentError, ValueError, LookupError, TypeError)):
+        return False
+    code = getattr(e, "code", None)  # postgrest APIError carries the SQLSTATE
+    if isinstance(code, str) and code[:2] in PERMANENT_SQLSTATE_CLASSES:
+        return False
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    if status is not None and 400 <= status < 500 and status not in (408, 429):
+        return False
+    return True
+
+
+def retry_topic(topic, tier):
+    return f"{topic}-retry-{tier}"
+
+
+def dlq_topic(topic):
+    return f"{topic}-dlq"
+
+
+def _header(headers, name):
+    for k, v in headers or []:
+        if k == name:
+            return v.decode("utf-8") if isinstance(v, bytes) else v
+    return None
+
+
+def origin(msg):
+    """(topic, partition, offset) of the message as first consumed, across retries"""
+    headers = msg.headers()
+    if _header(headers, ORIGIN_HEADERS[0]) is not None:
+        return tuple(_header(headers, h) for h in ORIGIN_HEADERS)
+    return msg.topic(), str(msg.partition()), str(msg.offset())
+
+
+class FailureRouter:
+    """Routes failed messages of `topic` to the next retry tier or the DLQ"""
+
+    def __init__(self, producer, topic, tiers=RETRY_TIERS):
+        self.producer = producer
+        self.topic = topic
+        self.tiers = tiers
+
+    def handle_failure(self, msg, error):
+        attempt = int(_header(msg.headers(), ATTEMPT_HEADER) or 0)
+        retryable = is_retryable(error)
+        kept = [(k, v) for k, v in msg.headers() or []
+                if k not in (ATTEMPT_HEADER, NOT_BEFORE_HEADER) + ORIGIN_HEADERS + ERROR_HEADERS]
+        headers = kept + list(zip(ORIGIN_HEADERS, origin(msg))) + [
+            ("error_class", type(error).__name__),
+            ("error_message", str(error)[:1000]),
+            ("failed_at", str(int(time.time() * 1000))),
+        ]
+
+        if retryable and attempt < len(self.tiers):
+            tier, delay = self.tiers[attempt]
+            target = retry_topic(self.topic, tier)
+            headers += [
+                (ATTEMPT_HEADER, str(attempt + 1)),
+                (NOT_BEFORE_HEADER, str(int((time.time() + delay) * 1000))),
+            ]
+            metrics.inc("pipeline_retry_total", topic=self.topic, tier=tier)
+            metrics.observe("pipeline_retry_depth", attempt + 1, topic=self.topic)
+            logging.warning(f"{msg.topic()}@{msg.offset()}: {type(error).__name__} - retry {attempt + 1} in {tier}")
+        else:
+            target = dlq_topic(self.topic)
+            headers += [(ATTEMPT_HEADER, str(attempt)), ("error_trace", traceback.format_exc()[-2000:])]
+            metrics.inc("pipeline_dlq_total", topic=self.topic, error=type(error).__name__,
+                        reason="retries_exhausted" if retryable else "permanent")
+            logging.error(f"{msg.topic()}@{msg.offset()}: {type(error).__name__}: {error} - dead-lettered")
+
+        self.producer.produce(topic=target, key=msg.key(), value=msg.value(), headers=headers)
+        # Parked before the caller stores the offset; a lost retry record would be a lost message
+        if self.producer.flush(timeout=30):
+            raise RuntimeError(f"Could not park failed message in {target}")
+
+
+def ensure_failure_topics(broker_address, topic, tiers=RETRY_TIERS):
+    for tier, _ in tiers:
+        ensure_topic(broker_address, retry_topic(topic, tier), RETRY_PARTITIONS)
+    ensure_topic(broker_address, dlq_topic(topic), 1)
+
+
+# ===============================
+# RETRY LANE
+# ===============================
+def run_retry_lane(topic, handler, broker_address="localhost:9092", consumer_group="retry-lane", tiers=RETRY_TIERS):
+    """
+    Consume every retry tier of `topic`; a partition whose head isn't due yet
+    is paused (not slept on) so other tiers keep moving and the consumer stays
+    in its group. handler(value, msg) is the same function the main lane uses
+    """
+    ensure_failure_topics(broker_address, topic, tiers)
+    topics = [retry_topic(topic, tier) for tier, _ in tiers]
+    app = Application(
+        broker_address=broker_address,
+        loglevel="INFO",
+        consumer_group=f"{consumer_group}-{topic}",
+        auto_offset_reset="earliest",
+    )
+    paused = {}
+
+    def on_revoke(consumer, partitions):
+        for tp in partitions:
+            paused.pop((tp.topic, tp.partition), None)
+
+    with app.get_consumer() as consumer, app.get_producer() as producer:
+        consumer.subscribe(topics=topics, on_revoke=on_revoke)
+        router = FailureRouter(producer, topic, tiers)
+        logging.info(f"Retry lane consuming {', '.join(topics)}")
+
+        while True:
+            try:
+                now_ms = time.time() * 1000
+                due = [(t, p) for (t, p), ready_ms in paused.items() if ready_ms <= now_ms]
+                if due:
+                    consumer.resume([TopicPartition(t, p) for t, p in due])
+                    for key in due:
+                        del paused[key]
+
+                msg = consumer.poll(1)
+                if msg is None:
+                    continue
+                elif msg.error():
+                    logging.error(msg.error())
+                    continue
+
+                not_before = int(_header(msg.headers(), NOT_BEFORE_HEADER) or 0)
+                if not_before > time.time() * 1000:
+                    tp = TopicPartition(msg.topic(), msg.partition(), msg.offset())
+                    consumer.pause([tp])
+                    consumer.seek(tp)
+                    paused[(msg.topic(), msg.partition())] = not_before
+                    continue
+
+                attempt = _header(msg.headers(), ATTEMPT_HEADER)
+                try:
+                    handler(json.loads(msg.value()), msg)
+                    metrics.inc("pipeline_retry_recovered_total", topic=topic, attempt=attempt)
+                    observe_end_to_end(msg.headers(), topic)
+                except Exception as e:
+                    router.handle_failure(msg, e)
+                consumer.store_offsets(msg)
+                metrics.set_gauge("pipeline_retry_paused_partitions", len(paused), topic=topic)
+
+            except KeyboardInterrupt:
+                logging.info("Shutting down retry lane")
+                break
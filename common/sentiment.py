@@ -0,0 +1,231 @@
+import hashlib
+import logging
+import math
+import os
+import re
+from collections import OrderedDict
+
+# ===============================
+# LEXICON
+# ===============================
+# Rule-based scorer in the style of VADER: word valences from -4 to +4, shifted
+# by negations, boosters/dampeners, ALL CAPS, "but" and exclamation marks, then
+# squashed into a compound score in [-1, 1]. General words plus finance and WSB
+# slang; CPU only, no model files.
+SENTIMENT_MODEL = "lexicon-v1"
+
+_VALENCES = {
+    3.0: "moon mooning tendies lambo skyrocket skyrocketing soar soaring soared surge surged surging "
+         "outperform outperformed breakthrough record-high blowout stellar excellent amazing awesome "
+         "fantastic incredible",
+    2.0: "bull bullish rally rallied rallying beat beats gain gains gained profit profits profitable "
+         "growth grow growing upgrade upgraded upside strong stronger strength boom booming rocket "
+         "rip ripping printing squeeze win winning winner winners great good love loved best "
+         "optimistic confident exceeded exceeds exceed record dividend buyback tailwind tailwinds "
+         "diamond hodl undervalued recover recovery rebound rebounded",
+    1.0: "buy buying bought up higher rise rising rose climb climbed climbing positive upbeat steady "
+         "solid safe opportunity support supported approve approved approval expand expansion launch "
+         "partnership deal hold holding green calls like nice",
+    -1.0: "sell selling sold down lower fall falling fell drop dropped dropping decline declined "
+          "declining negative weak weaker slow slowing miss missed concern concerns risk risky "
+          "volatile volatility uncertain uncertainty pressure headwind headwinds delay delayed red "
+          "puts short shorts shorting overvalued expensive",
+    -2.0: "bear bearish loss losses lose losing lost plunge plunged plunging slump slumped tumble "
+          "tumbled sink sank downgrade downgraded cut cuts layoffs lawsuit sued probe investigation "
+          "recall debt default warning warns warned disappointing disappoint disappointed bad "
+          "worse fear fears panic dump dumped dumping bagholder bagholders dip tank tanked tanking "
+          "hate scam fraud",
+    -3.0: "crash crashed crashing collapse collapsed collapsing bankrupt bankruptcy plummet "
+          "plummeted plummeting worst terrible horrible disaster catastrophic rekt wipeout "
+          "worthless delisted delisting",
+}
+LEXICON = {word: valence for valence, words in _VALENCES.items() for word in words.split()}
+
+NEGATIONS = frozenset("not no never none nobody nothing neither nor without cannot cant can't "
+                      "don't dont doesn't doesnt didn't didnt isn't isnt wasn't wasnt won't wont "
+                      "aren't arent shouldn't wouldn't couldn't hardly barely".split())
+BOOSTERS = {w: 0.293 for w in "very extremely really super hugely massively absolutely totally "
+                              "incredibly insanely so most sharply significantly".split()}
+BOOSTERS.update({w: -0.293 for w in "slightly somewhat barely kinda sorta marginally partly little".split()})
+
+NEGATION_SCALAR = -0.74
+NEGATION_WINDOW = 3
+CAPS_INCREMENT = 0.733
+EXCLAMATION_INCREMENT = 0.292
+MAX_EXCLAMATIONS = 4
+BUT_BEFORE, BUT_AFTER = 0.5, 1.5
+NORMALIZE_ALPHA = 15
+
+# Words and sentence ends in one pass; "3.5%" or "U.S." don't end a sentence
+_TOKEN = re.compile(r"[A-Za-z][A-Za-z'\-]*|[.!?]+(?!\S)|\n")
+_TRUNCATION = re.compile(r"\s*\[\+\d+ chars\]$")  # NewsAPI's cut-off marker on content
+
+
+# ===============================
+# SCORING
+# ===============================
+def _normalize(score):
+    return score / math.sqrt(score * score + NORMALIZE_ALPHA)
+
+
+def _sentence_valence(tokens, bangs):
+    """Summed rule-adjusted valence of one sentence's word tokens"""
+    lower = [t.lower() for t in tokens]
+    mixed_case = not all(t.isupper() for t in tokens)  # ALL CAPS only stands out in mixed case
+    but = lower.index("but") if "but" in lower else -1
+
+    total = 0.0
+    for i, word in enumerate(lower):
+        valence = LEXICON.get(word)
+        if valence is None:
+            continue
+        sign = 1 if valence > 0 else -1
+        if mixed_case and tokens[i].isupper() and len(tokens[i]) > 1:
+            valence += sign * CAPS_INCREMENT
+        for back in range(1, NEGATION_WINDOW + 1):
+            if i - back < 0:
+                break
+            prev = lower[i - back]
+            boost = BOOSTERS.get(prev)
+            if boost is not None:
+                valence += sign * boost * (1 if back == 1 else 0.95 if back == 2 else 0.9)
+            if prev in NEGATIONS:
+                valence *= NEGATION_SCALAR
+                break
+        if but >= 0:
+            valence *= BUT_BEFORE if i < but else BUT_AFTER if i > but else 1
+        total += valence
+
+    if total and bangs:
+        total += math.copysign(min(bangs, MAX_EXCLAMATIONS) * EXCLAMATION_INCREMENT, total)
+    return total
+
+
+def _sentences(text):
+    """Yield (word tokens, exclamation marks) per sentence"""
+    words = []
+    for token in _TOKEN.findall(text):
+        if token[0] in ".!?\n":
+            if words:
+                yield words, token.count("!")
+                words = []
+        else:
+            words.append(token)
+    if words:
+        yield words, 0
+
+
+def score_text(text):
+    """Compound sentiment of a whole text in [-1, 1]"""
+    return score_document(text, ())["overall"]
+
+
+def score_document(text, tickers):
+    """
+    {"overall": compound, "tickers": {ticker: compound}}
+    A ticker is scored over the sentences that name it ($TSLA, tsla and TSLA all
+    count); a ticker the text never names (news found by company name) gets the
+    overall score
+    """
+    text = text or ""
+    if text.endswith("chars]"):
+        text = _TRUNCATION.sub("", text)
+
+    overall = 0.0
+    named = dict.fromkeys(tickers, None)
+    for words, bangs in _sentences(text):
+        valence = _sentence_valence(words, bangs)
+        overall += valence
+        if named:
+            upper = {w.upper() for w in words}
+            for ticker in named:
+                if ticker in upper:
+                    named[ticker] = (named[ticker] or 0.0) + valence
+
+    overall = round(_normalize(overall), 4)
+    scores = {t: overall if v is None else round(_normalize(v), 4) for t, v in named.items()}
+    return {"overall": overall, "tickers": scores}
+
+
+def score_batch(docs):
+    """Process pool task: [(text, tickers), ...] -> [score_document(...), ...]"""
+    return [score_document(text, tickers) for text, tickers in docs]
+
+
+# ===============================
+# FINGERPRINT CACHE
+# ===============================
+SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "200000"))
+
+
+def fingerprint(text, tickers):
+    """Content key: the same article re-fetched later (new fetched_at, same text) hits
+    Only whitespace is normalised - case changes the score (ALL CAPS emphasis)"""
+    normalized = " ".join((text or "").split())
+    digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16)
+    digest.update(b"\x00" + ",".join(sorted(tickers)).encode("ascii", "replace"))
+    return digest.digest()
+
+
+class ScoreCache:
+    """LRU of fingerprint -> score_document() result"""
+
+    def __init__(self, max_entries=SENTIMENT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        scores = self._entries.get(key)
+        if scores is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return scores
+
+    def put(self, key, scores):
+        self._entries[key] = scores
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SentimentScorer:
+    """
+    Scores micro-batches of (text, tickers): cached and duplicate documents are
+    resolved in this process, the rest is split into one chunk per pool worker
+    pool=None scores inline (benchmarks, single-core runs)
+    """
+
+    def __init__(self, pool=None, workers=1, cache=None):
+        self.pool = pool
+        self.workers = workers
+        self.cache = cache if cache is not None else ScoreCache()
+
+    def score(self, docs):
+        keys = [fingerprint(text, tickers) for text, tickers in docs]
+        results = [self.cache.get(key) for key in keys]
+
+        pending, fresh = {}, {}
+        for i, (key, scores) in enumerate(zip(keys, results)):
+            if scores is None:
+                pending.setdefault(key, i)  # duplicates inside the batch are scored once
+        if pending:
+            todo = [docs[i] for i in pending.values()]
+            if self.pool is None or self.workers == 1:
+                scored = score_batch(todo)
+            else:
+                size = math.ceil(len(todo) / self.workers)
+                chunks = [todo[i:i + size] for i in range(0, len(todo), size)]
+                scored = [s for part in self.pool.map(score_batch, chunks) for s in part]
+            fresh = dict(zip(pending, scored))
+            for key, scores in fresh.items():
+                self.cache.put(key, scores)
+
+        logging.debug(f"Scored {len(pending)} of {len(docs)} documents, cache {len(self.cache)}")
+        return [scores if scores is not None else fresh[key] for key, scores in zip(keys, results)]
@@ -0,0 +1,242 @@
+import fcntl
+import json
+import logging
+import mmap
+import os
+import socket
+import struct
+import threading
+import zlib
+from quixstreams import Application
+
+# ===============================
+# SPOOL CONFIG
+# ===============================
+# Record layout: crc32 | topic_len | key_len | headers_len | value_len | topic | key | headers | value
+# The crc covers everything after the crc field, so a torn tail write is detected on replay.
+CRC = struct.Struct("<I")
+LENGTHS = struct.Struct("<HHII")
+RECORD_HEADER_SIZE = CRC.size + LENGTHS.size
+SEGMENT_SUFFIX = ".seg"
+LOCK_NAME = ".lock"
+DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+
+
+def broker_available(broker_address, timeout=2.0):
+    """
+    Cheap TCP probe of the first bootstrap broker
+    Avoids blocking flush() for message.timeout.ms when Kafka is down
+    """
+    host, _, port = broker_address.split(",")[0].partition(":")
+    try:
+        with socket.create_connection((host, int(port or 9092)), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def _to_bytes(data):
+    if data is None:
+        return b""
+    if isinstance(data, str):
+        return data.encode("utf-8")
+    return bytes(data)
+
+
+class Spool:
+    """
+    Local append-only spool of undelivered Kafka messages
+    Segment files are written in order and replayed in order via mmap
+    """
+
+    def __init__(self, directory, segment_bytes=DEFAULT_SEGMENT_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._file = None
+        os.makedirs(directory, exist_ok=True)
+        # One process per directory: segment indexes are allocated in memory, so a
+        # second writer would reuse them and delete the other's segments
+        self._dir_lock = open(os.path.join(directory, LOCK_NAME), "w")
+        try:
+            fcntl.flock(self._dir_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._dir_lock.close()
+            raise RuntimeError(f"Spool {directory} is in use by another process; give this one its own directory")
+        segments = self._segments()
+        self._next_index = (segments[-1] + 1) if segments else 0
+
+    def _segments(self):
+        return sorted(
+            int(name[:-len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def _segment_path(self, index):
+        return os.path.join(self.directory, f"{index:010d}{SEGMENT_SUFFIX}")
+
+    def _seal(self):
+        """Close the active segment so the drainer may replay it"""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def append(self, topic, key, value, headers=None):
+        """Append one message; flushed to the OS so it survives a process crash"""
+        topic_b = _to_bytes(topic)
+        key_b = _to_bytes(key)
+        headers_b = json.dumps(
+            [[k, _to_bytes(v).decode("utf-8", "replace")] for k, v in (headers or [])]
+        ).encode("utf-8") if headers else b""
+        value_b = _to_bytes(value)
+
+        body = (
+            LENGTHS.pack(len(topic_b), len(key_b), len(headers_b), len(value_b))
+            + topic_b + key_b + headers_b + value_b
+        )
+        record = CRC.pack(zlib.crc32(body)) + body
+
+        with self._lock:
+            if self._file is None:
+                self._file = open(self._segment_path(self._next_index), "ab")
+                self._next_index += 1
+            self._file.write(record)
+            self._file.flush()
+            if self._file.tell() >= self.segment_bytes:
+                self._seal()
+
+    def sync(self):
+        """fsync the active segment, call once per produced batch"""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+    def pending(self):
+        return bool(self._segments())
+
+    def _read_segment(self, path):
+        """Yield ((start, end), topic, key, value, headers) from a sealed segment, stopping at the first bad record"""
+        size = os.path.getsize(path)
+        if size == 0:
+            return
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = 0
+            while pos + RECORD_HEADER_SIZE <= size:
+                (crc,) = CRC.unpack_from(mm, pos)
+                topic_len, key_len, headers_len, value_len = LENGTHS.unpack_from(mm, pos + CRC.size)
+                end = pos + RECORD_HEADER_SIZE + topic_len + key_len + headers_len + value_len
+                if end > size or zlib.crc32(mm[pos + CRC.size:end]) != crc:
+                    logging.error(f"Spool: corrupt or torn record in {path} at byte {pos}, dropping remainder")
+                    return
+                start = pos + RECORD_HEADER_SIZE
+                topic = mm[start:start + topic_len].decode("utf-8")
+                start += topic_len
+                key = mm[start:start + key_len] or None
+                start += key_len
+                headers = [tuple(h) for h in json.loads(mm[start:start + headers_len])] if headers_len else None
+                start += headers_len
+                value = mm[start:end]
+                yield (pos, end), topic, key, value, headers
+                pos = end
+
+    def replay(self, producer):
+        """
+        Replay spooled segments oldest first through a quixstreams producer
+        A segment is deleted once every record in it was delivered; after a
+        partial replay it is rewritten with only the undelivered records
+        Returns True when the spool is empty afterwards
+        """
+        if not self._replay_lock.acquire(blocking=False):
+            return False  # another thread is already draining
+        try:
+            return self._replay(producer)
+        finally:
+            self._replay_lock.release()
+
+    def _replay(self, producer):
+        with self._lock:
+            self._seal()
+            segments = self._segments()
+
+        for index in segments:
+            path = self._segment_path(index)
+            failures = {}  # record start -> delivery error
+            produced = []
+            unsent_from = None
+
+            for span, topic, key, value, headers in self._read_segment(path):
+                def on_delivery(err, _msg, start=span[0]):
+                    if err is not None:
+                        failures[start] = err
+
+                try:
+                    producer.produce(topic=topic, key=key, value=value, headers=headers, on_delivery=on_delivery)
+                    produced.append(span)
+                except Exception as e:
+                    failures[span[0]] = e
+                    unsent_from = span[0]
+                    break
+            producer.flush()
+
+            if failures:
+                kept = [span for span in produced if span[0] in failures]
+                self._rewrite(path, kept, unsent_from)
+                delivered = len(produced) - len(kept)
+                logging.error(f"Spool: replay of {path} failed ({next(iter(failures.values()))}) after "
+                              f"{delivered} delivered messages, will retry the rest")
+                return False
+
+            os.remove(path)
+            logging.info(f"Spool: replayed {len(produced)} messages from {path}")
+
+        return True
+
+    def _rewrite(self, path, spans, tail_from=None):
+        """Replace a segment with the records at spans plus everything from tail_from on"""
+        with open(path, "rb") as f:
+            data = f.read()
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            for start, end in spans:
+                f.write(data[start:end])
+            if tail_from is not None:
+                f.write(data[tail_from:])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def spool_on_failure(self, err, msg):
+        """on_delivery callback: spool messages the broker never acknowledged"""
+        if err is not None:
+            logging.warning(f"Delivery failed for {msg.topic()} ({err}) - spooling")
+            self.append(msg.topic(), msg.key(), msg.value(), msg.headers())
+
+
+class SpoolDrainer(threading.Thread):
+    """Background thread replaying the spool whenever the broker is reachable"""
+
+    def __init__(self, spool, broker_address="localhost:9092", interval=10.0):
+        super().__init__(name="spool-drainer", daemon=True)
+        self.spool = spool
+        self.broker_address = broker_address
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            if not self.spool.pending() or not broker_available(self.broker_address):
+                continue
+            try:
+                app = Application(broker_address=self.broker_address, loglevel="INFO")
+                with app.get_producer() as producer:
+                    self.spool.replay(producer)
+            except Exception as e:
+                logging.error(f"Spool drainer error: {e}")
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,278 @@
+import json
+import logging
+import os
+import time
+import uuid
+from confluent_kafka import KafkaException, TopicPartition
+from quixstreams import Application
+
+from common.metrics import metrics
+from common.topics import ensure_topic
+
+# ===============================
+# SWEEP CONFIG
+# ===============================
+# A sweep is the ticker universe split into work units (lists of search terms),
+# published to one work topic per provider. Workers in the provider's consumer
+# group fetch a unit, produce its output, and commit the unit's offset only after
+# that output is flushed - a worker that dies mid-unit leaves it to the new owner.
+# The partition count caps how many workers can share one sweep. A unit that
+# keeps failing is parked on ticker-sweep-<provider>-parked, not dropped; the
+# coordinator puts parked units back on the work topic (requeue_parked).
+WORK_TOPIC_PREFIX = "ticker-sweep-"
+WORK_PARTITIONS = int(os.getenv("SWEEP_WORK_PARTITIONS", "12"))
+MAX_UNIT_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 10.0  # doubled per attempt; the first already outlasts a provider circuit's open time
+MAX_POLL_INTERVAL_MS = 15 * 60 * 1000  # one unit must finish well within this
+
+
+def work_topic(provider):
+    return f"{WORK_TOPIC_PREFIX}{provider}"
+
+
+def worker_group(provider):
+    return f"{WORK_TOPIC_PREFIX}{provider}-workers"
+
+
+def parked_topic(provider):
+    return f"{WORK_TOPIC_PREFIX}{provider}-parked"
+
+
+def make_units(provider, terms, unit_size, params=None):
+    """Split the search terms into work unit dicts sharing one sweep_id"""
+    terms = list(terms)
+    sweep_id = uuid.uuid4().hex[:12]
+    batches = [terms[i:i + unit_size] for i in range(0, len(terms), unit_size)]
+    return [
+        {
+            "sweep_id": sweep_id,
+            "provider": provider,
+            "unit": n,
+            "units": len(batches),
+            "terms": batch,
+            "params": params or {},
+        }
+        for n, batch in enumerate(batches)
+    ]
+
+
+def publish_sweep(broker_address, provider, terms, unit_size, params=None):
+    """Coordinator: publish one sweep of work units, returns the sweep_id"""
+    topic = work_topic(provider)
+    ensure_topic(broker_address, topic, WORK_PARTITIONS)
+    units = make_units(provider, terms, unit_size, params)
+
+    app = Application(broker_address=broker_address, loglevel="INFO")
+    with app.get_producer() as producer:
+        for unit in units:
+            producer.produce(
+                topic=topic,
+                key=f"{unit['sweep_id']}:{unit['unit']}",  # unit number spreads evenly over partitions
+                value=json.dumps(unit).encode("utf-8"),
+            )
+        remaining = producer.flush()
+    if remaining:
+        raise RuntimeError(f"{remaining} work units for {topic} were not delivered")
+
+    metrics.inc("pipeline_sweep_units_total", value=len(units), provider=provider, status="published")
+    logging.info(f"Published sweep {units[0]['sweep_id'] if units else '-'}: "
+                 f"{len(units)} units of {unit_size} terms to {topic}")
+    return units[0]["sweep_id"] if units else None
+
+
+def remaining_units(broker_address, provider):
+    """Units published but not yet committed by the worker group (the group's lag)"""
+    topic = work_topic(provider)
+    app = Application(
+        broker_address=broker_address,
+        loglevel="WARNING",
+        consumer_group=worker_group(provider),
+        auto_offset_reset="earliest",
+    )
+    with app.get_consumer(auto_commit_enable=False) as consumer:
+        metadata = consumer.list_topics(topic, timeout=10)
+        if topic not in metadata.topics:
+            return 0
+        partitions = [TopicPartition(topic, p) for p in metadata.topics[topic].partitions]
+        remaining = 0
+        for tp in consumer.committed(partitions, timeout=10):
+            low, high = consumer.get_watermark_offsets(tp, timeout=10)
+            committed = tp.offset if tp.offset >= 0 else low
+            remaining += max(high - committed, 0)
+    return remaining
+
+
+def requeue_parked(broker_address, provider, idle_polls=10):
+    """Coordinator: move every parked unit back onto the work topic, returns how many"""
+    source = parked_topic(provider)
+    ensure_topic(broker_address, source, 1)
+    app = Application(
+        broker_address=broker_address,
+        loglevel="INFO",
+        consumer_group=f"{worker_group(provider)}-requeue",
+        auto_offset_reset="earliest",
+    )
+    moved = 0
+    with app.get_consumer(auto_commit_enable=False) as consumer, app.get_producer() as producer:
+        consumer.subscribe(topics=[source])
+        idle = 0
+        while idle < idle_polls:
+            msg = consumer.poll(1)
+            if msg is None:
+                idle += 1
+                continue
+            elif msg.error():
+                logging.error(msg.error())
+                continue
+            idle = 0
+            producer.produce(topic=work_topic(provider), key=msg.key(), value=msg.value())
+            moved += 1
+        if producer.flush():
+            raise RuntimeError(f"Requeued {provider} units were not all delivered - parked offsets kept")
+        if moved:
+            consumer.commit(asynchronous=False)
+
+    metrics.inc("pipeline_sweep_units_total", value=moved, provider=provider, status="requeued")
+    logging.info(f"Requeued {moved} parked {provider} units")
+    return moved
+
+
+def park_unit(producer, provider, msg, error, attempts):
+    """Worker: put a unit that keeps failing on the parked topic; False if that didn't reach Kafka"""
+    producer.produce(
+        topic=parked_topic(provider),
+        key=msg.key(),
+        value=msg.value(),
+        headers=[
+            ("error_class", type(error).__name__),
+            ("error_message", str(error)[:1000]),
+            ("attempts", str(attempts)),
+            ("failed_at", str(int(time.time() * 1000))),
+        ],
+    )
+    return producer.flush(timeout=30) == 0
+
+
+def wait_for_sweep(broker_address, provider, poll_seconds=5.0):
+    """Block until the worker group has committed every published unit"""
+    start = time.monotonic()
+    while True:
+        remaining = remaining_units(broker_address, provider)
+        metrics.set_gauge("pipeline_sweep_units_remaining", remaining, provider=provider)
+        if remaining == 0:
+            elapsed = time.monotonic() - start
+            logging.info(f"Sweep for {provider} drained in {elapsed:.1f}s")
+            return elapsed
+        logging.info(f"{provider}: {remaining} units remaining")
+        time.sleep(poll_seconds)
+
+
+# ===============================
+# WORKER
+# ===============================
+class UnitDelivery:
+    """
+    on_delivery callback for a unit's output; pass check as run_worker's
+    on_flushed so a unit with any undelivered record fails and is retried
+    instead of committed
+    """
+
+    def __init__(self):
+        self.failed = 0
+        self.error = None
+
+    def on_delivery(self, err, msg):
+        if err is not None:
+            self.failed += 1
+            self.error = err
+
+    def check(self):
+        failed, self.failed = self.failed, 0
+        if failed:
+            raise RuntimeError(f"{failed} output messages not delivered ({self.error})")
+
+
+def run_worker(provider, process_unit, broker_address="localhost:9092", on_flushed=None, max_units=None):
+    """
+    Consume work units for `provider` as one member of its consumer group
+    process_unit(unit, producer) produces the unit's output and returns a count;
+    the unit's offset is committed once producer.flush() leaves nothing queued
+    and on_flushed() (e.g. UnitDelivery.check) has not raised
+    """
+    topic = work_topic(provider)
+    ensure_topic(broker_address, topic, WORK_PARTITIONS)
+    ensure_topic(broker_address, parked_topic(provider), 1)
+    app = Application(
+        broker_address=broker_address,
+        loglevel="INFO",
+        consumer_group=worker_group(provider),
+        auto_offset_reset="earliest",
+        consumer_extra_config={"max.poll.interval.ms": MAX_POLL_INTERVAL_MS},
+    )
+    attempts = {}
+    done = 0
+
+    def on_assign(consumer, partitions):
+        logging.info(f"Assigned {topic} partitions {sorted(tp.partition for tp in partitions)}")
+
+    def on_revoke(consumer, partitions):
+        logging.info(f"Revoked {topic} partitions {sorted(tp.partition for tp in partitions)}")
+
+    with app.get_consumer(auto_commit_enable=False) as consumer, app.get_producer() as producer:
+        consumer.subscribe(topics=[topic], on_assign=on_assign, on_revoke=on_revoke)
+        logging.info(f"Worker joined {worker_group(provider)}")
+
+        while max_units is None or done < max_units:
+            try:
+                msg = consumer.poll(1)
+                if msg is None:
+                    continue
+                elif msg.error():
+                    logging.error(msg.error())
+                    continue
+
+                position = (msg.partition(), msg.offset())
+                unit = json.loads(msg.value())
+                label = f"{unit['sweep_id']}:{unit['unit'] + 1}/{unit['units']}"
+
+                try:
+                    with metrics.timer("sweep_unit", provider=provider):
+                        produced = process_unit(unit, producer)
+                        remaining = producer.flush()
+                        if on_flushed:
+                            on_flushed()
+                    if remaining:
+                        raise RuntimeError(f"{remaining} output messages still queued after flush")
+                except Exception as e:
+                    attempts[position] = attempts.get(position, 0) + 1
+                    if attempts[position] < MAX_UNIT_ATTEMPTS:
+                        logging.error(f"Unit {label} failed ({e}), retry {attempts[position]}/{MAX_UNIT_ATTEMPTS - 1}")
+                        metrics.inc("pipeline_sweep_units_total", provider=provider, status="retried")
+                        consumer.seek(TopicPartition(msg.topic(), msg.partition(), msg.offset()))
+                        time.sleep(RETRY_BACKOFF_SECONDS * 2 ** (attempts[position] - 1))
+                        continue
+                    if not park_unit(producer, provider, msg, e, attempts[position]):
+                        # Not parked: keep the unit on the work topic rather than lose it
+                        logging.error(f"Could not park unit {label} - retrying it")
+                        consumer.seek(TopicPartition(msg.topic(), msg.partition(), msg.offset()))
+                        time.sleep(RETRY_BACKOFF_SECONDS)
+                        continue
+                    logging.error(f"Unit {label} failed {attempts[position]} times ({e}) - parked {unit['terms']}")
+                    metrics.inc("pipeline_sweep_units_total", provider=provider, status="parked")
+                else:
+                    metrics.inc("pipeline_sweep_units_total", provider=provider, status="done")
+                    metrics.inc("pipeline_messages_total", value=produced, stage="sweep", topic=topic)
+                    logging.info(f"Unit {label} done: {produced} messages from {len(unit['terms'])} terms")
+
+                attempts.pop(position, None)
+                done += 1
+                try:
+                    consumer.commit(message=msg, asynchronous=False)
+                except KafkaException as e:
+                    # Partition moved during a slow unit; its new owner redoes it
+                    logging.warning(f"Commit of unit {label} failed ({e}) - unit will be redone")
+
+            except KeyboardInterrupt:
+                logging.info("Worker leaving group")
+                break
+    return done
@@ -0,0 +1,68 @@
+import logging
+import re
+from collections import Counter
+
+import pandas as pd
+
+from common.profiling import hot_path
+
+# ===============================
+# CSV FETCH
+# ===============================
+def clean_name(company_name):
+    if not company_name:
+        return ""
+
+    name = company_name.strip()
+
+    replacements = {
+        ' Inc.': '', ' Inc': '', ' Corporation': '', ' Corp.': '', ' Corp': '',
+        ' Company': '', ' Co.': '', ' Co': '', ' Ltd.': '', ' Ltd': '',
+        ' Limited': '', ' plc': '', ' PLC': '', ' Group': '', ' (The)': '', 'The ': '',
+    }
+
+    for old, new in replacements.items():
+        name = name.replace(old, new)
+
+    return name.strip()
+
+
+def load_sp500(csv_path="constituents.csv"):
+    """
+    Symbols plus cleaned company names, multi-word names quoted as phrases
+    Every term costs search quota: reddit/constituents.csv gives 979 terms,
+    49 OR-queries of 20 per reddit sweep (60 req/min budget)
+    """
+    df = pd.read_csv(csv_path)
+    symbols = df["Symbol"].str.upper().tolist()
+    names = []
+
+    for _, row in df.iterrows():
+        cleaned = clean_name(row["Security"])
+        if cleaned and len(cleaned.split()) > 1:
+            names.append(f'"{cleaned.upper()}"')
+        elif cleaned:
+            names.append(cleaned.upper())
+
+    search_terms = set(symbols + names)
+    logging.info(f"Loaded {len(search_terms)} search terms from {csv_path}")
+    return search_terms
+
+
+# ===============================
+# TICKER MATCHING
+# ===============================
+TICKER_PATTERN = re.compile(r'\b[A-Z]{3,5}\b', re.IGNORECASE)
+
+
+@hot_path("count_tickers")
+def count_tickers(content, search_terms):
+    """
+    Count 3-5 letter search terms in a post, case-insensitively
+    Only the candidate words are uppercased, not the whole post, and they are
+    counted in one pass instead of words.count() per search term
+    """
+    if not content:
+        return {}
+    words = Counter(w.upper() for w in TICKER_PATTERN.findall(content))
+    return {word: count for word, count in words.items() if word in search_terms}
@@ -0,0 +1,21 @@
+import logging
+from confluent_kafka import KafkaException
+from confluent_kafka.admin import AdminClient, NewTopic
+
+
+def ensure_topic(broker_address, topic, partitions, config=None):
+    """Create `topic` if it doesn't exist; warns when an existing one has fewer partitions"""
+    admin = AdminClient({"bootstrap.servers": broker_address})
+    existing = admin.list_topics(timeout=10).topics
+    if topic in existing:
+        if len(existing[topic].partitions) < partitions:
+            logging.warning(f"{topic} has {len(existing[topic].partitions)} partitions, wanted {partitions}")
+        return
+    futures = admin.create_topics([NewTopic(topic, num_partitions=partitions, replication_factor=1, config=config or {})])
+    for name, future in futures.items():
+        try:
+            future.result()
+            logging.info(f"Created topic {name} with {partitions} partitions")
+        except KafkaException as e:
+            if "TOPIC_ALREADY_EXISTS" not in str(e):
+                raise
@@ -1,16 +1,49 @@
+import argparse
 import requests
 import time
 import json
 import logging
 import csv
 import os
+import sys
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from quixstreams import Application
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.spool import Spool, SpoolDrainer, broker_available
+from common.partitioning import SkewAwarePartitioner, PartitionStats, chain_on_delivery
+from common.metrics import metrics, start_from_env, trace_headers
+from common.profiling import hot_path, install_profiler
+from common.messages import RawNewsMessage, batch_timestamp
+from common.sweep import UnitDelivery, run_worker
+from common.ratelimit import get_limiter
+from common.resilience import MAX_CONCURRENCY, CircuitOpenError, guard_for
+
 load_dotenv()
 
+BROKER_ADDRESS = "localhost:9092"
+RAW_NEWS_TOPIC = "raw-news"
+SPOOL_DIR = os.getenv("RAW_NEWS_SPOOL_DIR", "data/spool/raw-news")
+SWEEP_PROVIDER = "news"
+NEWS_API_URL = os.getenv("NEWS_API_URL", "https://newsapi.org/v2/everything")
+NEWS_DOMAINS = ",".join([
+    "reuters.com",
+    "marketwatch.com",
+    "wsj.com",
+    "bloomberg.com",
+    "fortune.com",
+    "forbes.com",
+    "businessinsider.com",
+    "fool.com",
+    "investing.com",
+    "seekingalpha.com",
+])
+spool = None  # opened in __main__; worker mode retries failed units instead of spooling
+partitioner = SkewAwarePartitioner()
+
 
 def load_sp500_companies(csv_path="constituents.csv"):
     """Load S&P 500 companies (symbol + name) from CSV file"""
@@ -68,27 +101,41 @@ def save_batch_summary(results, filename="data/fetch_summary.json"):
     logging.info(f"Batch summary saved to {filename}")
 
 
-def fetch_news_for_ticker(ticker, from_date, to_date, domains):
+def fetch_news_for_ticker(ticker, from_date, to_date, domains, raise_errors=False):
     """
     Fetch news for a single ticker from NewsAPI
     Returns list of article dictionaries
+    Paced by the shared newsapi limiter, so any number of workers stay in quota
+    Raises CircuitOpenError while NewsAPI is browned out instead of hammering it
+    With raise_errors, 429/5xx responses and request errors raise instead of
+    returning [], so a sweep unit fails and is retried rather than committed empty
     """
+    api_key = os.getenv("NEWS_API_KEY", "")
+    limiter = get_limiter()
     try:
-        response = requests.get(
-            "https://newsapi.org/v2/everything",
-            params={
-                "q": ticker,
-                "domains": domains,
-                "language": "en",
-                "sortBy": "publishedAt",
-                "searchIn": "title,description",
-                "from": from_date,
-                "to": to_date,
-                "pageSize": 100,
-                "apiKey": os.getenv("NEWS_API_KEY", ""),
-            },
-            timeout=10
-        )
+        limiter.acquire("newsapi", api_key)
+        with metrics.timer("http", provider="newsapi"):
+            response = guard_for("newsapi.everything").run(
+                requests.get,
+                NEWS_API_URL,
+                params={
+                    "q": ticker,
+                    "domains": domains,
+                    "language": "en",
+                    "sortBy": "publishedAt",
+                    "searchIn": "title,description",
+                    "from": from_date,
+                    "to": to_date,
+                    "pageSize": 100,
+                    "apiKey": api_key,
+                },
+                timeout=10
+            )
+        metrics.inc("pipeline_http_requests_total", provider="newsapi", status=response.status_code)
+        if response.status_code == 429:
+            metrics.inc("pipeline_rate_limited_total", provider="newsapi")
+            retry_after = response.headers.get("Retry-After", "")
+            limiter.penalize("newsapi", api_key, float(retry_after) if retry_after.isdigit() else 60.0)
 
         if response.status_code == 200:
             data = response.json()
@@ -97,29 +144,75 @@ def fetch_news_for_ticker(ticker, from_date, to_date, domains):
             return articles
         else:
             logging.error(f"{ticker}: API error {response.status_code}")
+            if raise_errors and (response.status_code == 429 or response.status_code >= 500):
+                response.raise_for_status()
             return []
 
+    except CircuitOpenError:
+        raise
     except Exception as e:
+        metrics.inc("pipeline_http_errors_total", provider="newsapi")
         logging.error(f"{ticker}: Exception {str(e)}")
+        if raise_errors:
+            raise
         return []
 
 
-def create_raw_news_message(article, primary_ticker, all_mentioned_tickers):
+@hot_path("create_raw_news_message")
+def create_raw_news_message(article, primary_ticker, all_mentioned_tickers, fetched_at=None):
     """
     Create standardized message for raw-news topic
     Converts NewsAPI format to custom schema
+    Pass fetched_at from batch_timestamp() to share one timestamp per batch
     """
-    return {
-        "primary_ticker": primary_ticker,
-        "mentioned_tickers": all_mentioned_tickers,
-        "title": article.get('title', ''),
-        "description": article.get('description', ''),
-        "content": article.get('content', ''),
-        "url": article.get('url', ''),
-        "source": article.get('source', {}).get('name', ''),
-        "published_at": article.get('publishedAt', ''),
-        "fetched_at": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
-    }
+    return RawNewsMessage.from_article(
+        article,
+        primary_ticker,
+        all_mentioned_tickers,
+        fetched_at or batch_timestamp(),
+    )
+
+
+def fetch_ticker_messages(ticker_symbol, from_date, to_date, raise_errors=False):
+    """
+    Fetch one ticker's articles as raw-news messages
+    Shared by the single-process sweep and the sweep workers
+    """
+    articles = fetch_news_for_ticker(ticker_symbol, from_date, to_date, NEWS_DOMAINS, raise_errors)
+    fetched_at = batch_timestamp()
+
+    return [
+        create_raw_news_message(
+            article=article,
+            primary_ticker=ticker_symbol,
+            all_mentioned_tickers=[ticker_symbol],  # You'll need to implement ticker extraction
+            fetched_at=fetched_at,
+        )
+        for article in articles
+    ]
+
+
+def fetch_many(symbols, from_date, to_date, raise_open=False):
+    """
+    Fetch several tickers in parallel, yielding (symbol, messages) in input order
+    The newsapi guard decides how many requests are really in flight
+    messages is None for a ticker skipped while the circuit stayed open,
+    unless raise_open, which aborts instead - on provider errors (429/5xx) too
+    """
+    def fetch(symbol):
+        try:
+            return symbol, fetch_ticker_messages(symbol, from_date, to_date, raise_errors=raise_open)
+        except CircuitOpenError as e:
+            if raise_open:
+                raise
+            logging.error(f"{symbol}: skipped - {e}")
+            return symbol, None
+
+    pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="newsapi")
+    try:
+        yield from pool.map(fetch, symbols)
+    finally:
+        pool.shutdown(cancel_futures=True)
 
 
 def get_all_news(sp500_companies):
@@ -130,55 +223,28 @@ def get_all_news(sp500_companies):
     from_date = get_thirty_days_ago()
     to_date = get_today()
 
-    domains = ",".join([
-        "reuters.com",
-        "marketwatch.com",
-        "wsj.com",
-        "bloomberg.com",
-        "fortune.com",
-        "forbes.com",
-        "businessinsider.com",
-        "fool.com",
-        "investing.com",
-        "seekingalpha.com",
-    ])
-
     all_messages = []
     messages_by_ticker = {}
 
     fetch_stats = {
         "total_tickers": len(sp500_companies),
         "tickers_processed": 0,
+        "tickers_skipped": 0,
         "total_articles": 0,
         "start_time": datetime.utcnow().isoformat(),
     }
 
-    for i, company in enumerate(sp500_companies, 1):
-        ticker_symbol = company['symbol']
-        logging.info(f"Processing {i}/{len(sp500_companies)}: {ticker_symbol}")
-
-        articles = fetch_news_for_ticker(ticker_symbol, from_date, to_date, domains)
-
-        ticker_messages = []
-
-        for article in articles:
-            full_text = f"{article.get('title', '')} {article.get('description', '')} {article.get('content', '')}"
-
-            message = create_raw_news_message(
-                article=article,
-                primary_ticker=ticker_symbol,
-                all_mentioned_tickers=[ticker_symbol]  # You'll need to implement ticker extraction
-            )
-
-            all_messages.append(message)
-            ticker_messages.append(message)
+    symbols = [company['symbol'] for company in sp500_companies]
+    for i, (ticker_symbol, ticker_messages) in enumerate(fetch_many(symbols, from_date, to_date), 1):
+        logging.info(f"Processed {i}/{len(sp500_companies)}: {ticker_symbol}")
+        if ticker_messages is None:
+            fetch_stats["tickers_skipped"] += 1
+            continue
 
+        all_messages.extend(ticker_messages)
         messages_by_ticker[ticker_symbol] = ticker_messages
         fetch_stats["tickers_processed"] += 1
-        fetch_stats["total_articles"] += len(articles)
-
-        if i < len(sp500_companies):
-            time.sleep(1.5)
+        fetch_stats["total_articles"] += len(ticker_messages)
 
     fetch_stats["end_time"] = datetime.utcnow().isoformat()
     save_batch_summary(fetch_stats)
@@ -192,29 +258,68 @@ def get_all_news(sp500_companies):
 def produce_to_kafka(messages):
     """
     Send all messages to Kafka raw-news topic
-    Partitions by primary_ticker for parallel processing
+    Partitions by primary_ticker for parallel processing; heavy tickers are
+    salted (AAPL#0..AAPL#7) so mega-caps don't pin a single partition
+    Messages go to the local spool when the broker is down or the queue is full
     """
+    if not broker_available(BROKER_ADDRESS):
+        logging.warning(f"Kafka unavailable at {BROKER_ADDRESS} - spooling {len(messages)} messages")
+        for msg in messages:
+            spool.append(RAW_NEWS_TOPIC, partitioner.key_for(msg.primary_ticker), msg.encode(), trace_headers())
+        spool.sync()
+        return
+
     app = Application(
-        broker_address="localhost:9092",
+        broker_address=BROKER_ADDRESS,
         loglevel="INFO",
     )
 
-    with app.get_producer() as producer:
-        for msg in messages:
-            try:
-                producer.produce(
-                    topic="raw-news",
-                    key=msg["primary_ticker"],
-                    value=json.dumps(msg),
-                )
-                logging.debug(f"Produced: {msg['primary_ticker']} - {msg['title'][:50]}...")
-            except Exception as e:
-                logging.error(f"Failed to produce message: {str(e)}")
+    partition_stats = PartitionStats()
+    on_delivery = chain_on_delivery(spool.spool_on_failure, partition_stats.on_delivery)
 
+    with app.get_producer() as producer:
+        # Older spooled messages go first; if they can't, keep new ones behind them
+        spooling = spool.pending() and not spool.replay(producer)
+        produce_messages(producer, messages, on_delivery, spooling)
         producer.flush()
+        spool.sync()
+        partition_stats.save("data/partition_stats_raw_news.json")
         logging.info(f"Successfully produced {len(messages)} messages to Kafka")
 
 
+def produce_messages(producer, messages, on_delivery, spooling=False):
+    """
+    Produce raw-news messages through an open producer; the caller flushes
+    Anything that can't be handed to the producer goes to the spool
+    """
+    for msg in messages:
+        key = partitioner.key_for(msg.primary_ticker)
+        headers = trace_headers()
+        with metrics.timer("serialize", topic=RAW_NEWS_TOPIC):
+            value = msg.encode()
+        if spooling:
+            spool.append(RAW_NEWS_TOPIC, key, value, headers)
+            continue
+        try:
+            with metrics.timer("produce", topic=RAW_NEWS_TOPIC):
+                producer.produce(
+                    topic=RAW_NEWS_TOPIC,
+                    key=key,
+                    value=value,
+                    headers=headers,
+                    on_delivery=on_delivery,
+                )
+            metrics.inc("pipeline_messages_total", stage="produce", topic=RAW_NEWS_TOPIC)
+            metrics.set_gauge("pipeline_producer_queue_depth", len(producer), topic=RAW_NEWS_TOPIC)
+            logging.debug(f"Produced: {key} - {(msg.title or '')[:50]}...")
+        except Exception as e:
+            if spool is None:
+                raise  # worker mode: the unit fails and is retried
+            logging.error(f"Failed to produce message: {str(e)} - spooling")
+            metrics.inc("pipeline_messages_total", stage="spool", topic=RAW_NEWS_TOPIC)
+            spool.append(RAW_NEWS_TOPIC, key, value, headers)
+
+
 def main():
     """
     Main execution flow:
@@ -241,6 +346,9 @@ def main_continuous():
     Continuous mode: Run every 5 minutes
     Use for production deployment
     """
+    drainer = SpoolDrainer(spool, broker_address=BROKER_ADDRESS)
+    drainer.start()
+
     while True:
         try:
             main()
@@ -248,17 +356,59 @@ def main_continuous():
             time.sleep(300)
         except KeyboardInterrupt:
             logging.info("Shutting down...")
+            drainer.stop()
             break
         except Exception as e:
             logging.error(f"Error in main loop: {str(e)}")
             time.sleep(60)
 
 
+def main_worker():
+    """
+    Sweep worker mode: fetch the ticker units published by
+    tools/ticker-sweep-coordinator.py --provider news
+    Start as many as the work topic has partitions, on any host
+    """
+    partition_stats = PartitionStats()
+    # No spool here: a record the broker never acknowledged fails the unit, so
+    # it is redone and committed only once all of its output is in Kafka
+    delivery = UnitDelivery()
+    on_delivery = chain_on_delivery(delivery.on_delivery, partition_stats.on_delivery)
+
+    def process_unit(unit, producer):
+        params = unit["params"]
+        from_date = params.get("from_date") or get_thirty_days_ago()
+        to_date = params.get("to_date") or get_today()
+
+        # An open circuit or a provider error fails the unit, so it is retried instead of committed empty
+        produced = 0
+        for _, messages in fetch_many(unit["terms"], from_date, to_date, raise_open=True):
+            produce_messages(producer, messages, on_delivery)
+            produced += len(messages)
+        return produced
+
+    try:
+        run_worker(SWEEP_PROVIDER, process_unit, BROKER_ADDRESS, on_flushed=delivery.check)
+    finally:
+        partition_stats.save(f"data/partition_stats_raw_news_worker_{os.getpid()}.json")
+
+
 if __name__ == "__main__":
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
+    parser = argparse.ArgumentParser(description="S&P 500 news fetch into the raw-news topic")
+    parser.add_argument("--worker", action="store_true", help="join the sweep worker group instead of fetching everything")
+    args = parser.parse_args()
+
+    service = "news-fetch-worker" if args.worker else "news-fetch"
+    start_from_env(service)
+    install_profiler(service)
 
-    main()
-    # main_continuous()
\ No newline at end of file
+    if args.worker:
+        main_worker()
+    else:
+        spool = Spool(SPOOL_DIR)
+        main()
+        # main_continuous()
\ No newline at end of file
@@ -1,11 +1,22 @@
+import argparse
 import json
 import logging
 import os
-from datetime import datetime
+import sys
+import time
+from confluent_kafka import KafkaException, TopicPartition
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from quixstreams import Application
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.mention_series import POST_MENTIONS_TABLE, MentionBuffer, add_mentions, mention_rows
+from common.metrics import metrics, start_from_env, observe_end_to_end
+from common.profiling import hot_path, install_profiler
+from common.reddit_rows import POSTS_TABLE, post_row
+from common.retry import FailureRouter, PermanentError, dlq_topic, ensure_failure_topics, is_retryable, run_retry_lane
+from common.topics import ensure_topic
+
 load_dotenv(".env")
 url = os.getenv("SUPABASE_URL", "")
 key = os.getenv("SUPABASE_KEY", "")
@@ -18,12 +29,33 @@ app = Application(
     auto_offset_reset='latest',
 )
 
+POSTS_TOPIC = 'reddit-wsb-posts-kafka'
+LAG_INTERVAL_SECONDS = 15
+PARK_FAILURE_BACKOFF_SECONDS = 5
+
 def kafka_consumer():
-    with app.get_consumer() as consumer:
-        consumer.subscribe(topics=['reddit-wsb-posts-kafka'])
+    # Failed messages are parked in a retry tier or the DLQ, never retried in place
+    ensure_failure_topics('localhost:9092', POSTS_TOPIC)
+    with app.get_consumer() as consumer, app.get_producer() as producer:
+        consumer.subscribe(topics=[POSTS_TOPIC])
+        router = FailureRouter(producer, POSTS_TOPIC)
+        mentions = MentionBuffer(supabase)
+        unstored = {}  # (topic, partition) -> last handled msg, stored once its mentions are written
+        last_lag_check = 0.0
 
         while True:
             try:
+                if unstored and (mentions.due() or not mentions.rows):
+                    if mentions.rows:
+                        flush_mentions(mentions, router)
+                    for last in unstored.values():
+                        try:
+                            consumer.store_offsets(last)
+                        except KafkaException as e:
+                            # Partition revoked meanwhile; the new owner re-reads it (the writes are idempotent)
+                            logging.warning(f"Could not store offset for {last.topic()}[{last.partition()}]: {e}")
+                    unstored = {}
+
                 msg = consumer.poll(1)
                 if msg is None:
                     logging.debug("No message")
@@ -33,60 +65,319 @@ def kafka_consumer():
                     continue
 
                 msg_key = msg.key().decode("utf-8") if msg.key() else "None"
-                value = json.loads(msg.value().decode("utf-8"))
                 offset = msg.offset()
-                logging.debug(f"Received: key={msg_key}, value={value['id'][:10]}..., offset={offset}")
+                try:
+                    with metrics.timer("deserialize", topic=POSTS_TOPIC):
+                        value = json.loads(msg.value())  # bytes straight in, no decoded copy
+                    logging.debug(f"Received: key={msg_key}, value={str(value.get('id'))[:10]}..., offset={offset}")
+
+                    with metrics.timer("supabase_write"):
+                        supabase_consumer(value)  # Process
+                    mentions.add(value, msg)  # idempotent, so duplicates are buffered too
+                    metrics.inc("pipeline_messages_total", stage="consume", topic=POSTS_TOPIC)
+                    observe_end_to_end(msg.headers(), POSTS_TOPIC)
+                    logging.info("Processed message")
+                except Exception as e:
+                    metrics.inc("pipeline_db_errors_total", table=POSTS_TABLE)
+                    try:
+                        router.handle_failure(msg, e)
+                    except Exception as park_error:
+                        # Not parked: re-read this offset instead of skipping it
+                        logging.error(f"Could not park {msg_key}@{offset}: {park_error}")
+                        consumer.seek(TopicPartition(msg.topic(), msg.partition(), offset))
+                        time.sleep(PARK_FAILURE_BACKOFF_SECONDS)
+                        continue
+                unstored[(msg.topic(), msg.partition())] = msg
 
-                supabase_consumer(value)  # Process
-                consumer.store_offsets(msg)
-                logging.info("Processed message")
+                if time.monotonic() - last_lag_check > LAG_INTERVAL_SECONDS:
+                    last_lag_check = time.monotonic()
+                    _, high = consumer.get_watermark_offsets(TopicPartition(msg.topic(), msg.partition()), timeout=1)
+                    metrics.set_gauge("pipeline_consumer_lag", high - offset - 1,
+                                      topic=msg.topic(), partition=msg.partition())
 
             except KeyboardInterrupt:
                 logging.info("Shutting down consumer")
                 break
             except Exception as e:
+                # A failed mention flush keeps its rows and offsets for the next attempt
                 logging.error(f"Loop error: {e}")
+                time.sleep(1)
+
+
+def flush_mentions(mentions, router):
+    """
+    mentions.flush(); if the batch fails with a permanent error, write message
+    by message and park the messages whose rows can never be written, so one
+    bad row doesn't hold every partition's offsets back
+    Retryable errors propagate and keep the unwritten rows buffered
+    """
+    try:
+        return mentions.flush()
+    except Exception as e:
+        if is_retryable(e):
+            raise
+        logging.warning(f"Mention batch rejected ({type(e).__name__}: {e}), writing message by message")
+
+    def on_error(msg, e):
+        if is_retryable(e):
+            raise e  # the messages written so far are re-written as no-ops
+        metrics.inc("pipeline_db_errors_total", table=POST_MENTIONS_TABLE)
+        router.handle_failure(msg, e)
 
+    return mentions.flush_each(on_error)
 
+
+@hot_path("supabase_consumer")
 def supabase_consumer(value):
     post_id = value.get("id")
     if not post_id:
-        logging.error("No post_id in message")
-        return
+        raise PermanentError("No post_id in message")
+
+    # Errors propagate: the caller routes them to a retry tier or the DLQ.
+    # No duplicate check first: a stored post is left as is by the upsert, and
+    # total_mentions moves with the mention rows (wsb_add_mentions), once per post
+    supabase.table(POSTS_TABLE).upsert(post_row(value), on_conflict="post_id", ignore_duplicates=True).execute()
+    logging.info(f"Stored post: {post_id}")
+
+
+def retry_handler(value, msg):
+    """Retry lane: no buffering, the mention rows are written with the post"""
+    supabase_consumer(value)
+    add_mentions(supabase, mention_rows(value))
+
+
+# ===============================
+# EXACTLY-ONCE MODE
+# ===============================
+# --exactly-once: each batch of posts becomes one derived record per post on
+# DERIVED_TOPIC (the post row plus its mention rows), produced and the input
+# offsets committed in a single Kafka transaction - a crash or rebalance
+# either publishes the whole batch with its offsets or neither.
+# --sink: the only writer to Supabase in this mode. It reads committed derived
+# records, applies a batch with idempotent writes and commits its offsets after,
+# so a redelivered batch changes nothing. Records that can never be written go
+# to reddit-wsb-derived-dlq instead of blocking the partition.
+DERIVED_TOPIC = 'reddit-wsb-derived'
+DERIVED_PARTITIONS = 6
+EOS_BATCH_SIZE = 500
+EOS_BATCH_SECONDS = 1.0
+SINK_BATCH_SIZE = 1000
+SINK_BATCH_SECONDS = 2.0
+SINK_RETRY_SECONDS = 5
+
+
+def derive(value):
+    """(key, derived record) for one post"""
+    post_id = value.get("id")
+    if not post_id:
+        raise PermanentError("No post_id in message")
+    derived = {"post": post_row(value), "mentions": mention_rows(value)}
+    return post_id, json.dumps(derived, separators=(",", ":")).encode("utf-8")
+
+
+def _offsets(batch, after):
+    """{(topic, partition): offset} of each partition's first message, or past its last"""
+    offsets = {}
+    for msg in batch:
+        tp = (msg.topic(), msg.partition())
+        if after:
+            offsets[tp] = msg.offset() + 1
+        else:
+            offsets.setdefault(tp, msg.offset())
+    return [TopicPartition(t, p, o) for (t, p), o in offsets.items()]
 
-    exists = supabase.table("wallstreetbets_data").select("post_id").eq("post_id", post_id).execute()
-    if exists.data:
-        logging.info(f"Duplicate post_id {post_id} - skipping")
-        return
 
+def _rewind(consumer, batch):
+    """Seek back to the batch start so it is read again"""
+    for tp in _offsets(batch, after=False):
+        try:
+            consumer.seek(tp)
+        except KafkaException:
+            pass  # revoked: the new owner starts from the committed offset anyway
+
+
+def transact_batch(consumer, producer, router, batch):
+    """Derived records, DLQ records and input offsets in one transaction; aborted and rewound on error"""
+    producer.begin_transaction()
     try:
-        new_row_post = {
-            "post_id": post_id,
-            "title": " ".join(value.get("content", "").split()[:10]),
-            "author": value.get("author"),
-            "body": value.get("content"),
-            "url": value.get("url"),
-            "created_utc": value.get("created_utc"),
-            "created": value.get("created"),
-        }
-        supabase.table("wallstreetbets_data").insert(new_row_post).execute()
-        logging.info(f"Inserted post: {post_id}")
-
-        mentions = value.get("ticker_mentions", {})
-        for ticker, count in mentions.items():
-            supabase.table("wallstreetbets_ticker").update({
-                "total_mentions": supabase.table("wallstreetbets_ticker")
-                                  .select("total_mentions")
-                                  .eq("ticker", ticker)
-                                  .execute().data[0]["total_mentions"] + count,
-                "last_update": datetime.now().isoformat()
-            }).eq("ticker", ticker).execute()
-
-            logging.debug(f"Updated {ticker} count by +{count}")
+        for msg in batch:
+            try:
+                key, derived = derive(json.loads(msg.value()))
+            except Exception as e:
+                router.handle_failure(msg, e)  # DLQ only (see exactly_once_transform); joins the transaction
+                continue
+            producer.produce(topic=DERIVED_TOPIC, key=key, value=derived, headers=msg.headers())
+        producer.send_offsets_to_transaction(_offsets(batch, after=True), consumer.consumer_group_metadata())
+        producer.commit_transaction()
+    except Exception as e:
+        if isinstance(e, KafkaException) and e.args[0].fatal():
+            raise  # fenced by a newer member of the group; this process must restart
+        _rewind(consumer, batch)
+        producer.abort_transaction()
+        raise
+
+
+def exactly_once_transform():
+    ensure_topic('localhost:9092', DERIVED_TOPIC, DERIVED_PARTITIONS)
+    ensure_failure_topics('localhost:9092', POSTS_TOPIC, tiers=())
+    batch = []
 
+    def on_revoke(consumer, partitions):
+        # Finish the open batch while this member still owns its partitions
+        if batch:
+            try:
+                transact_batch(consumer, producer, router, batch)
+            except Exception as e:
+                logging.warning(f"Batch aborted on revoke, the new owner re-reads it: {e}")
+            batch.clear()
+
+    # Offsets are committed only through the transaction, never by the consumer
+    with app.get_consumer(auto_commit_enable=False) as consumer, app.get_producer(transactional=True) as producer:
+        # A derive error is in the message itself, so a retry tier would only fail it again;
+        # tiers=() dead-letters every failure within the batch's transaction
+        router = FailureRouter(producer, POSTS_TOPIC, tiers=())
+        consumer.subscribe(topics=[POSTS_TOPIC], on_revoke=on_revoke)
+        deadline = time.monotonic() + EOS_BATCH_SECONDS
+
+        while True:
+            try:
+                msg = consumer.poll(0.5)
+                if msg is not None:
+                    if msg.error():
+                        logging.error(msg.error())
+                    else:
+                        batch.append(msg)
+
+                if len(batch) >= EOS_BATCH_SIZE or time.monotonic() >= deadline:
+                    if batch:
+                        with metrics.timer("eos_transaction", topic=POSTS_TOPIC):
+                            transact_batch(consumer, producer, router, batch)
+                        metrics.inc("pipeline_messages_total", len(batch), stage="transform", topic=POSTS_TOPIC)
+                        logging.info(f"Committed {len(batch)} posts to {DERIVED_TOPIC}")
+                        batch.clear()
+                    deadline = time.monotonic() + EOS_BATCH_SECONDS
+
+            except KeyboardInterrupt:
+                logging.info("Shutting down exactly-once transform")
+                break
+            except Exception as e:
+                if isinstance(e, KafkaException) and e.args[0].fatal():
+                    raise
+                # Aborted and rewound: the batch is polled again from its first offset
+                metrics.inc("pipeline_transactions_aborted_total", topic=POSTS_TOPIC)
+                logging.error(f"Transaction aborted, batch of {len(batch)} will be re-read: {e}")
+                batch.clear()
+                time.sleep(1)
+
+
+def apply_derived(records):
+    """Idempotent batch write: posts upserted ignoring duplicates, mentions via wsb_add_mentions"""
+    posts = {}
+    mentions = []
+    for record in records:
+        posts[record["post"]["post_id"]] = record["post"]
+        mentions.extend(record["mentions"])
+    with metrics.timer("supabase_write", table=POSTS_TABLE):
+        supabase.table(POSTS_TABLE).upsert(list(posts.values()), on_conflict="post_id",
+                                           ignore_duplicates=True).execute()
+    return add_mentions(supabase, mentions)
+
+
+def apply_batch(batch, router):
+    """
+    apply_derived over a batch of messages; if it fails with a permanent error,
+    apply record by record and dead-letter the records that can never be written
+    Retryable errors propagate, so the caller rewinds and backs off
+    """
+    try:
+        return apply_derived([json.loads(m.value()) for m in batch])
     except Exception as e:
-        logging.error(f"Supabase error for {post_id}: {e}")
+        if is_retryable(e):
+            raise
+        logging.warning(f"Sink batch rejected ({type(e).__name__}: {e}), applying record by record")
+
+    added = 0
+    for msg in batch:
+        try:
+            added += apply_derived([json.loads(msg.value())])
+        except Exception as e:
+            if is_retryable(e):
+                raise  # the records applied so far are re-applied as no-ops
+            router.handle_failure(msg, e)
+    return added
+
+
+def derived_sink():
+    sink_app = Application(
+        broker_address='localhost:9092',
+        loglevel="INFO",
+        consumer_group='reddit-derived-sink',
+        auto_offset_reset='earliest',
+        consumer_extra_config={"isolation.level": "read_committed"},  # never see aborted batches
+    )
+    ensure_topic('localhost:9092', dlq_topic(DERIVED_TOPIC), 1)
+    with sink_app.get_consumer(auto_commit_enable=False) as consumer, sink_app.get_producer() as producer:
+        consumer.subscribe(topics=[DERIVED_TOPIC])
+        router = FailureRouter(producer, DERIVED_TOPIC, tiers=())  # no retry tiers: permanent errors only
+        batch = []
+        deadline = time.monotonic() + SINK_BATCH_SECONDS
+
+        while True:
+            try:
+                msg = consumer.poll(0.5)
+                if msg is not None:
+                    if msg.error():
+                        logging.error(msg.error())
+                    else:
+                        batch.append(msg)
+
+                if len(batch) >= SINK_BATCH_SIZE or time.monotonic() >= deadline:
+                    if batch:
+                        added = apply_batch(batch, router)
+                        consumer.commit(offsets=_offsets(batch, after=True), asynchronous=False)
+                        for m in batch:
+                            observe_end_to_end(m.headers(), POSTS_TOPIC)
+                        metrics.inc("pipeline_messages_total", len(batch), stage="consume", topic=DERIVED_TOPIC)
+                        logging.info(f"Applied {len(batch)} posts, {added} new mention rows")
+                        batch = []
+                    deadline = time.monotonic() + SINK_BATCH_SECONDS
+
+            except KeyboardInterrupt:
+                logging.info("Shutting down derived sink")
+                break
+            except Exception as e:
+                # Transient: written or not, the batch is read again; re-applying it is a no-op
+                metrics.inc("pipeline_db_errors_total", table=POSTS_TABLE)
+                logging.error(f"Sink batch of {len(batch)} failed: {e}")
+                _rewind(consumer, batch)
+                batch = []
+                time.sleep(SINK_RETRY_SECONDS)
 
 if __name__ == '__main__':
-    kafka_consumer()
+    parser = argparse.ArgumentParser(description="reddit-wsb-posts-kafka -> Supabase")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--retry-lane", action="store_true", help="process the retry tiers instead of the main topic")
+    mode.add_argument("--exactly-once", action="store_true",
+                      help=f"transactionally transform posts into {DERIVED_TOPIC} (run --sink to write them)")
+    mode.add_argument("--sink", action="store_true", help=f"apply {DERIVED_TOPIC} to Supabase")
+    args = parser.parse_args()
+
+    if args.retry_lane:
+        service = "reddit-consumer-retry"
+    elif args.exactly_once:
+        service = "reddit-consumer-eos"
+    elif args.sink:
+        service = "reddit-derived-sink"
+    else:
+        service = "reddit-consumer"
+    start_from_env(service)
+    install_profiler(service)
+    if args.retry_lane:
+        run_retry_lane(POSTS_TOPIC, retry_handler, consumer_group='reddit-consumer-group')
+    elif args.exactly_once:
+        exactly_once_transform()
+    elif args.sink:
+        derived_sink()
+    else:
+        kafka_consumer()
 
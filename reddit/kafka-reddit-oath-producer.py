@@ -1,12 +1,18 @@
 import os
 import logging
 import json
+import sys
 import requests
 import pandas as pd
 from quixstreams import Application
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.metrics import metrics, start_from_env, trace_headers
+from common.ratelimit import get_limiter
+from common.resilience import CircuitOpenError, guard_for
+
 load_dotenv(".env")
 CLIENT = os.getenv("REDDIT_CLIENT", "")
 SECRET = os.getenv("REDDIT_KEY", "")
@@ -107,6 +113,7 @@ START_TIMESTAMP = get_thirty_days_ago()
 END_TIMESTAMP = get_yesterday()
 def reddit_posts_and_comments_Oath(access_token, sp500_companies):
     all_posts = []
+    limiter = get_limiter()
     for ticker in sp500_companies:
         url = f"https://oauth.reddit.com/r/{SUBREDDIT}/search"
 
@@ -125,7 +132,18 @@ def reddit_posts_and_comments_Oath(access_token, sp500_companies):
             "syntax": "cloudsearch",
         }
 
-        response = requests.get(url, headers=headers, params=params)
+        limiter.acquire("reddit-oauth", CLIENT)
+        try:
+            with metrics.timer("http", provider="reddit-oauth"):
+                response = guard_for("reddit-oauth.search").run(requests.get, url, headers=headers, params=params)
+        except CircuitOpenError as e:
+            # Keep what was collected instead of losing the whole run
+            logging.error(f"Stopping search at {ticker}: {e}")
+            return all_posts
+        metrics.inc("pipeline_http_requests_total", provider="reddit-oauth", status=response.status_code)
+        if response.status_code == 429:
+            metrics.inc("pipeline_rate_limited_total", provider="reddit-oauth")
+            limiter.penalize("reddit-oauth", CLIENT, 60.0)
         if response.status_code != 200:
             logging.error(f"Error fetching {ticker}: {response.text}")
         else:
@@ -157,11 +175,13 @@ def kafka_producer(messages):
     with app.get_producer() as producer:
         for message in messages:
             try:
-                producer.produce(
-                    topic="reddit-posts-comments-kafka",
-                    key=message['id'],
-                    value=json.dumps(message).encode("utf-8"),
-                )
+                with metrics.timer("produce", topic="reddit-posts-comments-kafka"):
+                    producer.produce(
+                        topic="reddit-posts-comments-kafka",
+                        key=message['id'],
+                        value=json.dumps(message).encode("utf-8"),
+                        headers=trace_headers(),
+                    )
                 logging.debug(f"Producer produced message: {message["id"]}")
             except Exception as e:
                 logging.error(f"Error producing message {message.get('id')}: {e}")
@@ -183,5 +203,6 @@ if __name__ == "__main__":
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
+    start_from_env("reddit-oauth-producer")
 
     main()
@@ -1,16 +1,24 @@
+import argparse
 import os
 import logging
-import re
-import time
-import pandas as pd
 import redis
 import praw
-import json
-from datetime import datetime
+import sys
 from quixstreams import Application
 from dotenv import load_dotenv
 from praw.exceptions import APIException
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.spool import Spool, broker_available
+from common.partitioning import PartitionStats, chain_on_delivery
+from common.metrics import metrics, start_from_env, trace_headers
+from common.profiling import install_profiler
+from common.messages import RedditPost
+from common.tickers import count_tickers, load_sp500
+from common.sweep import UnitDelivery, run_worker
+from common.ratelimit import get_limiter
+from common.resilience import CircuitOpenError, guard_for
+
 load_dotenv(".env")
 CLIENT = os.getenv("REDDIT_CLIENT", "")
 SECRET = os.getenv("REDDIT_KEY", "")
@@ -32,80 +40,64 @@ def connect_redis():
         logging.error(f"Redis connection failed: {e} - Falling back to local deduping")
         r = None
 
-# ===============================
-# CSV FETCH
-# ===============================
-def clean_name(company_name):
-    if not company_name:
-        return ""
-
-    name = company_name.strip()
-
-    replacements = {
-        ' Inc.': '', ' Inc': '', ' Corporation': '', ' Corp.': '', ' Corp': '',
-        ' Company': '', ' Co.': '', ' Co': '', ' Ltd.': '', ' Ltd': '',
-        ' Limited': '', ' plc': '', ' PLC': '', ' Group': '', ' (The)': '', 'The ': '',
-    }
-
-    for old, new in replacements.items():
-        name = name.replace(old, new)
-
-    return name.strip()
-
-
-def load_sp500(csv_path="constituents.csv"):
-    df = pd.read_csv(csv_path)
-    symbols = df["Symbol"].str.upper().tolist()
-    names = []
-
-    for _, row in df.iterrows():
-        cleaned = clean_name(row["Security"])
-        if cleaned and len(cleaned.split()) > 1:
-            names.append(f'"cleaned.upper()"')
-        elif cleaned:
-            names.append(cleaned.upper())
-
-    search_terms = set(symbols + names)
-    logging.info(f"Loaded {len(search_terms)} search terms from {csv_path}")
-    return search_terms
-
-
-def count_tickers(content, search_terms):
-    if not content:
-        return {}
-    words = re.findall(r'\b[A-Z]{3,5}\b', content.upper())
-    counts = {term: words.count(term) for term in search_terms if term in words}
-    return {k: v for k, v in counts.items() if v > 0}  # Only non-zero
-
-
 # ===============================
 # PRAW VERSION
 # REDDIT POSTS FETCH
 # ===============================
 SUBREDDIT_NAME = "wallstreetbets"
 SEEN_TTL_SECONDS = 7 * 24 * 3600  # 7 days
+REDIS_SEEN_KEY = f"reddit:seen_posts:{SUBREDDIT_NAME}"
+API_ERROR_BACKOFF_SECONDS = 60
 
-def reddit_posts_praw(search_terms):
+def mark_seen(post_ids):
+    """Add post ids to the shared Redis seen set"""
+    if not r or not post_ids:
+        return
+    try:
+        pipe = r.pipeline(transaction=False)
+        pipe.sadd(REDIS_SEEN_KEY, *post_ids)
+        pipe.expire(REDIS_SEEN_KEY, SEEN_TTL_SECONDS)
+        pipe.execute()
+    except redis.RedisError as e:
+        logging.warning(f"Redis error marking {len(post_ids)} posts seen: {e}")
+
+
+def reddit_posts_praw(search_terms, query_terms=None, raise_open=False, mark_new=True):
+    """
+    Search WSB for query_terms (default: all search_terms) in OR batches of 20
+    Posts are always matched against the full search_terms universe
+    If Reddit's circuit stays open the search stops early with what it has,
+    or raises CircuitOpenError when raise_open
+    With mark_new=False posts are only checked against the Redis seen set;
+    the caller marks them (mark_seen) once they are delivered
+    """
     reddit = praw.Reddit(client_id=CLIENT, client_secret=SECRET, user_agent="MyRedditApp.0.0.1")
     subreddit = reddit.subreddit(SUBREDDIT_NAME)
     posts = []
     seen_posts_local = set()
-    redis_seen_key = f"reddit:seen_posts:{SUBREDDIT_NAME}"
+    limiter = get_limiter()
+    guard = guard_for("reddit.search")
 
     batch_size = 20
-    term_list = list(search_terms)
+    term_list = list(query_terms if query_terms is not None else search_terms)
     for i in range(0, len(term_list), batch_size):
         batch = term_list[i:i + batch_size]
         query = " OR ".join(batch)
         logging.info(f"Searching batch {i // batch_size + 1}: {query[:50]}...")
 
         try:
-            for submission in subreddit.search(
+            limiter.acquire("reddit", CLIENT)
+            # limit=100 is a single listing page, so this is one HTTP call
+            with metrics.timer("http", provider="reddit"):
+                submissions = guard.run(lambda: list(subreddit.search(
                     query=query,
                     limit=100,
                     sort="top",
                     time_filter="month"
-            ):
+                )))
+            metrics.inc("pipeline_http_requests_total", provider="reddit", status=200)
+
+            for submission in submissions:
                 post_id = submission.id
 
                 if post_id in seen_posts_local:
@@ -116,13 +108,15 @@ def reddit_posts_praw(search_terms):
                 is_new = True
                 if r:
                     try:
-                        added = r.sadd(redis_seen_key, post_id)
-                        if added == 1:
+                        if not mark_new:
+                            is_new = not r.sismember(REDIS_SEEN_KEY, post_id)
+                        elif r.sadd(REDIS_SEEN_KEY, post_id) == 1:
                             logging.debug(f"Redis added new: {post_id}")
-                            r.expire(redis_seen_key, SEEN_TTL_SECONDS)
+                            r.expire(REDIS_SEEN_KEY, SEEN_TTL_SECONDS)
                         else:  # Dupe (added==0)
-                            logging.debug(f"Redis dupe: {post_id}")
                             is_new = False
+                        if not is_new:
+                            logging.debug(f"Redis dupe: {post_id}")
                     except redis.RedisError as e:
                         logging.warning(f"Redis error for {post_id}: {e} - Using local")
                 else:
@@ -134,32 +128,39 @@ def reddit_posts_praw(search_terms):
                 seen_posts_local.add(post_id)  # Tracks locally
 
                 content = submission.title + " " + submission.selftext
-                mentions = count_tickers(content, search_terms)
+                with metrics.timer("ticker_match"):
+                    mentions = count_tickers(content, search_terms)
 
                 if mentions:
-                    post_msg = {
-                        "id": post_id,
-                        "type": "post",
-                        "ticker": list(mentions.keys())[0] if mentions else "",
-                        "content": content,
-                        "author": str(submission.author),
-                        "score": submission.score,
-                        "num_comments": submission.num_comments,
-                        "url": submission.shortlink,
-                        "created_utc": int(submission.created_utc),
-                        "created": datetime.fromtimestamp(submission.created_utc).isoformat(),
-                        "ticker_mentions": mentions
-                    }
-                    posts.append(post_msg)
+                    posts.append(RedditPost(
+                        id=post_id,
+                        ticker=next(iter(mentions)),
+                        content=content,
+                        author=str(submission.author),
+                        score=submission.score,
+                        num_comments=submission.num_comments,
+                        url=submission.shortlink,
+                        created_utc=submission.created_utc,
+                        ticker_mentions=mentions,
+                    ))
 
         except APIException as e:
+            metrics.inc("pipeline_http_requests_total", provider="reddit", status="api_error")
             logging.error(f"PRAW API error in batch {i}: {e}")
-            time.sleep(60)
+            limiter.penalize("reddit", CLIENT, API_ERROR_BACKOFF_SECONDS)
+        except CircuitOpenError as e:
+            if raise_open:
+                raise
+            logging.error(f"Stopping search at batch {i}: {e}")
+            break
         except Exception as e:
+            status = getattr(getattr(e, "response", None), "status_code", "error")
+            metrics.inc("pipeline_http_requests_total", provider="reddit", status=status)
+            if status == 429:
+                metrics.inc("pipeline_rate_limited_total", provider="reddit")
+                limiter.penalize("reddit", CLIENT, API_ERROR_BACKOFF_SECONDS)
             logging.error(f"Unexpected error in batch {i}: {e}")
 
-        time.sleep(1)
-
     logging.info(f"Found {len(posts)} posts --deduped")
     return posts
 
@@ -167,26 +168,106 @@ def reddit_posts_praw(search_terms):
 # ===============================
 # KAFKA PRODUCER
 # ===============================
+BROKER_ADDRESS = "localhost:9092"
+POSTS_TOPIC = "reddit-wsb-posts-kafka"
+SPOOL_DIR = os.getenv("REDDIT_SPOOL_DIR", "data/spool/reddit-wsb-posts")
+spool = None  # opened in __main__; worker mode retries failed units instead of spooling
+
 def kafka_producer(posts):
+    # Broker down: keep the posts locally instead of re-fetching them next run
+    if not broker_available(BROKER_ADDRESS):
+        logging.warning(f"Kafka unavailable at {BROKER_ADDRESS} - spooling {len(posts)} posts")
+        for post in posts:
+            spool.append(POSTS_TOPIC, post.id, post.encode(), trace_headers())
+        spool.sync()
+        return
+
     app = Application(
-        broker_address="localhost:9092",
+        broker_address=BROKER_ADDRESS,
         loglevel="INFO",
     )
+    # Post IDs hash evenly; stats show whether partitions still run hot
+    partition_stats = PartitionStats()
+    on_delivery = chain_on_delivery(spool.spool_on_failure, partition_stats.on_delivery)
+
     with app.get_producer() as producer:
-        for post in posts:
-            try:
-                producer.produce(
-                    topic="reddit-wsb-posts-kafka",
-                    key=post["id"].encode("utf-8"),
-                    value=json.dumps(post).encode("utf-8"),
-                )
-                logging.debug(f"Produced: {post['id']}")
-            except Exception as e:
-                logging.error(f"Error producing {post['id']}: {e}")
+        spooling = spool.pending() and not spool.replay(producer)
+        produce_posts(producer, posts, on_delivery, spooling)
         producer.flush()
+        spool.sync()
+        partition_stats.save("data/partition_stats_reddit.json")
         logging.info(f"Produced {len(posts)} messages")
 
 
+def produce_posts(producer, posts, on_delivery, spooling=False):
+    """Produce posts through an open producer (caller flushes); failures go to the spool"""
+    for post in posts:
+        headers = trace_headers()
+        with metrics.timer("serialize", topic=POSTS_TOPIC):
+            value = post.encode()
+        if spooling:
+            spool.append(POSTS_TOPIC, post.id, value, headers)
+            continue
+        try:
+            with metrics.timer("produce", topic=POSTS_TOPIC):
+                producer.produce(
+                    topic=POSTS_TOPIC,
+                    key=post.id,
+                    value=value,
+                    headers=headers,
+                    on_delivery=on_delivery,
+                )
+            metrics.inc("pipeline_messages_total", stage="produce", topic=POSTS_TOPIC)
+            metrics.set_gauge("pipeline_producer_queue_depth", len(producer), topic=POSTS_TOPIC)
+            logging.debug(f"Produced: {post.id}")
+        except Exception as e:
+            if spool is None:
+                raise  # worker mode: the unit fails and is retried
+            logging.error(f"Error producing {post.id}: {e} - spooling")
+            metrics.inc("pipeline_messages_total", stage="spool", topic=POSTS_TOPIC)
+            spool.append(POSTS_TOPIC, post.id, value, headers)
+
+
+# ===============================
+# SWEEP WORKER
+# ===============================
+SWEEP_PROVIDER = "reddit"
+
+def main_worker():
+    """
+    Sweep worker mode: search the term units published by
+    tools/ticker-sweep-coordinator.py --provider reddit
+    Cross-worker dupes are dropped by the shared Redis seen set; a unit's
+    posts join it only after they are delivered, so a failed or redone unit
+    finds them again
+    """
+    connect_redis()
+    sp500_companies = load_sp500("constituents.csv")
+    partition_stats = PartitionStats()
+    # No spool here: a record the broker never acknowledged fails the unit, so
+    # it is redone and committed only once all of its output is in Kafka
+    delivery = UnitDelivery()
+    on_delivery = chain_on_delivery(delivery.on_delivery, partition_stats.on_delivery)
+
+    unit_post_ids = []
+
+    def process_unit(unit, producer):
+        posts = reddit_posts_praw(sp500_companies, query_terms=unit["terms"], raise_open=True, mark_new=False)
+        unit_post_ids[:] = [post.id for post in posts]
+        produce_posts(producer, posts, on_delivery)
+        return len(posts)
+
+    def on_flushed():
+        delivery.check()
+        mark_seen(unit_post_ids)
+        unit_post_ids.clear()
+
+    try:
+        run_worker(SWEEP_PROVIDER, process_unit, BROKER_ADDRESS, on_flushed=on_flushed)
+    finally:
+        partition_stats.save(f"data/partition_stats_reddit_worker_{os.getpid()}.json")
+
+
 def main():
     connect_redis()
     # logging.info("Starting producer...")
@@ -207,9 +288,20 @@ if __name__ == "__main__":
         level=logging.DEBUG,
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
+    parser = argparse.ArgumentParser(description="WSB post search into the reddit-wsb-posts-kafka topic")
+    parser.add_argument("--worker", action="store_true", help="join the sweep worker group instead of searching everything")
+    args = parser.parse_args()
+
     logging.info("LOG MESSAGE - Start")
+    service = "reddit-praw-worker" if args.worker else "reddit-praw-producer"
+    start_from_env(service)
+    install_profiler(service)
     try:
-        main()
+        if args.worker:
+            main_worker()
+        else:
+            spool = Spool(SPOOL_DIR)
+            main()
     except Exception as e:
         logging.exception("Fatal error:")
         raise
\ No newline at end of file
@@ -1,10 +1,16 @@
+import argparse
 import logging
 import os
+import sys
 import csv
 from datetime import datetime
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.mention_series import SCHEMA_SQL
+from common.metrics import metrics, start_from_env
+
 load_dotenv()
 url = os.getenv("SUPABASE_URL", "")
 key = os.getenv("SUPABASE_KEY", "")
@@ -31,20 +37,51 @@ def main():
                 })
 
         if data_to_insert:
-            response = supabase.table(table_name).insert(data_to_insert).execute()
+            with metrics.timer("supabase_write", table=table_name):
+                response = supabase.table(table_name).insert(data_to_insert).execute()
             logging.info(f"Inserted {len(data_to_insert)} rows in {table_name} table.")
             logging.info(response)
         else:
             logging.info("No data inserted.")
 
+def create_series_schema():
+    """
+    Mention time-series tables and functions (common/mention_series.py)
+    PostgREST can't run DDL: with SUPABASE_DB_URL set it's applied over a direct
+    Postgres connection (needs psycopg), otherwise printed for the SQL editor
+    """
+    db_url = os.getenv("SUPABASE_DB_URL")
+    if not db_url:
+        print(SCHEMA_SQL)
+        logging.info("SUPABASE_DB_URL not set - run the SQL above in the Supabase SQL editor")
+        return
+    try:
+        import psycopg  # optional: only this direct-connection path needs it
+    except ImportError:
+        print(SCHEMA_SQL)
+        logging.error('SUPABASE_DB_URL is set but psycopg is not installed - pip install "psycopg[binary]", '
+                      'or run the SQL above in the Supabase SQL editor')
+        sys.exit(1)
+    with psycopg.connect(db_url) as conn:
+        conn.execute(SCHEMA_SQL)
+    logging.info("Created mention time-series tables and functions")
+
 if __name__ == "__main__":
     logging.basicConfig(
         level=logging.DEBUG,
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
+    parser = argparse.ArgumentParser(description="Seed wallstreetbets_ticker / create the mention time-series schema")
+    parser.add_argument("--schema", action="store_true", help="create the time-series tables instead of seeding tickers")
+    args = parser.parse_args()
+
     logging.info("LOG MESSAGE - Start")
+    start_from_env("db-schema-dump")
     try:
-        main()
+        if args.schema:
+            create_series_schema()
+        else:
+            main()
     except Exception as e:
         logging.exception("Fatal error:")
         raise
\ No newline at end of file
@@ -0,0 +1,112 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from quixstreams import Application
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.article_store import ArticleStore, ARTICLE_DB, news_document, post_document
+from common.metrics import metrics, start_from_env
+
+# ===============================
+# SINK CONFIG
+# ===============================
+TOPICS = {
+    "raw-news": news_document,
+    "reddit-wsb-posts-kafka": post_document,
+}
+BATCH_SIZE = 500
+BATCH_SECONDS = 2.0
+
+
+def to_document(msg):
+    return TOPICS[msg.topic()](json.loads(msg.value()))
+
+
+def run_sink(store, broker_address):
+    """Live sink: micro-batches committed in one SQLite transaction, then offsets stored"""
+    app = Application(
+        broker_address=broker_address,
+        loglevel="INFO",
+        consumer_group="article-store-sink",
+        auto_offset_reset="latest",
+    )
+    with app.get_consumer() as consumer:
+        consumer.subscribe(topics=list(TOPICS))
+        batch, last_msgs = [], {}
+        deadline = time.monotonic() + BATCH_SECONDS
+
+        while True:
+            try:
+                msg = consumer.poll(0.5)
+                if msg is not None and not msg.error():
+                    try:
+                        batch.append(to_document(msg))
+                    except (ValueError, KeyError) as e:
+                        logging.error(f"Skipping malformed message at {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}")
+                    last_msgs[(msg.topic(), msg.partition())] = msg
+
+                if len(batch) >= BATCH_SIZE or (time.monotonic() >= deadline and last_msgs):
+                    with metrics.timer("sqlite_write"):
+                        store.write_batch(batch)
+                    for last in last_msgs.values():
+                        consumer.store_offsets(last)
+                    metrics.inc("pipeline_messages_total", value=len(batch), stage="article_store")
+                    logging.info(f"Stored {len(batch)} documents")
+                    batch, last_msgs = [], {}
+                if time.monotonic() >= deadline:
+                    deadline = time.monotonic() + BATCH_SECONDS
+
+            except KeyboardInterrupt:
+                logging.info("Shutting down sink")
+                break
+
+
+def run_backfill(store, broker_address, idle_polls=10):
+    """Read both topics from the beginning through the bulk-load path, exit once caught up"""
+    app = Application(
+        broker_address=broker_address,
+        loglevel="INFO",
+        consumer_group=f"article-store-backfill-{int(time.time())}",
+        auto_offset_reset="earliest",
+    )
+    with app.get_consumer(auto_commit_enable=False) as consumer:
+        consumer.subscribe(topics=list(TOPICS))
+
+        def documents():
+            idle = 0
+            while idle < idle_polls:
+                msg = consumer.poll(1)
+                if msg is None:
+                    idle += 1
+                    continue
+                idle = 0
+                if msg.error():
+                    continue
+                try:
+                    yield to_document(msg)
+                except (ValueError, KeyError) as e:
+                    logging.error(f"Skipping malformed message: {e}")
+
+        store.bulk_load(documents())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Sink raw-news and WSB posts into the local SQLite FTS5 store")
+    parser.add_argument("--db", default=ARTICLE_DB)
+    parser.add_argument("--broker", default="localhost:9092")
+    parser.add_argument("--backfill", action="store_true", help="bulk-load both topics from the beginning and exit")
+    args = parser.parse_args()
+
+    start_from_env("article-sink")
+    article_store = ArticleStore(args.db)
+    if args.backfill:
+        run_backfill(article_store, args.broker)
+    else:
+        run_sink(article_store, args.broker)
@@ -0,0 +1,248 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from confluent_kafka import TopicPartition
+from dotenv import load_dotenv
+from quixstreams import Application
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.metrics import metrics, start_from_env
+from common.reddit_rows import POSTS_TABLE, TICKERS_TABLE
+from common.replay import DEFAULT_SEGMENT_BYTES, dump_topic, init_transform, list_segments, transform_segment, transform_values
+from common.tickers import load_sp500
+
+# ===============================
+# REPLAY CONFIG
+# ===============================
+# Reprocess reddit-wsb-posts-kafka without resetting the live consumer's offsets:
+#   dump  - copy the topic into local segment files (data/replay/<topic>/)
+#   run   - transform those files (or the topic itself) in a process pool and
+#           upsert wallstreetbets_data in large batches; --dry-run writes nothing
+#           and reports throughput plus what would change
+POSTS_TOPIC = "reddit-wsb-posts-kafka"
+REPLAY_DIR = "data/replay"
+BATCH_SIZE = 5000
+WRITE_CHUNK = 500
+WRITE_THREADS = 4
+DIFF_FIELDS = ("title", "author", "body", "url", "created_utc", "created")
+
+
+def supabase_client():
+    from supabase import create_client
+    load_dotenv(".env")
+    return create_client(os.getenv("SUPABASE_URL", ""), os.getenv("SUPABASE_KEY", ""))
+
+
+# ===============================
+# SOURCES
+# ===============================
+def results_from_dir(pool, directory):
+    """Transformed batches, one per segment file, several segments in flight"""
+    segments = list_segments(directory)
+    logging.info(f"Replaying {len(segments)} segments from {directory}")
+    yield from pool.map(transform_segment, segments)
+
+
+def results_from_topic(pool, broker_address, topic, workers, batch_size):
+    """Read the topic from the beginning up to today's high watermarks, batches go to the pool"""
+    app = Application(
+        broker_address=broker_address,
+        loglevel="WARNING",
+        consumer_group=f"replay-{int(time.time())}",
+        auto_offset_reset="earliest",
+    )
+    with app.get_consumer(auto_commit_enable=False) as consumer:
+        metadata = consumer.list_topics(topic, timeout=10)
+        starts, remaining = {}, {}
+        for partition in metadata.topics[topic].partitions:
+            low, high = consumer.get_watermark_offsets(TopicPartition(topic, partition), timeout=10)
+            if high > low:
+                starts[partition], remaining[partition] = low, high
+        consumer.assign([TopicPartition(topic, p, low) for p, low in starts.items()])
+
+        in_flight, batch = deque(), []
+        while remaining:
+            msg = consumer.poll(1)
+            if msg is None:
+                for tp in consumer.position([TopicPartition(topic, p) for p in remaining]):
+                    if tp.offset >= remaining[tp.partition]:
+                        del remaining[tp.partition]
+                continue
+            if msg.error() or msg.partition() not in remaining:
+                continue
+            batch.append(msg.value())
+            if msg.offset() >= remaining[msg.partition()] - 1:
+                del remaining[msg.partition()]
+
+            if len(batch) >= batch_size:
+                in_flight.append(pool.submit(transform_values, batch))
+                batch = []
+                while len(in_flight) >= workers * 2:
+                    yield in_flight.popleft().result()
+
+        if batch:
+            in_flight.append(pool.submit(transform_values, batch))
+        while in_flight:
+            yield in_flight.popleft().result()
+        consumer.unassign()
+
+
+# ===============================
+# SINK / DIFF
+# ===============================
+def upsert_rows(client, rows):
+    with metrics.timer("supabase_write", table=POSTS_TABLE):
+        client.table(POSTS_TABLE).upsert(rows, on_conflict="post_id").execute()
+
+
+def diff_rows(client, rows):
+    """Compare rows with what wallstreetbets_data holds now: (missing, changed, same, examples)"""
+    ids = [row["post_id"] for row in rows]
+    existing = {
+        r["post_id"]: r
+        for r in client.table(POSTS_TABLE).select("*").in_("post_id", ids).execute().data
+    }
+    missing = changed = same = 0
+    examples = []
+    for row in rows:
+        current = existing.get(row["post_id"])
+        if current is None:
+            missing += 1
+            continue
+        fields = [f for f in DIFF_FIELDS if str(current.get(f)) != str(row.get(f))]
+        if fields:
+            changed += 1
+            if len(examples) < 5:
+                examples.append((row["post_id"], fields))
+        else:
+            same += 1
+    return missing, changed, same, examples
+
+
+def rebuild_totals(client, totals, previous):
+    """
+    Set wallstreetbets_ticker.total_mentions from the replayed posts (absolute, not +=)
+    Tickers only in `previous` (e.g. no longer matched after --rematch) are set to 0
+    """
+    now = datetime.now().isoformat()
+    tickers = set(previous) | set(totals)
+    for ticker in tickers:
+        client.table(TICKERS_TABLE).update({"total_mentions": totals[ticker], "last_update": now}).eq("ticker", ticker).execute()
+    logging.info(f"Rebuilt total_mentions for {len(tickers)} tickers")
+
+
+# ===============================
+# RUN
+# ===============================
+def run(args):
+    search_terms = load_sp500(args.rematch) if args.rematch else None
+    client = supabase_client() if not args.dry_run or args.diff_db else None
+    workers = args.workers or os.cpu_count() or 1
+
+    seen = set()
+    stats = Counter()
+    old_totals, new_totals = Counter(), Counter()
+    db_diff = Counter()
+    examples = []
+    write_futures = []
+    start = time.monotonic()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_transform, initargs=(search_terms,)) as pool, \
+            ThreadPoolExecutor(max_workers=WRITE_THREADS) as writers:
+        if args.dir:
+            results = results_from_dir(pool, os.path.join(args.dir, args.topic))
+        else:
+            results = results_from_topic(pool, args.broker, args.topic, workers, args.batch_size)
+
+        for transformed, malformed in results:
+            stats["malformed"] += malformed
+            rows = []
+            for row, old_mentions, new_mentions in transformed:
+                stats["messages"] += 1
+                if row["post_id"] in seen:
+                    stats["duplicates"] += 1  # the live consumer skips these too
+                    continue
+                seen.add(row["post_id"])
+                rows.append(row)
+                old_totals.update(old_mentions)
+                new_totals.update(new_mentions)
+                if old_mentions != new_mentions:
+                    stats["mentions_changed"] += 1
+
+            for i in range(0, len(rows), WRITE_CHUNK):
+                chunk = rows[i:i + WRITE_CHUNK]
+                if args.diff_db:
+                    missing, changed, same, found = diff_rows(client, chunk)
+                    db_diff.update(missing=missing, changed=changed, same=same)
+                    examples.extend(found[:5 - len(examples)])
+                if not args.dry_run:
+                    write_futures.append(writers.submit(upsert_rows, client, chunk))
+            metrics.inc("pipeline_messages_total", value=len(transformed), stage="replay", topic=args.topic)
+
+        for future in write_futures:
+            future.result()
+
+    if not args.dry_run and args.totals == "rebuild":
+        rebuild_totals(client, new_totals, old_totals)
+
+    elapsed = time.monotonic() - start
+    report(args, stats, len(seen), elapsed, old_totals, new_totals, db_diff, examples)
+
+
+def report(args, stats, unique, elapsed, old_totals, new_totals, db_diff, examples):
+    mode = "dry run" if args.dry_run else "replayed"
+    print(f"{mode}: {stats['messages']} messages ({unique} unique posts, {stats['duplicates']} duplicates, "
+          f"{stats['malformed']} malformed) in {elapsed:.1f}s = {stats['messages'] / max(elapsed, 1e-9):.0f} msg/s")
+
+    if args.rematch:
+        print(f"posts whose ticker mentions change: {stats['mentions_changed']}")
+        deltas = Counter({t: new_totals[t] - old_totals[t] for t in set(old_totals) | set(new_totals)})
+        moved = [(t, d) for t, d in deltas.items() if d]
+        print(f"{'ticker':<8} {'before':>8} {'after':>8} {'delta':>8}")
+        for ticker, delta in sorted(moved, key=lambda td: -abs(td[1]))[:args.top]:
+            print(f"{ticker:<8} {old_totals[ticker]:>8} {new_totals[ticker]:>8} {delta:>+8}")
+
+    if args.diff_db:
+        print(f"vs {POSTS_TABLE}: {db_diff['missing']} missing, {db_diff['changed']} changed, {db_diff['same']} unchanged")
+        for post_id, fields in examples:
+            print(f"  {post_id}: {', '.join(fields)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Dump and reprocess a Kafka topic offline")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    dump = sub.add_parser("dump", help="copy the topic into local segment files")
+    dump.add_argument("--topic", default=POSTS_TOPIC)
+    dump.add_argument("--out", default=REPLAY_DIR)
+    dump.add_argument("--broker", default="localhost:9092")
+    dump.add_argument("--segment-mb", type=int, default=DEFAULT_SEGMENT_BYTES // (1024 * 1024))
+
+    replay = sub.add_parser("run", help="transform and write, from a dump (--dir) or straight from the topic")
+    replay.add_argument("--topic", default=POSTS_TOPIC)
+    replay.add_argument("--dir", help="dump directory (default: read the topic)")
+    replay.add_argument("--broker", default="localhost:9092")
+    replay.add_argument("--workers", type=int, help="transform processes (default: all cores)")
+    replay.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="messages per pool task when reading the topic")
+    replay.add_argument("--rematch", metavar="CSV", help="recount ticker mentions with the current matcher over this constituents CSV")
+    replay.add_argument("--totals", choices=("skip", "rebuild"), default="skip",
+                        help="rebuild: set total_mentions from the replayed posts")
+    replay.add_argument("--dry-run", action="store_true", help="write nothing, report throughput and changes")
+    replay.add_argument("--diff-db", action="store_true", help="compare rows against what Supabase holds now")
+    replay.add_argument("--top", type=int, default=20, help="ticker deltas to show")
+    args = parser.parse_args()
+
+    start_from_env("kafka-replay")
+    if args.command == "dump":
+        dump_topic(args.broker, args.topic, args.out, args.segment_mb * 1024 * 1024)
+    else:
+        run(args)
@@ -0,0 +1,145 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from quixstreams import Application
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.metrics import metrics, start_from_env
+from common.sentiment import SENTIMENT_MODEL, ScoreCache, SentimentScorer
+from common.topics import ensure_topic
+
+# ===============================
+# ENRICHER CONFIG
+# ===============================
+# raw-news / reddit-wsb-posts-kafka -> <topic>-enriched
+# Each record is the original message plus per-ticker lexicon sentiment; the key
+# and headers (trace ids) are carried over, so partitioning and end-to-end
+# latency tracking are unchanged downstream.
+ENRICHED_SUFFIX = "-enriched"
+ENRICHED_PARTITIONS = int(os.getenv("ENRICHED_PARTITIONS", "6"))
+BATCH_SIZE = 1000
+BATCH_SECONDS = 1.0
+
+
+def news_document(value):
+    """raw-news message -> (text, tickers)"""
+    text = "\n".join(value.get(f) or "" for f in ("title", "description", "content"))
+    tickers = value.get("mentioned_tickers") or [value.get("primary_ticker")]
+    return text, [t for t in tickers if t]
+
+
+def post_document(value):
+    """reddit-wsb-posts-kafka message -> (text, tickers)"""
+    tickers = list(value.get("ticker_mentions") or {}) or [value.get("ticker")]
+    return value.get("content") or "", [t for t in tickers if t]
+
+
+TOPICS = {
+    "raw-news": news_document,
+    "reddit-wsb-posts-kafka": post_document,
+}
+
+
+def enriched_topic(topic):
+    return f"{topic}{ENRICHED_SUFFIX}"
+
+
+def enrich_batch(scorer, producer, msgs):
+    """Score one micro-batch and produce its enriched records; returns the number produced"""
+    values, docs, sources = [], [], []
+    for msg in msgs:
+        try:
+            value = json.loads(msg.value())
+            docs.append(TOPICS[msg.topic()](value))
+        except (ValueError, KeyError, AttributeError) as e:
+            logging.error(f"Skipping malformed message at {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}")
+            continue
+        values.append(value)
+        sources.append(msg)
+
+    hits = scorer.cache.hits
+    with metrics.timer("sentiment_score"):
+        scores = scorer.score(docs)
+    metrics.inc("pipeline_sentiment_cache_hits_total", value=scorer.cache.hits - hits)
+    metrics.inc("pipeline_sentiment_scored_total", value=len(docs) - (scorer.cache.hits - hits))
+
+    for msg, value, score in zip(sources, values, scores):
+        value["sentiment"] = score["tickers"]
+        value["sentiment_overall"] = score["overall"]
+        value["sentiment_model"] = SENTIMENT_MODEL
+        producer.produce(
+            topic=enriched_topic(msg.topic()),
+            key=msg.key(),
+            value=json.dumps(value).encode("utf-8"),
+            headers=msg.headers(),
+        )
+    return len(sources)
+
+
+def run_enricher(broker_address, workers):
+    """Micro-batches of both topics are scored across the pool; offsets stored once the output is flushed"""
+    for topic in TOPICS:
+        ensure_topic(broker_address, enriched_topic(topic), ENRICHED_PARTITIONS)
+    app = Application(
+        broker_address=broker_address,
+        loglevel="INFO",
+        consumer_group="sentiment-enricher",
+        auto_offset_reset="earliest",
+    )
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            app.get_consumer() as consumer, app.get_producer() as producer:
+        consumer.subscribe(topics=list(TOPICS))
+        scorer = SentimentScorer(pool, workers, ScoreCache())
+        batch = []
+        deadline = time.monotonic() + BATCH_SECONDS
+        logging.info(f"Enriching {', '.join(TOPICS)} with {workers} workers")
+
+        while True:
+            try:
+                msg = consumer.poll(0.5)
+                if msg is not None:
+                    if msg.error():
+                        logging.error(msg.error())
+                    else:
+                        batch.append(msg)
+
+                if len(batch) >= BATCH_SIZE or (time.monotonic() >= deadline and batch):
+                    produced = enrich_batch(scorer, producer, batch)
+                    remaining = producer.flush(timeout=30)
+                    if remaining:
+                        # Nothing stored: the batch is consumed again after a restart
+                        raise RuntimeError(f"{remaining} enriched records still queued after flush")
+                    last = {}
+                    for m in batch:
+                        last[(m.topic(), m.partition())] = m
+                    for m in last.values():
+                        consumer.store_offsets(m)
+                    metrics.inc("pipeline_messages_total", value=produced, stage="sentiment")
+                    metrics.set_gauge("pipeline_sentiment_cache_entries", len(scorer.cache))
+                    logging.info(f"Enriched {produced} messages "
+                                 f"(cache {scorer.cache.hits}/{scorer.cache.hits + scorer.cache.misses} hits)")
+                    batch = []
+                if time.monotonic() >= deadline:
+                    deadline = time.monotonic() + BATCH_SECONDS
+
+            except KeyboardInterrupt:
+                logging.info("Shutting down enricher")
+                break
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Add lexicon sentiment per ticker to raw-news and WSB posts")
+    parser.add_argument("--broker", default="localhost:9092")
+    parser.add_argument("--workers", type=int, help="scoring processes (default: all cores)")
+    args = parser.parse_args()
+
+    start_from_env("sentiment-enricher")
+    run_enricher(args.broker, args.workers or os.cpu_count() or 1)
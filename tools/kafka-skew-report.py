@@ -0,0 +1,92 @@
+import argparse
+import logging
+import os
+import sys
+from collections import Counter
+from confluent_kafka import TopicPartition
+from quixstreams import Application
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.partitioning import HEAVY_SHARE, unsalt_key
+
+
+# ===============================
+# SKEW REPORT
+# ===============================
+def partition_sizes(consumer, topic):
+    """Messages currently retained per partition (high - low watermark)"""
+    metadata = consumer.list_topics(topic, timeout=10)
+    if topic not in metadata.topics or metadata.topics[topic].error:
+        raise SystemExit(f"Topic {topic} not found")
+
+    sizes = {}
+    for partition in sorted(metadata.topics[topic].partitions):
+        low, high = consumer.get_watermark_offsets(TopicPartition(topic, partition), timeout=10)
+        sizes[partition] = (low, high)
+    return sizes
+
+
+def sample_keys(consumer, topic, sizes, sample):
+    """Read the last `sample` messages of each partition and count unsalted keys"""
+    keys = {}
+    for partition, (low, high) in sizes.items():
+        counter = Counter()
+        start = max(low, high - sample)
+        if start < high:
+            consumer.assign([TopicPartition(topic, partition, start)])
+            remaining = high - start
+            while remaining > 0:
+                msg = consumer.poll(2)
+                if msg is None:
+                    break
+                if msg.error():
+                    continue
+                counter[unsalt_key(msg.key()) if msg.key() else None] += 1
+                remaining -= 1
+        keys[partition] = counter
+    consumer.unassign()
+    return keys
+
+
+def report(topic, broker_address, sample):
+    app = Application(
+        broker_address=broker_address,
+        loglevel="WARNING",
+        consumer_group="skew-report",
+        auto_offset_reset="earliest",
+    )
+    with app.get_consumer(auto_commit_enable=False) as consumer:
+        sizes = partition_sizes(consumer, topic)
+        keys = sample_keys(consumer, topic, sizes, sample) if sample else {}
+
+    counts = {p: high - low for p, (low, high) in sizes.items()}
+    total = sum(counts.values()) or 1
+    mean = total / len(counts)
+
+    print(f"Topic {topic}: {len(counts)} partitions, {total} messages")
+    print(f"{'partition':>9} {'messages':>10} {'share':>7} {'x mean':>7}  top keys")
+    for partition, count in counts.items():
+        top = ", ".join(f"{k}={c}" for k, c in keys.get(partition, Counter()).most_common(3))
+        print(f"{partition:>9} {count:>10} {count / total:>7.1%} {count / mean:>7.2f}  {top}")
+
+    print(f"max/mean: {max(counts.values()) / mean:.2f}")
+
+    if keys:
+        overall = sum(keys.values(), Counter())
+        sampled = sum(overall.values()) or 1
+        heavy = [k for k, c in overall.most_common() if c / sampled > HEAVY_SHARE]
+        print(f"Keys above {HEAVY_SHARE:.0%} of sampled traffic (salt candidates): {', '.join(map(str, heavy)) or '-'}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Per-partition load and hot-key report for a Kafka topic")
+    parser.add_argument("topic", nargs="?", default="raw-news")
+    parser.add_argument("--broker", default="localhost:9092")
+    parser.add_argument("--sample", type=int, default=1000, help="messages per partition to sample for keys (0 = skip)")
+    args = parser.parse_args()
+
+    report(args.topic, args.broker, args.sample)
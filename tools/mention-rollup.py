@@ -0,0 +1,73 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from supabase import create_client
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.mention_series import read_series, rollup
+from common.metrics import start_from_env
+
+# ===============================
+# ROLLUP CONFIG
+# ===============================
+# Minute buckets are written by the reddit consumer; this rebuilds the hour and
+# day buckets for the hours queued since the last run. Each run costs one RPC
+# and only touches the changed hours, however much history the tables hold.
+ROLLUP_INTERVAL_SECONDS = 60
+
+
+def supabase_client():
+    load_dotenv(".env")
+    return create_client(os.getenv("SUPABASE_URL", ""), os.getenv("SUPABASE_KEY", ""))
+
+
+def run_every(client, interval):
+    while True:
+        try:
+            start = time.monotonic()
+            hours = rollup(client)
+            logging.info(f"Rolled up {hours} changed hours in {time.monotonic() - start:.2f}s")
+            time.sleep(interval)
+        except KeyboardInterrupt:
+            logging.info("Shutting down rollup")
+            break
+        except Exception as e:
+            # Queued hours stay queued; the next run picks them up
+            logging.error(f"Rollup failed: {e}")
+            time.sleep(interval)
+
+
+def show(client, ticker, days, resolution):
+    start = datetime.now(timezone.utc) - timedelta(days=days)
+    series = read_series(client, ticker, start, resolution=resolution)
+    print(f"{ticker} {resolution} buckets over {days} days: {len(series)} rows, "
+          f"{sum(m for _, m, _ in series)} mentions")
+    for bucket, mentions, posts in series[-24:]:
+        print(f"  {bucket}  {mentions:>6} mentions  {posts:>5} posts")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Incremental hour/day rollup of the WSB mention minute buckets")
+    parser.add_argument("--every", type=float, default=ROLLUP_INTERVAL_SECONDS, help="seconds between rollups")
+    parser.add_argument("--once", action="store_true", help="roll up what is queued now and exit")
+    parser.add_argument("--show", metavar="TICKER", help="print a ticker's series instead of rolling up")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--resolution", choices=("1m", "1h", "1d"), default="1h")
+    args = parser.parse_args()
+
+    start_from_env("mention-rollup")
+    supabase = supabase_client()
+    if args.show:
+        show(supabase, args.show.upper(), args.days, args.resolution)
+    elif args.once:
+        logging.info(f"Rolled up {rollup(supabase)} changed hours")
+    else:
+        run_every(supabase, args.every)
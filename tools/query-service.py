@@ -0,0 +1,68 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import threading
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.aggregates import RETENTION_SECONDS, HotAggregates, feed_from_kafka
+from common.article_store import ARTICLE_DB, ArticleStore
+from common.metrics import start_from_env
+from common.query_service import QueryService, serve
+
+# ===============================
+# SERVICE CONFIG
+# ===============================
+# Local read API for dashboards and scripts; see common/query_service.py for the
+# routes. Supabase (cold top-K windows and long timelines) and the SQLite article
+# store (news beyond what the feed has seen) are both optional.
+QUERY_PORT = int(os.getenv("QUERY_PORT", "8080"))
+
+
+def supabase_client():
+    load_dotenv(".env")
+    url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+    if not url or not key:
+        logging.warning("SUPABASE_URL/SUPABASE_KEY not set - serving from memory only")
+        return None
+    from supabase import create_client
+    return create_client(url, key)
+
+
+async def main(args):
+    aggregates = HotAggregates()
+    feed = threading.Thread(
+        target=feed_from_kafka, args=(aggregates, args.broker, args.replay_hours * 3600),
+        name="query-feed", daemon=True,
+    )
+    feed.start()
+
+    article_store = ArticleStore(args.db) if os.path.exists(args.db) else None
+    service = QueryService(aggregates, supabase_client(), article_store, args.cache_ttl)
+    server = await serve(service, args.host, args.port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="HTTP query service: top tickers, timelines, latest news")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=QUERY_PORT)
+    parser.add_argument("--broker", default="localhost:9092")
+    parser.add_argument("--db", default=ARTICLE_DB, help="SQLite article store for cold news queries")
+    parser.add_argument("--replay-hours", type=int, default=RETENTION_SECONDS // 3600,
+                        help="how much topic history to load into memory at start")
+    parser.add_argument("--cache-ttl", type=float, help="seconds cold query results are cached")
+    args = parser.parse_args()
+
+    start_from_env("query-service")
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        logging.info("Shutting down query service")
@@ -0,0 +1,95 @@
+import argparse
+import logging
+import os
+import sys
+import time
+import pandas as pd
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.metrics import start_from_env
+from common.sweep import publish_sweep, remaining_units, requeue_parked, wait_for_sweep
+from common.tickers import load_sp500
+
+# ===============================
+# COORDINATOR CONFIG
+# ===============================
+# news units are ticker symbols (one NewsAPI call each, 1.5s apart);
+# reddit units are search terms, 20 per OR query like reddit_posts_praw
+UNIT_SIZES = {"news": 10, "reddit": 20}
+CSV_PATHS = {
+    "news": "news_fetch_api/constituents.csv",
+    "reddit": "reddit/constituents.csv",
+}
+
+
+def sweep_terms(provider, csv_path):
+    """Universe for one sweep; any CSV with Symbol/Security columns works (e.g. Russell 1000)"""
+    if provider == "news":
+        return pd.read_csv(csv_path)["Symbol"].str.upper().tolist()
+    return sorted(load_sp500(csv_path))
+
+
+def sweep_params(provider):
+    """Shared parameters so every worker fetches the same window"""
+    if provider != "news":
+        return {}
+    today = datetime.today()
+    return {
+        "from_date": (today - timedelta(days=29)).strftime("%Y-%m-%d"),
+        "to_date": today.strftime("%Y-%m-%d"),
+    }
+
+
+def run_once(provider, csv_path, unit_size, broker_address, wait):
+    terms = sweep_terms(provider, csv_path)
+    sweep_id = publish_sweep(broker_address, provider, terms, unit_size, sweep_params(provider))
+    logging.info(f"Sweep {sweep_id}: {len(terms)} {provider} terms queued")
+    if wait:
+        elapsed = wait_for_sweep(broker_address, provider)
+        logging.info(f"Sweep {sweep_id}: {len(terms)} terms in {elapsed:.1f}s ({len(terms) / elapsed:.2f} terms/s)")
+
+
+def run_every(provider, csv_path, unit_size, broker_address, interval):
+    """Continuous mode: a new sweep each interval, skipped while the last one is unfinished;
+    units the workers parked last time are retried alongside it"""
+    while True:
+        try:
+            backlog = remaining_units(broker_address, provider)
+            if backlog:
+                logging.warning(f"{backlog} {provider} units still pending - skipping this sweep")
+            else:
+                requeue_parked(broker_address, provider)
+                run_once(provider, csv_path, unit_size, broker_address, wait=False)
+            time.sleep(interval)
+        except KeyboardInterrupt:
+            logging.info("Shutting down coordinator")
+            break
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Publish a ticker sweep as work units for the fetch workers")
+    parser.add_argument("--provider", choices=sorted(UNIT_SIZES), default="news")
+    parser.add_argument("--csv", help="constituents CSV (default: the provider's own)")
+    parser.add_argument("--unit-size", type=int, help="terms per work unit")
+    parser.add_argument("--broker", default="localhost:9092")
+    parser.add_argument("--wait", action="store_true", help="block until the workers have committed every unit")
+    parser.add_argument("--every", type=float, help="publish a new sweep every N seconds")
+    parser.add_argument("--requeue-parked", action="store_true",
+                        help="only move units the workers gave up on back onto the work topic")
+    args = parser.parse_args()
+
+    start_from_env("ticker-sweep-coordinator")
+    csv_path = args.csv or CSV_PATHS[args.provider]
+    unit_size = args.unit_size or UNIT_SIZES[args.provider]
+
+    if args.requeue_parked:
+        requeue_parked(args.broker, args.provider)
+    elif args.every:
+        run_every(args.provider, csv_path, unit_size, args.broker, args.every)
+    else:
+        run_once(args.provider, csv_path, unit_size, args.broker, args.wait)